@@ -0,0 +1,212 @@
+# app/core/admission.py
+"""
+Admission control for the Gemini-backed routes.
+
+Each route class has a concurrency limit and a bounded wait queue. A request
+beyond the limit waits in its class queue (FIFO) for up to
+ADMISSION_QUEUE_TIMEOUT_SECONDS; when the queue is full, or the wait times
+out, it is shed at once with 503 and a Retry-After estimate instead of piling
+up behind a slow model. Routes outside every class (compass, history, /ping,
+...) are never queued, so Firestore-only traffic stays fast while the LLM
+routes are saturated.
+
+Limits adapt to observed latency (a gradient limiter): a short-term average
+of request latency is compared with a long-term baseline, and the limit
+shrinks in proportion when recent requests get slower, then grows back
+gradually once latency recovers. The configured
+concurrency is the ceiling, ADMISSION_MIN_CONCURRENCY the floor.
+
+Streamed responses hold their slot until the stream ends.
+"""
+import asyncio
+import math
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from app.core.config import (
+    ADMISSION_CHAT_MAX_CONCURRENCY,
+    ADMISSION_ENABLED,
+    ADMISSION_FORGE_MAX_CONCURRENCY,
+    ADMISSION_MIN_CONCURRENCY,
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    ADMISSION_REFRESH_MAX_CONCURRENCY,
+)
+
+# Recent latency may exceed the baseline by this factor before the limit shrinks
+LATENCY_TOLERANCE = 1.5
+SHORT_WINDOW = 10
+LONG_WINDOW = 500
+SMOOTHING = 0.2
+MAX_RETRY_AFTER_SECONDS = 30
+
+
+class Rejected(Exception):
+    """Raised when a request is shed; `retry_after` is in whole seconds."""
+
+    def __init__(self, route_class: str, reason: str, retry_after: int):
+        super().__init__(f"{route_class}: {reason}")
+        self.route_class = route_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Ewma:
+    __slots__ = ("window", "value", "count")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.value = 0.0
+        self.count = 0
+
+    def add(self, sample: float) -> float:
+        # Plain average until the window has filled, then exponential
+        self.count += 1
+        factor = 1 / min(self.count, self.window)
+        self.value += (sample - self.value) * factor
+        return self.value
+
+
+class RouteClass:
+    def __init__(self, name: str, max_concurrency: int, min_concurrency: int = ADMISSION_MIN_CONCURRENCY,
+                 queue_size: int = ADMISSION_QUEUE_SIZE, queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self._short = _Ewma(SHORT_WINDOW)
+        self._long = _Ewma(LONG_WINDOW)
+        self.stats = {"admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0, "completed": 0}
+
+    # -------------------------------------------------
+    # Admission
+    # -------------------------------------------------
+    def _has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def _wake(self) -> None:
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot is handed over here, so nothing can overtake the waiter
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead would roughly have drained."""
+        latency = self._short.value or 1.0
+        waves = (len(self._waiters) + 1) / max(int(self.limit), 1)
+        return max(1, min(MAX_RETRY_AFTER_SECONDS, math.ceil(waves * latency)))
+
+    async def acquire(self) -> None:
+        if self._has_capacity() and not self._waiters:
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            self.stats["rejected_queue_full"] += 1
+            raise Rejected(self.name, "queue full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats["queued"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Admitted just as the wait ended; give the slot back
+                self.release(None)
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.stats["rejected_timeout"] += 1
+            raise Rejected(self.name, "queue timeout", self.retry_after())
+        self.stats["admitted"] += 1
+
+    def release(self, latency: Optional[float]) -> None:
+        """Free a slot; `latency` (seconds) feeds the limiter when the request completed."""
+        self.in_flight -= 1
+        if latency is not None:
+            self.stats["completed"] += 1
+            self._update_limit(latency)
+        self._wake()
+
+    # -------------------------------------------------
+    # Adaptive limit
+    # -------------------------------------------------
+    def _update_limit(self, latency: float) -> None:
+        short = self._short.add(latency)
+        long = self._long.add(latency)
+        if short <= 0:
+            return
+        # After a slow spell the baseline decays back down to the new normal
+        if long / short > 2:
+            self._long.value *= 0.95
+        # Only adjust while the class is actually busy
+        if self.in_flight + 1 < self.limit / 2:
+            return
+        gradient = max(0.5, min(1.0, LATENCY_TOLERANCE * long / short))
+        target = gradient * self.limit + math.sqrt(self.limit)
+        limit = self.limit * (1 - SMOOTHING) + target * SMOOTHING
+        self.limit = max(float(self.min_concurrency), min(float(self.max_concurrency), limit))
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "queue_size": self.queue_size,
+            "latency_short_seconds": round(self._short.value, 4),
+            "latency_long_seconds": round(self._long.value, 4),
+            "stats": dict(self.stats),
+        }
+
+
+class AdmissionController:
+    def __init__(self, enabled: bool = ADMISSION_ENABLED):
+        self.enabled = enabled
+        self._classes: Dict[str, RouteClass] = {}
+        self._routes: Dict[Tuple[str, str], RouteClass] = {}
+
+    def register_class(self, name: str, routes, max_concurrency: int, **kwargs) -> RouteClass:
+        """Register a route class for `routes`, given as (method, route template) pairs."""
+        route_class = RouteClass(name, max_concurrency, **kwargs)
+        self._classes[name] = route_class
+        for method, path in routes:
+            self._routes[(method, path)] = route_class
+        return route_class
+
+    def classify(self, method: str, route: str) -> Optional[RouteClass]:
+        """The route class of a request, or None if it is not admission-controlled."""
+        if not self.enabled:
+            return None
+        return self._routes.get((method, route))
+
+    def snapshot(self) -> dict:
+        return {"enabled": self.enabled, "classes": {name: c.snapshot() for name, c in self._classes.items()}}
+
+
+admission = AdmissionController()
+
+# Interactive chat, forge generation and the user-triggered recommendation
+# refresh each get their own budget, so one cannot starve the others
+admission.register_class(
+    "chat", [("POST", "/chat"), ("POST", "/chat/stream")], ADMISSION_CHAT_MAX_CONCURRENCY,
+)
+admission.register_class(
+    "forge", [("POST", "/forge/assessment"), ("POST", "/forge/resources"), ("POST", "/forge/feedback")],
+    ADMISSION_FORGE_MAX_CONCURRENCY,
+)
+admission.register_class(
+    "refresh", [("POST", "/chat/recommendations/refresh")], ADMISSION_REFRESH_MAX_CONCURRENCY,
+)
@@ -0,0 +1,155 @@
+# app/core/background.py
+"""
+Per-key coalescing background scheduler.
+
+Work submitted for a key (a user id) is debounced: if more work for the same
+key arrives before the pending job starts, the pending job is replaced, so
+only the latest submission runs. At most one job runs per key at a time, and
+global concurrency is bounded by a semaphore. Submissions made while a key's
+job is running are parked and run once it finishes.
+"""
+import asyncio
+import contextvars
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.core.config import PIPELINE_DEBOUNCE_SECONDS, PIPELINE_MAX_CONCURRENCY
+
+JobFactory = Callable[[], Awaitable[None]]
+
+
+class _KeyState:
+    __slots__ = ("pending", "first_submitted_at", "task", "running")
+
+    def __init__(self):
+        self.pending: Optional[JobFactory] = None
+        self.first_submitted_at: float = 0.0
+        self.task: Optional[asyncio.Task] = None
+        self.running = False
+
+
+class KeyedScheduler:
+    def __init__(self, name: str, max_concurrency: int = 4, debounce_seconds: float = 1.5):
+        self.name = name
+        self.debounce_seconds = debounce_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._max_concurrency = max_concurrency
+        self._keys: Dict[str, _KeyState] = {}
+        self._accepting = True
+        self.stats = {"submitted": 0, "coalesced": 0, "completed": 0, "failed": 0, "dropped": 0}
+        self._last_lag = 0.0
+
+    # -------------------------------------------------
+    # Submission
+    # -------------------------------------------------
+    def submit(self, key: str, job: JobFactory) -> None:
+        """Schedule `job` for `key`, replacing any not-yet-started job for that key."""
+        if not self._accepting:
+            self.stats["dropped"] += 1
+            print(f"[{self.name}] Not accepting work (shutting down); dropped job for {key}")
+            return
+
+        self.stats["submitted"] += 1
+        state = self._keys.setdefault(key, _KeyState())
+        if state.pending is not None:
+            self.stats["coalesced"] += 1
+        else:
+            state.first_submitted_at = time.monotonic()
+        state.pending = job
+
+        # A running job will pick up the pending one when it finishes. Jobs get
+        # a fresh context so they never share request-scoped state (such as
+        # the Firestore unit of work) with the request that submitted them.
+        if state.task is None:
+            state.task = asyncio.create_task(self._run_key(key, state), context=contextvars.Context())
+
+    async def cancel(self, key: str) -> None:
+        """Drop the pending job for `key` and cancel (and wait for) a running one."""
+        state = self._keys.pop(key, None)
+        if state is None:
+            return
+        state.pending = None
+        task = state.task
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+            await asyncio.wait([task])
+        self.stats["dropped"] += 1
+
+    async def _run_key(self, key: str, state: _KeyState):
+        try:
+            while state.pending is not None:
+                # Debounce: let bursts of submissions collapse into the latest one
+                if self._accepting and self.debounce_seconds > 0:
+                    await asyncio.sleep(self.debounce_seconds)
+
+                async with self._semaphore:
+                    job, state.pending = state.pending, None
+                    self._last_lag = time.monotonic() - state.first_submitted_at
+                    state.running = True
+                    try:
+                        await job()
+                        self.stats["completed"] += 1
+                    except Exception as e:
+                        self.stats["failed"] += 1
+                        print(f"[{self.name}] Job for {key} failed: {e}")
+                    finally:
+                        state.running = False
+                if state.pending is not None:
+                    state.first_submitted_at = time.monotonic()
+        finally:
+            state.task = None
+            if state.pending is None and self._keys.get(key) is state:
+                del self._keys[key]
+
+    # -------------------------------------------------
+    # Introspection
+    # -------------------------------------------------
+    def snapshot(self) -> dict:
+        """Queue depth, oldest pending age and counters, for logs and metrics."""
+        now = time.monotonic()
+        pending = [s for s in self._keys.values() if s.pending is not None]
+        return {
+            "name": self.name,
+            "queue_depth": len(pending),
+            "running": sum(1 for s in self._keys.values() if s.running),
+            "max_concurrency": self._max_concurrency,
+            "oldest_pending_seconds": round(max((now - s.first_submitted_at for s in pending), default=0.0), 3),
+            "last_start_lag_seconds": round(self._last_lag, 3),
+            **self.stats,
+        }
+
+    # -------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------
+    def start(self) -> None:
+        """
+        Accept work again after a `drain()`. The schedulers are module singletons,
+        so each app lifespan (tests and benchmarks may run several) starts them.
+        """
+        if self._accepting:
+            return
+        # Keys still here belong to jobs cancelled by the drain, possibly on an old loop
+        self._keys = {k: s for k, s in self._keys.items() if s.task is not None and not s.task.done()}
+        self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        self._accepting = True
+
+    async def drain(self, timeout: float = 30.0) -> None:
+        """Stop accepting work, skip debounce delays and wait for queued jobs to finish."""
+        self._accepting = False
+        tasks = [s.task for s in self._keys.values() if s.task is not None]
+        if not tasks:
+            return
+        print(f"[{self.name}] Draining {len(tasks)} background jobs...")
+        done, not_done = await asyncio.wait(tasks, timeout=timeout)
+        for task in not_done:
+            task.cancel()
+        if not_done:
+            print(f"[{self.name}] Cancelled {len(not_done)} jobs that did not finish within {timeout}s")
+
+
+# Profile extraction, conversation memory and compass updates for chat users
+profile_pipeline = KeyedScheduler(
+    "ProfilePipeline",
+    max_concurrency=PIPELINE_MAX_CONCURRENCY,
+    debounce_seconds=PIPELINE_DEBOUNCE_SECONDS,
+)
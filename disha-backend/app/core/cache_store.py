@@ -0,0 +1,186 @@
+# app/core/cache_store.py
+"""
+Pluggable key/value stores for shared caches (learning resources, ...).
+
+Entries are plain JSON-serialisable dicts. Every entry carries a
+`fresh_until` epoch timestamp so stores can list entries that are close to
+expiry for background revalidation.
+
+Backends, selected with CACHE_BACKEND:
+- "memory":    in-process LRU, for dev and tests
+- "sqlite":    a local SQLite file (WAL mode), shared by workers on one host
+- "firestore": a Firestore collection per namespace, shared by every instance
+"""
+import abc
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from app.core.config import CACHE_BACKEND, CACHE_MEMORY_MAX_ENTRIES, CACHE_SQLITE_PATH
+
+
+class CacheStore(abc.ABC):
+    """Interface shared by all cache backends."""
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def set(self, key: str, entry: dict) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def expiring(self, before: float, limit: int = 50) -> List[Tuple[str, dict]]:
+        """Entries whose `fresh_until` is earlier than `before`, soonest first."""
+
+
+# -----------------------------------------------------
+# IN-MEMORY LRU
+# -----------------------------------------------------
+class MemoryStore(CacheStore):
+    def __init__(self, max_entries: int = CACHE_MEMORY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, dict]" = OrderedDict()
+
+    async def get(self, key):
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    async def set(self, key, entry):
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    async def delete(self, key):
+        self._data.pop(key, None)
+
+    async def expiring(self, before, limit=50):
+        due = [(k, e) for k, e in self._data.items() if e.get("fresh_until", 0) < before]
+        due.sort(key=lambda item: item[1].get("fresh_until", 0))
+        return due[:limit]
+
+
+# -----------------------------------------------------
+# SQLITE
+# -----------------------------------------------------
+class SQLiteStore(CacheStore):
+    def __init__(self, namespace: str, path: str = CACHE_SQLITE_PATH):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " fresh_until REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_entries_fresh ON cache_entries (namespace, fresh_until)"
+            )
+            self._conn.commit()
+
+    def _get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set(self, key, entry):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, fresh_until) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(entry), entry.get("fresh_until", 0)),
+            )
+            self._conn.commit()
+
+    def _delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+            self._conn.commit()
+
+    def _expiring(self, before, limit):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM cache_entries WHERE namespace = ? AND fresh_until < ?"
+                " ORDER BY fresh_until LIMIT ?",
+                (self.namespace, before, limit),
+            ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    async def get(self, key):
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key, entry):
+        await asyncio.to_thread(self._set, key, entry)
+
+    async def delete(self, key):
+        await asyncio.to_thread(self._delete, key)
+
+    async def expiring(self, before, limit=50):
+        return await asyncio.to_thread(self._expiring, before, limit)
+
+
+# -----------------------------------------------------
+# FIRESTORE
+# -----------------------------------------------------
+class FirestoreStore(CacheStore):
+    def __init__(self, namespace: str):
+        from app.core.firebase import get_async_db
+        self._collection = get_async_db().collection(f"cache_{namespace}")
+
+    @staticmethod
+    def _doc_id(key: str) -> str:
+        # Cache keys may contain "/" and other characters Firestore ids forbid
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    async def get(self, key):
+        snap = await self._collection.document(self._doc_id(key)).get()
+        return (snap.to_dict() or {}).get("entry") if snap.exists else None
+
+    async def set(self, key, entry):
+        await self._collection.document(self._doc_id(key)).set(
+            {"key": key, "entry": entry, "fresh_until": entry.get("fresh_until", 0)}
+        )
+
+    async def delete(self, key):
+        await self._collection.document(self._doc_id(key)).delete()
+
+    async def expiring(self, before, limit=50):
+        from google.cloud.firestore_v1.base_query import FieldFilter
+        query = (
+            self._collection.where(filter=FieldFilter("fresh_until", "<", before))
+            .order_by("fresh_until")
+            .limit(limit)
+        )
+        entries = []
+        async for snap in query.stream():
+            doc = snap.to_dict()
+            entries.append((doc.get("key"), doc.get("entry")))
+        return entries
+
+
+def make_store(namespace: str, backend: str | None = None) -> CacheStore:
+    """Build the configured cache backend for `namespace`."""
+    backend = (backend or CACHE_BACKEND).lower()
+    if backend == "memory":
+        return MemoryStore()
+    if backend == "sqlite":
+        return SQLiteStore(namespace)
+    if backend == "firestore":
+        return FirestoreStore(namespace)
+    raise ValueError(f"Unknown CACHE_BACKEND '{backend}' (expected memory, sqlite or firestore)")
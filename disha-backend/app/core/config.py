@@ -2,7 +2,7 @@
 import os
 from dotenv import load_dotenv
 
-# Load .env if present
+# Load .env if present (the only place it is loaded; everything reads settings from here)
 load_dotenv()
 
 # For production/secure environments, load the Base64 encoded JSON content.
@@ -14,3 +14,100 @@ GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "./
 
 GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID", "")
 FIRESTORE_LOCATION = os.getenv("FIRESTORE_LOCATION", "asia-south1")
+
+# Where user, chat and compass documents live: "firestore" (production),
+# or the embedded "memory" / "sqlite" stores for local runs, CI and benchmarks
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore")
+STORAGE_SQLITE_PATH = os.getenv("STORAGE_SQLITE_PATH", "./disha_data.sqlite3")
+
+# Gemini access goes through app.core.llm
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-001")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_DEFAULT_DEADLINE_SECONDS = float(os.getenv("LLM_DEFAULT_DEADLINE_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+
+# Conversation memory: the chat prompt carries a running summary plus the
+# last CHAT_WINDOW_TURNS turns verbatim, trimmed to CHAT_PROMPT_TOKEN_BUDGET.
+CHAT_WINDOW_TURNS = int(os.getenv("CHAT_WINDOW_TURNS", "8"))
+CHAT_PROMPT_TOKEN_BUDGET = int(os.getenv("CHAT_PROMPT_TOKEN_BUDGET", "3000"))
+# Older turns are folded into the summary once this many have piled up
+CHAT_SUMMARY_BATCH = int(os.getenv("CHAT_SUMMARY_BATCH", "6"))
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "600"))
+
+# Background profile/compass pipeline: at most one job per user, debounced,
+# with a global cap on jobs running at once.
+PIPELINE_MAX_CONCURRENCY = int(os.getenv("PIPELINE_MAX_CONCURRENCY", "4"))
+PIPELINE_DEBOUNCE_SECONDS = float(os.getenv("PIPELINE_DEBOUNCE_SECONDS", "1.5"))
+PIPELINE_DRAIN_TIMEOUT_SECONDS = float(os.getenv("PIPELINE_DRAIN_TIMEOUT_SECONDS", "30"))
+
+# Verified Firebase ID tokens are cached (keyed by hash) until they expire
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "10000"))
+
+# Bearer token for /metrics and the /ping status endpoints (queues, caches, LLM
+# usage); they answer 404 while it is unset. /ping/ and /ping/ready stay public.
+STATUS_TOKEN = os.getenv("STATUS_TOKEN", "")
+
+# Quiz pool: validated variants per (skill, career), served round-robin
+QUIZ_POOL_TARGET = int(os.getenv("QUIZ_POOL_TARGET", "4"))
+QUIZ_POOL_LOW_WATER = int(os.getenv("QUIZ_POOL_LOW_WATER", "2"))
+QUIZ_VARIANT_MAX_SERVES = int(os.getenv("QUIZ_VARIANT_MAX_SERVES", "25"))
+QUIZ_POOL_MAX_KEYS = int(os.getenv("QUIZ_POOL_MAX_KEYS", "2000"))
+
+# Shared caches: "memory" (dev), "sqlite" or "firestore"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "./disha_cache.sqlite3")
+CACHE_MEMORY_MAX_ENTRIES = int(os.getenv("CACHE_MEMORY_MAX_ENTRIES", "5000"))
+
+# Learning-resource cache: served fresh for the TTL, then served stale while a
+# refresh runs. Entries within the refresh-ahead window are revalidated in the background.
+RESOURCE_CACHE_TTL_SECONDS = int(os.getenv("RESOURCE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+RESOURCE_CACHE_STALE_SECONDS = int(os.getenv("RESOURCE_CACHE_STALE_SECONDS", str(7 * 24 * 3600)))
+RESOURCE_CACHE_REFRESH_AHEAD_SECONDS = int(os.getenv("RESOURCE_CACHE_REFRESH_AHEAD_SECONDS", str(24 * 3600)))
+RESOURCE_CACHE_SWEEP_INTERVAL_SECONDS = int(os.getenv("RESOURCE_CACHE_SWEEP_INTERVAL_SECONDS", "3600"))
+
+# Career recommendations shared across users with the same profile fingerprint
+RECOMMENDATION_CACHE_TTL_SECONDS = int(os.getenv("RECOMMENDATION_CACHE_TTL_SECONDS", str(3 * 24 * 3600)))
+
+# Link checker for forge resources
+LINK_CHECK_TIMEOUT_SECONDS = float(os.getenv("LINK_CHECK_TIMEOUT_SECONDS", "5"))
+LINK_CHECK_BATCH_DEADLINE_SECONDS = float(os.getenv("LINK_CHECK_BATCH_DEADLINE_SECONDS", "8"))
+LINK_CHECK_MAX_CONNECTIONS = int(os.getenv("LINK_CHECK_MAX_CONNECTIONS", "50"))
+LINK_CHECK_PER_HOST = int(os.getenv("LINK_CHECK_PER_HOST", "4"))
+LINK_CHECK_POSITIVE_TTL_SECONDS = int(os.getenv("LINK_CHECK_POSITIVE_TTL_SECONDS", str(6 * 3600)))
+LINK_CHECK_NEGATIVE_TTL_SECONDS = int(os.getenv("LINK_CHECK_NEGATIVE_TTL_SECONDS", "1800"))
+LINK_CHECK_CACHE_MAX_ENTRIES = int(os.getenv("LINK_CHECK_CACHE_MAX_ENTRIES", "20000"))
+# A resource lookup stops checking once this many links are known to work
+LINK_CHECK_ENOUGH_VALID = int(os.getenv("LINK_CHECK_ENOUGH_VALID", "5"))
+
+# Write-behind batcher for users/{uid} field updates (0 disables it)
+WRITE_BATCH_WINDOW_SECONDS = float(os.getenv("WRITE_BATCH_WINDOW_SECONDS", "0.5"))
+WRITE_BATCH_MAX_RETRIES = int(os.getenv("WRITE_BATCH_MAX_RETRIES", "3"))
+
+# Optional OpenTelemetry tracing (needs opentelemetry-sdk): "none", "console" or "file"
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")
+TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", "./disha_traces.jsonl")
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "disha-backend")
+
+# Push events for background results (GET /career/recommendations/events)
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "memory")
+EVENTS_SQLITE_PATH = os.getenv("EVENTS_SQLITE_PATH", "./disha_events.sqlite3")
+EVENTS_POLL_INTERVAL_SECONDS = float(os.getenv("EVENTS_POLL_INTERVAL_SECONDS", "0.5"))
+EVENTS_RETENTION_SECONDS = float(os.getenv("EVENTS_RETENTION_SECONDS", "300"))
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "32"))
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+EVENTS_STREAM_MAX_SECONDS = float(os.getenv("EVENTS_STREAM_MAX_SECONDS", "600"))
+
+# Warm-up of the external clients at startup: "background" (ready once warm),
+# "blocking" (startup waits for it) or "none" (built on first use)
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "background")
+
+# Admission control for Gemini-backed routes: adaptive per-class concurrency
+# (the values below are ceilings) with bounded wait queues; excess gets 503
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMISSION_CHAT_MAX_CONCURRENCY = int(os.getenv("ADMISSION_CHAT_MAX_CONCURRENCY", "32"))
+ADMISSION_FORGE_MAX_CONCURRENCY = int(os.getenv("ADMISSION_FORGE_MAX_CONCURRENCY", "16"))
+ADMISSION_REFRESH_MAX_CONCURRENCY = int(os.getenv("ADMISSION_REFRESH_MAX_CONCURRENCY", "4"))
+ADMISSION_MIN_CONCURRENCY = int(os.getenv("ADMISSION_MIN_CONCURRENCY", "2"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "32"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "10"))
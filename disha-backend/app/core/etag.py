@@ -0,0 +1,52 @@
+# app/core/etag.py
+"""
+ETag / If-None-Match helpers for the read endpoints the frontend polls.
+
+Responses carry a weak ETag and `Cache-Control: private, no-cache`, so
+browsers revalidate every time and transparently reuse their cached body on
+a 304. Routes that can derive a version cheaply (e.g. chat history from the
+user document's `chat_meta`) pass it as `parts` and answer 304 before doing
+the expensive read; the rest hash the payload they are about to send.
+"""
+import hashlib
+import json
+from typing import Any
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def compute_etag(*parts: Any) -> str:
+    """Weak ETag over the JSON encoding of `parts`."""
+    encoded = json.dumps(jsonable_encoder(parts), sort_keys=True, separators=(",", ":"), default=str)
+    return f'W/"{hashlib.sha1(encoded.encode("utf-8")).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: ignore the W/ prefix on either side
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def conditional_json(request: Request, payload: Any, etag: str | None = None) -> Response:
+    """
+    JSON response for `payload` with an ETag (hashed from the payload unless
+    given), or a bodyless 304 when the client already has this version.
+    """
+    content = jsonable_encoder(payload)
+    etag = etag or compute_etag(content)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return JSONResponse(content=content, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
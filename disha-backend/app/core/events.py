@@ -0,0 +1,280 @@
+# app/core/events.py
+"""
+Per-user push events for the frontend (server-sent events).
+
+Background jobs `publish(user_id, event, data)` when they finish something a
+client may be waiting for (profile extraction, new recommendations); the
+`/career/recommendations/events` stream subscribes to its user's events, so
+clients no longer poll the user document.
+
+The hub keeps the subscriptions of this process. A backend carries published
+events to every worker, selected with EVENTS_BACKEND:
+- "memory":    this process only, for a single worker, dev and tests
+- "sqlite":    an events table in a local SQLite file, polled by each worker
+               every EVENTS_POLL_INTERVAL_SECONDS; workers on one host
+- "firestore": an `events` collection watched with a snapshot listener by
+               every instance (add a TTL policy on `expires_at` to clean it up)
+
+Delivery is best effort: events are notifications, and a client that
+(re)connects gets the current state first.
+"""
+import abc
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from app.core.config import (
+    EVENTS_BACKEND,
+    EVENTS_POLL_INTERVAL_SECONDS,
+    EVENTS_QUEUE_SIZE,
+    EVENTS_RETENTION_SECONDS,
+    EVENTS_SQLITE_PATH,
+)
+
+# (event, data) as queued for a subscriber
+Message = Tuple[str, dict]
+Deliver = Callable[[str, str, dict], None]
+
+
+def format_sse(event: str, data: dict) -> str:
+    """One server-sent event frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# -----------------------------------------------------
+# BACKENDS
+# -----------------------------------------------------
+class EventBackend(abc.ABC):
+    """Interface shared by all event backends. `deliver` must be called on the event loop."""
+
+    @abc.abstractmethod
+    async def start(self, deliver: Deliver) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def publish(self, user_id: str, event: str, data: dict) -> None:
+        ...
+
+    async def stop(self) -> None:
+        pass
+
+
+class MemoryEventBackend(EventBackend):
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver):
+        self._deliver = deliver
+
+    async def publish(self, user_id, event, data):
+        self._deliver(user_id, event, data)
+
+
+class SQLiteEventBackend(EventBackend):
+    def __init__(self, path: str = EVENTS_SQLITE_PATH, poll_interval: float = EVENTS_POLL_INTERVAL_SECONDS):
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._cursor = 0
+        self._task: Optional[asyncio.Task] = None
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, event TEXT NOT NULL,"
+                " data TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def _insert(self, user_id, event, data):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO events (user_id, event, data, created_at) VALUES (?, ?, ?, ?)",
+                (user_id, event, json.dumps(data), time.time()),
+            )
+            self._conn.commit()
+
+    def _read_new(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, user_id, event, data FROM events WHERE id > ? ORDER BY id", (self._cursor,)
+            ).fetchall()
+            # Every worker prunes; events are only needed until the others have polled
+            self._conn.execute("DELETE FROM events WHERE created_at < ?", (time.time() - EVENTS_RETENTION_SECONDS,))
+            self._conn.commit()
+        if rows:
+            self._cursor = rows[-1][0]
+        return [(user_id, event, json.loads(data)) for _, user_id, event, data in rows]
+
+    def _last_id(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    async def _poll_loop(self, deliver):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                for user_id, event, data in await asyncio.to_thread(self._read_new):
+                    deliver(user_id, event, data)
+            except Exception as e:
+                print(f"[Events] Polling the events table failed: {e}")
+
+    async def start(self, deliver):
+        # Only events published from now on
+        self._cursor = await asyncio.to_thread(self._last_id)
+        self._task = asyncio.create_task(self._poll_loop(deliver))
+
+    async def publish(self, user_id, event, data):
+        await asyncio.to_thread(self._insert, user_id, event, data)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class FirestoreEventBackend(EventBackend):
+    def __init__(self, collection: str = "events"):
+        # Snapshot listeners only exist on the sync client; publishing uses the async one
+        from app.core.firebase import get_async_db, get_db
+        self._collection = get_db().collection(collection)
+        self._async_collection = get_async_db().collection(collection)
+        self._watch = None
+
+    async def start(self, deliver):
+        from google.cloud.firestore_v1.base_query import FieldFilter
+        loop = asyncio.get_running_loop()
+
+        def on_snapshot(_snapshots, changes, _read_time):
+            # Runs on the listener's thread
+            for change in changes:
+                if change.type.name == "ADDED":
+                    doc = change.document.to_dict() or {}
+                    loop.call_soon_threadsafe(deliver, doc.get("user_id"), doc.get("event"), doc.get("data") or {})
+
+        query = self._collection.where(filter=FieldFilter("created_at", ">", time.time()))
+        self._watch = query.on_snapshot(on_snapshot)
+
+    async def publish(self, user_id, event, data):
+        await self._async_collection.add({
+            "user_id": user_id,
+            "event": event,
+            "data": data,
+            "created_at": time.time(),
+            "expires_at": datetime.now(timezone.utc) + timedelta(seconds=EVENTS_RETENTION_SECONDS),
+        })
+
+    async def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+
+def make_backend(backend: str | None = None) -> EventBackend:
+    """Build the configured event backend."""
+    backend = (backend or EVENTS_BACKEND).lower()
+    if backend == "memory":
+        return MemoryEventBackend()
+    if backend == "sqlite":
+        return SQLiteEventBackend()
+    if backend == "firestore":
+        return FirestoreEventBackend()
+    raise ValueError(f"Unknown EVENTS_BACKEND '{backend}' (expected memory, sqlite or firestore)")
+
+
+# -----------------------------------------------------
+# HUB
+# -----------------------------------------------------
+class Subscription:
+    """Events for one user, queued for one open stream. `close()` when the stream ends."""
+
+    def __init__(self, hub: "EventHub", user_id: str):
+        self.hub = hub
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[Message]" = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+
+    async def next(self, timeout: float) -> Optional[Message]:
+        """The next event, or None if there was none within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.hub._unsubscribe(self)
+
+
+class EventHub:
+    def __init__(self, backend: Optional[EventBackend] = None):
+        self._backend = backend
+        self._started = False
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self.stats = {"published": 0, "delivered": 0, "dropped": 0, "publish_errors": 0}
+
+    async def start(self) -> None:
+        if self._started:
+            return
+        if self._backend is None:
+            self._backend = make_backend()
+        await self._backend.start(self._deliver)
+        self._started = True
+
+    async def stop(self) -> None:
+        if self._started:
+            await self._backend.stop()
+            self._started = False
+
+    def subscribe(self, user_id: str) -> Subscription:
+        subscription = Subscription(self, user_id)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.user_id]
+
+    async def publish(self, user_id: str, event: str, data: dict) -> None:
+        """Send `event` to every open stream of `user_id`, in every worker. Never raises."""
+        self.stats["published"] += 1
+        if not self._started:
+            # Not started by the lifespan (scripts, tests): this process only
+            self._deliver(user_id, event, data)
+            return
+        try:
+            await self._backend.publish(user_id, event, data)
+        except Exception as e:
+            self.stats["publish_errors"] += 1
+            print(f"[Events] Could not publish {event} for {user_id}: {e}")
+
+    def _deliver(self, user_id: str, event: str, data: dict) -> None:
+        for subscription in list(self._subscribers.get(user_id, ())):
+            try:
+                subscription.queue.put_nowait((event, data))
+                self.stats["delivered"] += 1
+            except asyncio.QueueFull:
+                # The client is not reading; it reloads the current state on reconnect
+                self.stats["dropped"] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "backend": type(self._backend).__name__ if self._backend is not None else None,
+            "started": self._started,
+            "users": len(self._subscribers),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            **self.stats,
+        }
+
+
+event_hub = EventHub()
@@ -1,13 +1,28 @@
 # app/core/firebase.py
-import os
+"""
+Firebase Admin app, Firestore clients and Firebase Auth, created on first use
+(or by the startup warm-up, see services.py) instead of at import time.
+"""
 import json
 import base64
-import firebase_admin
-from firebase_admin import credentials, auth, firestore
-from app.core.config import GOOGLE_APPLICATION_CREDENTIALS, FIREBASE_CREDENTIALS_BASE64
+from app.core.config import (
+    CACHE_BACKEND,
+    EVENTS_BACKEND,
+    FIREBASE_CREDENTIALS_BASE64,
+    GOOGLE_APPLICATION_CREDENTIALS,
+    STORAGE_BACKEND,
+)
+from app.core.services import services
+
+
+def _initialize_app():
+    import firebase_admin
+    from firebase_admin import credentials
+
+    # Initialize Firebase Admin only once
+    if firebase_admin._apps:
+        return firebase_admin.get_app()
 
-# Initialize Firebase Admin only once
-if not firebase_admin._apps:
     cred = None
     # Prioritize the secure Base64 environment variable
     if FIREBASE_CREDENTIALS_BASE64:
@@ -29,10 +44,47 @@ if not firebase_admin._apps:
     else:
         raise ValueError("Firebase credentials not found.")
 
-    firebase_admin.initialize_app(cred)
+    return firebase_admin.initialize_app(cred)
+
+
+def _auth():
+    services.get("firebase")
+    from firebase_admin import auth
+    return auth
+
+
+def _firestore():
+    services.get("firebase")
+    from firebase_admin import firestore
+    return firestore.client()
+
+
+def _firestore_async():
+    services.get("firebase")
+    from firebase_admin import firestore_async
+    return firestore_async.client()
+
+
+services.register("firebase", _initialize_app)
+services.register("firebase_auth", _auth)
+# Request-path code uses the async client so Firestore I/O never blocks the event loop;
+# it is only warmed when a backend actually lives in Firestore
+_uses_firestore = "firestore" in (STORAGE_BACKEND, CACHE_BACKEND, EVENTS_BACKEND)
+services.register("firestore_async", _firestore_async, warm=_uses_firestore)
+# Only the Firestore event listener needs the sync client
+services.register("firestore", _firestore, warm=False)
+
+
+def get_auth():
+    """The firebase_admin.auth module, with the app initialized."""
+    return services.get("firebase_auth")
+
+
+def get_db():
+    """Sync Firestore client."""
+    return services.get("firestore")
 
-# Expose auth and firestore client for use in other files
-firebase_auth = auth
-db = firestore.client()
 
-print("[INFO] Firestore client imported from core.firebase")
+def get_async_db():
+    """Async Firestore client."""
+    return services.get("firestore_async")
@@ -1,158 +1,550 @@
 # app/core/firestore_utils.py
-import os
+"""
+Repository for user, profile, chat and compass data.
+
+Routers only go through these functions. Documents are stored in the
+DocumentStore picked by STORAGE_BACKEND (Firestore in production, memory or
+SQLite for local runs and benchmarks; see storage.py). Every function that
+touches storage is a coroutine; call it with `await` straight from the
+event loop, never through a worker thread.
+"""
+import copy
+import json
+import threading
 import uuid
+from contextvars import ContextVar
 from datetime import datetime
-from app.core.firebase import db  # Import the centralized db client
-from dotenv import load_dotenv
-
-load_dotenv()
+from app.core import metrics, schema, tracing
+from app.core.background import profile_pipeline
+from app.core.schema import PROFILE_SKELETON, career_slug
+from app.core.storage import (
+    BATCH_WRITE_LIMIT,
+    DELETE_FIELD,
+    ArrayRemove,
+    ArrayUnion,
+    Increment,
+    Write,
+    apply_updates,
+    field_path,
+    fold_updates,
+    get_store,
+)
+from app.core.write_batcher import write_batcher
 
 # -----------------------------------------------------
-# FIRESTORE SETUP (REMOVED - Handled by firebase.py)
+# REQUEST UNIT OF WORK
 # -----------------------------------------------------
-print(f"[INFO] Firestore client imported from core.firebase")
+class UnitOfWork:
+    """
+    Request-scoped view of user documents. Inside a unit each user document is
+    read at most once; writes to it are applied to the cached view and merged
+    into one pending update, and everything is committed in a single batch by
+    `flush()`. Once flushed, the unit is closed: staging raises, and helpers
+    write directly again (e.g. from a streaming response body). Callbacks
+    registered with `after_commit` run once the batch has been committed.
+    A failed request calls `discard()` instead, so none of its writes land.
+    """
 
-# -----------------------------------------------------
-# CONSTANTS
-# -----------------------------------------------------
-PROFILE_SKELETON = {
-    "name": "",
-    "education": "",
-    "skills": [],
-    "interests": [],
-    "career_goals": ""
-}
+    def __init__(self, route: str = "unknown"):
+        self.route = route            # metrics label for the operations counted here
+        self.users: dict = {}        # uid -> cached document dict (None if missing)
+        self._creates: dict = {}     # uid -> full document for users created in this unit
+        self._updates: dict = {}     # uid -> [{field path: value}, ...]
+        self._sets: list = []        # (document path, data) for other documents
+        self._after_commit: list = []  # callbacks run once the staged writes are committed
+        self._lock = threading.RLock()
+        self.closed = False
+        self.stats = {"reads": 0, "writes": 0, "commits": 0, "bytes_read": 0, "bytes_written": 0}
+
+    def _check_open(self):
+        if self.closed:
+            raise RuntimeError("Unit of work is already flushed; write directly instead")
+
+    def stage_user(self, user_id: str, updates: dict | None = None, create: dict | None = None):
+        with self._lock:
+            self._check_open()
+            if create is not None:
+                self._creates[user_id] = create
+                self._updates.pop(user_id, None)
+                self.users[user_id] = copy.deepcopy(create)
+            if updates:
+                fold_updates(self._updates.setdefault(user_id, []), updates)
+                if self.users.get(user_id) is not None:
+                    apply_updates(self.users[user_id], updates)
+
+    def stage_set(self, path: str, data: dict):
+        with self._lock:
+            self._check_open()
+            self._sets.append((path, data))
+
+    def after_commit(self, callback) -> None:
+        with self._lock:
+            self._check_open()
+            self._after_commit.append(callback)
+
+    def discard(self) -> int:
+        """Close the unit and drop its staged writes and callbacks. Returns the dropped write count."""
+        with self._lock:
+            self.closed = True
+            dropped = len(self._sets) + len(self._creates) + sum(len(ops) for ops in self._updates.values())
+            self._sets, self._creates, self._updates, self._after_commit = [], {}, {}, []
+            self.users = {}
+        return dropped
+
+    async def flush(self) -> int:
+        """Commit every staged write in one batch (chunked at the batch limit). Returns the write count."""
+        with self._lock:
+            self.closed = True
+            writes = [Write("set", path, data) for path, data in self._sets]
+            for user_id, doc in self._creates.items():
+                writes.append(Write("set", _user_path(user_id), doc))
+            for user_id, ops in self._updates.items():
+                writes.extend(Write("update", _user_path(user_id), updates) for updates in ops if updates)
+            callbacks = self._after_commit
+            self._sets, self._creates, self._updates, self._after_commit = [], {}, {}, []
+
+        # Buffered write-behind updates to the same documents land first
+        for write in writes:
+            await write_batcher.flush_document(write.path)
+
+        store = get_store()
+        for start in range(0, len(writes), BATCH_WRITE_LIMIT):
+            chunk = writes[start:start + BATCH_WRITE_LIMIT]
+            with _span("commit", chunk[0].path, writes=len(chunk), route=self.route):
+                await store.commit(chunk)
+            self.stats["commits"] += 1
+        self.stats["writes"] += len(writes)
+        self.stats["bytes_written"] += _doc_bytes(*(write.data for write in writes if write.data))
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[Firestore] After-commit callback failed: {e}")
+        return len(writes)
+
+
+_current_unit: ContextVar["UnitOfWork | None"] = ContextVar("firestore_unit_of_work", default=None)
+
+
+def begin_unit_of_work(route: str = "unknown"):
+    """Start a unit for the current context. Returns (unit, token) for `end_unit_of_work`."""
+    unit = UnitOfWork(route)
+    return unit, _current_unit.set(unit)
+
+
+def end_unit_of_work(token) -> None:
+    _current_unit.reset(token)
+
+
+def _active_unit() -> "UnitOfWork | None":
+    unit = _current_unit.get()
+    return unit if unit is not None and not unit.closed else None
+
+
+def after_commit(callback) -> None:
+    """
+    Call `callback()` once the writes made so far are committed: after the
+    current unit of work flushes, or right away outside one (writes there are
+    committed as they are made).
+    """
+    unit = _active_unit()
+    if unit is not None:
+        unit.after_commit(callback)
+    else:
+        callback()
+
+
+def _doc_bytes(*docs) -> int:
+    """Approximate stored size of documents (or updates), for metrics."""
+    return sum(len(json.dumps(doc, default=str)) for doc in docs if doc)
+
+
+def _count(reads: int = 0, writes: int = 0, commits: int = 0, bytes_read: int = 0, bytes_written: int = 0) -> None:
+    """
+    Storage operation counters. Inside a request they accumulate on the unit
+    of work and are exported when it is flushed; anything later (a streaming
+    body, background jobs) goes straight to the metrics.
+    """
+    stats = {"reads": reads, "writes": writes, "commits": commits, "bytes_read": bytes_read, "bytes_written": bytes_written}
+    unit = _current_unit.get()
+    if unit is not None and not unit.closed:
+        for key, value in stats.items():
+            unit.stats[key] += value
+    else:
+        metrics.record_firestore(unit.route if unit is not None else "background", stats)
+
+
+def _span(operation: str, path: str, **attributes):
+    """Trace span around one storage call (no-op unless tracing is on)."""
+    return tracing.span(
+        f"firestore.{operation}",
+        {"db.system": type(get_store()).__name__, "db.operation": operation, "db.path": path, **attributes},
+        kind="client",
+    )
 
 # -----------------------------------------------------
 # USER UTILITIES
 # -----------------------------------------------------
-def get_user(user_id: str):
-    snap = db.collection("users").document(user_id).get()
-    return snap.to_dict() if snap.exists else None
-
-
-def ensure_user_document(user_id: str, email: str | None = None):
-    """Guarantee user document structure with all necessary fields."""
-    ref = db.collection("users").document(user_id)
-    snap = ref.get()
-
-    if not snap.exists:
-        base_doc = {
-            "email": email or "",
-            "profile": PROFILE_SKELETON.copy(),
-            "chats": [],
-            "compass": {
-                "recommendations": [],
-                "saved_paths": []
-            }
-        }
-        ref.set(base_doc)
-        print(f"[Init] Created new user doc for {user_id}")
-        return base_doc
+def _user_path(user_id: str) -> str:
+    return f"users/{user_id}"
 
-    data = snap.to_dict() or {}
-    modified = False
 
-    # Ensure profile skeleton
-    profile = data.get("profile", {})
-    for k, v in PROFILE_SKELETON.items():
-        if k not in profile:
-            profile[k] = v
-            modified = True
-    data["profile"] = profile
+async def _load_user(user_id: str, flush: bool = True):
+    """
+    Read users/{uid}, at most once per unit of work. With `flush=False` the
+    read skips flush-on-read and is not cached on the unit, for callers that
+    do not depend on the buffered updates.
+    """
+    unit = _active_unit()
+    if unit is not None and user_id in unit.users:
+        return unit.users[user_id]
+    path = _user_path(user_id)
+    if flush:
+        # Flush-on-read: buffered write-behind updates must be visible
+        await write_batcher.flush_document(path)
+    with _span("get", path):
+        data = await get_store().get(path)
+    _count(reads=1, bytes_read=_doc_bytes(data))
+    if unit is not None and flush:
+        unit.users[user_id] = data
+    return data
 
-    # Ensure compass structure
-    compass = data.get("compass", {})
-    if not isinstance(compass, dict):
-        compass = {}
-        modified = True
-    if "recommendations" not in compass:
-        compass["recommendations"] = []
-        modified = True
-    if "saved_paths" not in compass:
-        compass["saved_paths"] = []
-        modified = True
-    data["compass"] = compass
-
-    # Ensure chats array
-    if "chats" not in data or not isinstance(data["chats"], list):
-        data["chats"] = []
-        modified = True
+
+async def _write_user(user_id: str, updates: dict | None = None, create: dict | None = None, defer: bool = False):
+    """
+    Write users/{uid}: `create` replaces the whole document, `updates` is a
+    field-path update. Staged on the current unit of work if there is one,
+    unless `defer` is set; updates outside a unit (and deferred ones) go
+    through the write-behind batcher when it is running.
+    """
+    unit = _active_unit()
+    if unit is not None and not defer:
+        unit.stage_user(user_id, updates=updates, create=create)
+        return
+    path = _user_path(user_id)
+    if create is not None:
+        with _span("set", path):
+            await get_store().set(path, create)
+        _count(writes=1, commits=1, bytes_written=_doc_bytes(create))
+    if not updates:
+        return
+    if create is None and write_batcher.submit(path, updates):
+        # Keep this request's view in step with what will be committed
+        if unit is not None and unit.users.get(user_id) is not None:
+            apply_updates(unit.users[user_id], updates)
+        return
+    ops = []
+    fold_updates(ops, updates)
+    with _span("commit", path, writes=len(ops)):
+        await get_store().commit([Write("update", path, op) for op in ops])
+    _count(writes=len(ops), commits=1, bytes_written=_doc_bytes(*ops))
+
+
+async def get_user(user_id: str):
+    return await _load_user(user_id)
+
+
+async def ensure_user_document(user_id: str, email: str | None = None):
+    """
+    Return the user document, creating it if missing. Documents below the
+    current schema version are upgraded once (see schema.py); current ones
+    are returned as read, without any repair walk.
+    """
+    data = await _load_user(user_id)
+
+    if data is None:
+        base_doc = schema.new_user_document(email)
+        await _write_user(user_id, create=base_doc)
+        print(f"[Init] Created new user doc for {user_id}")
+        return await _load_user(user_id) if _active_unit() else base_doc
+
+    updates = {}
+    if schema.document_version(data) < schema.CURRENT_SCHEMA_VERSION:
+        updates = await schema.upgrade(user_id, data)
+        print(f"[Schema] Upgraded user {user_id} to v{schema.CURRENT_SCHEMA_VERSION}")
 
     # Ensure email field
     if email and data.get("email") != email:
         data["email"] = email
-        modified = True
+        updates["email"] = email
 
-    if modified:
-        ref.set(data, merge=True)
-        print(f"[Fix] Ensured schema for user {user_id}")
+    if updates:
+        await _write_user(user_id, updates=updates)
 
     return data
 
 
-def upsert_user(user_id: str, data: dict):
-    db.collection("users").document(user_id).set(data, merge=True)
+async def update_user(user_id: str, updates: dict):
+    """Field-path update of users/{uid}; staged on the request's unit of work if any."""
+    await _write_user(user_id, updates=updates)
+    return {"ok": True}
+
+
+def _flatten(data: dict, prefix: tuple = ()) -> dict:
+    """Nested dict -> field-path update with set(merge=True) semantics."""
+    flat = {}
+    for key, value in data.items():
+        parts = prefix + (key,)
+        if isinstance(value, dict) and value:
+            flat.update(_flatten(value, parts))
+        else:
+            flat[field_path(*parts)] = value
+    return flat
+
+
+async def upsert_user(user_id: str, data: dict):
+    if await _load_user(user_id) is None:
+        await _write_user(user_id, create=data)
+    else:
+        await _write_user(user_id, updates=_flatten(data))
     print(f"[Upsert] {user_id} → keys: {list(data.keys())}")
     return {"ok": True}
 
 # -----------------------------------------------------
 # CHAT UTILITIES
 # -----------------------------------------------------
-def save_chat_turn(user_id: str, user_text: str, ai_text: str, email: str | None = None):
+def _chats_path(user_id: str) -> str:
+    """Chat turns live in users/{uid}/chats, one document per turn."""
+    return f"users/{user_id}/chats"
+
+
+def _chat_meta_bump(reset: bool = False) -> dict:
+    """
+    Update for users/{uid}.chat_meta. `version` changes on every chat write and
+    backs the history ETag; `epoch` only changes when turns are deleted, which
+    tells delta-sync clients their local copy must be replaced, not appended to.
+    """
+    updates = {
+        "chat_meta.version": Increment(1),
+        "chat_meta.updated_at": datetime.utcnow().isoformat(),
+    }
+    if reset:
+        updates["chat_meta.epoch"] = Increment(1)
+    return updates
+
+
+def get_chat_meta(user_data: dict | None) -> dict:
+    """`version` and `epoch` of a user's chat history, from an already-read user document."""
+    meta = (user_data or {}).get("chat_meta") or {}
+    return {"version": meta.get("version", 0), "epoch": meta.get("epoch", 0)}
+
+
+async def save_chat_turn(user_id: str, user_text: str, ai_text: str, email: str | None = None):
     now = datetime.utcnow().isoformat()
     chat_id = str(uuid.uuid4())
 
     new_turn = {
         "id": chat_id,
+        "timestamp": now,
         "user": {"text": user_text, "timestamp": now},
         "ai": {"text": ai_text, "timestamp": now},
     }
 
-    ref = db.collection("users").document(user_id)
-    ensure_user_document(user_id, email=email)
-    snap = ref.get()
-    data = snap.to_dict() or {}
-    chats = data.get("chats", [])
-    chats.append(new_turn)
-    ref.update({"chats": chats})
-    print(f"[Chat] Saved turn {chat_id} for {user_id}, total chats: {len(chats)}")
-
-    return chat_id
+    await ensure_user_document(user_id, email=email)
+    turn_path = f"{_chats_path(user_id)}/{chat_id}"
+    unit = _active_unit()
+    if unit is not None:
+        # Committed with the rest of the request's writes
+        unit.stage_set(turn_path, new_turn)
+        unit.stage_user(user_id, updates=_chat_meta_bump())
+    else:
+        with _span("commit", turn_path, writes=2):
+            await get_store().commit([
+                Write("set", turn_path, new_turn),
+                Write("update", _user_path(user_id), _chat_meta_bump()),
+            ])
+        _count(writes=2, commits=1, bytes_written=_doc_bytes(new_turn))
+    print(f"[Chat] Saved turn {chat_id} for {user_id}")
+
+    return new_turn
+
+
+async def get_chat_history(user_id: str, limit: int | None = None, before: str | None = None):
+    """
+    Return chat turns oldest-first. With `limit`, only the most recent `limit`
+    turns are returned; `before` is a turn id cursor to page further back.
+    """
+    with _span("query", _chats_path(user_id), limit=limit):
+        rows = await get_store().query(
+            _chats_path(user_id), order_by="timestamp", descending=True, start_after=before, limit=limit
+        )
+    if before:
+        _count(reads=1)
+    if rows is None:
+        return []
+    turns = [doc for _, doc in rows]
+    _count(reads=max(len(turns), 1), bytes_read=_doc_bytes(*turns))
+    turns.reverse()
+    return turns
 
 
-def get_chat_history(user_id: str, limit: int | None = None):
-    doc = db.collection("users").document(user_id).get()
-    if not doc.exists:
-        return []
-    data = doc.to_dict() or {}
-    chats = data.get("chats", [])
-    return chats[-limit:] if limit else chats
-
-
-def delete_chat_history(user_id: str):
-    ref = db.collection("users").document(user_id)
-    ensure_user_document(user_id)
-    ref.update({"chats": []})
-    print(f"[Chat] Cleared chats for {user_id}")
-
-
-def delete_single_message(user_id: str, message_id: str):
-    ref = db.collection("users").document(user_id)
-    snap = ref.get()
-    if not snap.exists:
-        return {"ok": False, "msg": "User not found"}
-    data = snap.to_dict() or {}
-    chats = [c for c in data.get("chats", []) if c.get("id") != message_id]
-    ref.update({"chats": chats})
+async def get_chat_turns_after(user_id: str, turn_id: str, limit: int | None = None):
+    """
+    Return turns newer than the turn `turn_id`, oldest-first. Returns None when
+    that turn no longer exists, so callers can fall back to a full reload.
+    """
+    with _span("query", _chats_path(user_id), limit=limit):
+        rows = await get_store().query(_chats_path(user_id), order_by="timestamp", start_after=turn_id, limit=limit)
+    _count(reads=1)
+    if rows is None:
+        return None
+    turns = [doc for _, doc in rows]
+    _count(reads=max(len(turns), 1), bytes_read=_doc_bytes(*turns))
+    return turns
+
+
+async def get_chat_turns_since(user_id: str, timestamp: str | None = None, limit: int | None = None):
+    """Return turns strictly newer than `timestamp`, oldest-first (all turns if None)."""
+    with _span("query", _chats_path(user_id), limit=limit):
+        rows = await get_store().query(
+            _chats_path(user_id),
+            order_by="timestamp",
+            where=("timestamp", ">", timestamp) if timestamp else None,
+            limit=limit,
+        )
+    turns = [doc for _, doc in rows]
+    _count(reads=max(len(turns), 1), bytes_read=_doc_bytes(*turns))
+    return turns
+
+
+async def _delete_chats(user_id: str) -> int:
+    """Delete every turn in users/{uid}/chats, a batch at a time."""
+    store = get_store()
+    deleted = 0
+    while True:
+        with _span("query", _chats_path(user_id), limit=BATCH_WRITE_LIMIT):
+            rows = await store.query(_chats_path(user_id), limit=BATCH_WRITE_LIMIT)
+        if not rows:
+            break
+        with _span("commit", _chats_path(user_id), writes=len(rows)):
+            await store.commit([Write("delete", f"{_chats_path(user_id)}/{turn_id}") for turn_id, _ in rows])
+        _count(reads=len(rows), writes=len(rows), commits=1)
+        deleted += len(rows)
+    return deleted
+
+
+async def delete_chat_history(user_id: str):
+    await ensure_user_document(user_id)
+    deleted = await _delete_chats(user_id)
+    await _write_user(user_id, updates={"memory": DELETE_FIELD, **_chat_meta_bump(reset=True)})
+    print(f"[Chat] Cleared {deleted} chats for {user_id}")
+
+
+async def delete_single_message(user_id: str, message_id: str):
+    store = get_store()
+    turn_path = f"{_chats_path(user_id)}/{message_id}"
+    _count(reads=1)
+    with _span("get", turn_path):
+        turn = await store.get(turn_path)
+    if turn is None:
+        return {"ok": False, "msg": "Message not found"}
+    with _span("commit", turn_path, writes=2):
+        await store.commit([
+            Write("delete", turn_path),
+            Write("update", _user_path(user_id), _chat_meta_bump(reset=True)),
+        ])
+    _count(writes=2, commits=1)
     print(f"[Chat] Deleted message {message_id} for {user_id}")
     return {"ok": True}
 
+
+async def migrate_chats_to_subcollection(user_id: str, chats: list | None = None):
+    """
+    Move a legacy `chats` array from users/{uid} into the chats subcollection
+    and drop the array field. Safe to re-run: turns are keyed by their id.
+    """
+    store = get_store()
+    if chats is None:
+        with _span("get", _user_path(user_id)):
+            data = await store.get(_user_path(user_id))
+        _count(reads=1)
+        if data is None:
+            return 0
+        chats = data.get("chats")
+        if chats is None:
+            return 0
+
+    writes = []
+    for index, turn in enumerate(chats if isinstance(chats, list) else []):
+        if not isinstance(turn, dict):
+            continue
+        turn_id = turn.get("id") or str(uuid.uuid4())
+        # Very old turns may lack timestamps; keep their array order instead
+        timestamp = (
+            turn.get("timestamp")
+            or turn.get("user", {}).get("timestamp")
+            or turn.get("ai", {}).get("timestamp")
+            or f"1970-01-01T00:00:00.{index:06d}"
+        )
+        writes.append(Write("set", f"{_chats_path(user_id)}/{turn_id}", {**turn, "id": turn_id, "timestamp": timestamp}))
+    moved = len(writes)
+
+    writes.append(Write("update", _user_path(user_id), {"chats": DELETE_FIELD, **_chat_meta_bump(reset=True)}))
+    for start in range(0, len(writes), BATCH_WRITE_LIMIT):
+        chunk = writes[start:start + BATCH_WRITE_LIMIT]
+        with _span("commit", _chats_path(user_id), writes=len(chunk)):
+            await store.commit(chunk)
+        _count(commits=1)
+    _count(writes=len(writes))
+    print(f"[Migrate] Moved {moved} chats for {user_id} into subcollection")
+    return moved
+
+
+async def delete_user_data(user_id: str):
+    """
+    Delete users/{uid} together with its chat turns. The user's queued
+    profile/memory job and buffered updates are discarded first; run after
+    the delete, they would recreate a partial document.
+    """
+    await profile_pipeline.cancel(user_id)
+    await write_batcher.discard(_user_path(user_id))
+    deleted = await _delete_chats(user_id)
+    with _span("delete", _user_path(user_id)):
+        await get_store().delete(_user_path(user_id))
+    _count(writes=1, commits=1)
+    print(f"[User] Deleted {user_id} and {deleted} chats")
+    return {"ok": True}
+
+
+def iter_users():
+    """(uid, document) for every user (`async for`), for batch jobs such as schema migrations."""
+    return get_store().stream("users")
+
+# -----------------------------------------------------
+# CONVERSATION MEMORY
+# -----------------------------------------------------
+async def get_conversation_memory(user_id: str):
+    """
+    Running summary of older turns. `summarized_through` is the timestamp of the
+    newest turn already folded into `summary`.
+    """
+    data = await get_user(user_id) or {}
+    stored = data.get("memory") or {}
+    return {
+        "summary": stored.get("summary", ""),
+        "summarized_through": stored.get("summarized_through"),
+        "summarized_turns": stored.get("summarized_turns", 0),
+    }
+
+
+async def save_conversation_memory(user_id: str, summary: str, summarized_through: str, summarized_turns: int):
+    await _write_user(user_id, updates={
+        "memory": {
+            "summary": summary,
+            "summarized_through": summarized_through,
+            "summarized_turns": summarized_turns,
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+    })
+    print(f"[Memory] Summary for {user_id} now covers {summarized_turns} turns")
+    return {"ok": True}
+
 # -----------------------------------------------------
 # PROFILE MANAGEMENT
 # -----------------------------------------------------
-def get_user_profile(user_id: str):
-    user_data = get_user(user_id)
+async def get_user_profile(user_id: str):
+    user_data = await get_user(user_id)
     if not user_data:
         return None
     profile = user_data.get("profile", {})
@@ -161,13 +553,24 @@ def get_user_profile(user_id: str):
     return {"email": user_data.get("email", ""), "profile": full_profile}
 
 
-def update_user_profile(user_id: str, updates: dict):
-    """Merge profile updates while preserving existing non-empty fields."""
-    ref = db.collection("users").document(user_id)
-    ensure_user_document(user_id)
-    snap = ref.get()
-    data = snap.to_dict() or {}
-    profile = data.get("profile", PROFILE_SKELETON.copy())
+async def get_profile_watermark(user_id: str):
+    """
+    Newest chat turn already run through profile extraction, as
+    {"turn_id", "timestamp"}; both None if nothing has been processed yet.
+    """
+    data = await get_user(user_id) or {}
+    meta = data.get("profile_meta") or {}
+    return {"turn_id": meta.get("turn_id"), "timestamp": meta.get("timestamp")}
+
+
+async def update_user_profile(user_id: str, updates: dict, watermark: dict | None = None):
+    """
+    Merge profile updates while preserving existing non-empty fields.
+    If `watermark` is given it is stored in the same write, so a patch and the
+    turns it was extracted from are always recorded together.
+    """
+    data = await ensure_user_document(user_id)
+    profile = copy.deepcopy(data.get("profile", PROFILE_SKELETON.copy()))
 
     for key, val in updates.items():
         if key not in PROFILE_SKELETON:
@@ -185,56 +588,145 @@ def update_user_profile(user_id: str, updates: dict):
         if k not in profile:
             profile[k] = v
 
-    ref.set({"profile": profile}, merge=True)
-    print(f"[Profile] Updated {user_id} → {profile}")
+    write = {"profile": profile}
+    if watermark:
+        write["profile_meta"] = {
+            "turn_id": watermark.get("turn_id"),
+            "timestamp": watermark.get("timestamp"),
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+    await _write_user(user_id, updates=write)
+    print(f"[Profile] Updated {user_id} → fields: {sorted(k for k, v in profile.items() if v)}")
     return {"ok": True, "profile": profile}
 
 # -----------------------------------------------------
 # COMPASS MANAGEMENT
 # -----------------------------------------------------
-def get_user_compass(user_id: str):
-    ensure_user_document(user_id)
-    doc = db.collection("users").document(user_id).get()
-    if not doc.exists:
-        return {}
-    data = doc.to_dict() or {}
+def _saved_path_field(slug: str, *parts: str) -> str:
+    # Skill names may contain dots ("Node.js"), so build a quoted field path
+    return field_path("compass", "saved_paths", slug, *parts)
+
+
+def path_progress(path: dict) -> int:
+    """Percent of a saved path's skills that are complete, from its stored counters."""
+    total = path.get("total_skills") or len(path.get("skills_status") or {})
+    completed = len(path.get("completed_skills") or [])
+    return min(100, round(completed * 100 / total)) if total else 0
+
+
+def saved_paths_list(saved_paths) -> list:
+    """
+    API shape of compass.saved_paths: a list in the order the paths were
+    added, each with its derived `progress`.
+    """
+    if isinstance(saved_paths, list):
+        return saved_paths
+    paths = [
+        p for p in (saved_paths or {}).values()
+        # Entries without a name are leftovers of a skill update that raced a removal
+        if isinstance(p, dict) and p.get("career_name")
+    ]
+    paths.sort(key=lambda p: p.get("added_at", ""))
+    return [{**p, "progress": path_progress(p)} for p in paths]
+
+
+def present_user(data: dict) -> dict:
+    """User document as the API returns it (saved paths as a list)."""
+    compass = data.get("compass")
+    if not isinstance(compass, dict):
+        return data
+    return {**data, "compass": {**compass, "saved_paths": saved_paths_list(compass.get("saved_paths"))}}
+
+
+async def get_user_compass(user_id: str):
+    data = await ensure_user_document(user_id)
     # Ensure the compass structure is valid before returning
     compass = data.get("compass", {})
     if not isinstance(compass, dict):
         return {"recommendations": [], "saved_paths": []}
-    if "recommendations" not in compass:
-        compass["recommendations"] = []
-    if "saved_paths" not in compass:
-        compass["saved_paths"] = []
-    return compass
+    return {
+        **compass,
+        "recommendations": compass.get("recommendations", []),
+        "saved_paths": saved_paths_list(compass.get("saved_paths")),
+    }
+
+
+async def add_saved_path(user_id: str, path: dict) -> str:
+    """Store a career path under its slug; returns the slug."""
+    slug = career_slug(path["career_name"])
+    await _write_user(user_id, updates={
+        _saved_path_field(slug): {**path, "slug": slug, "added_at": datetime.utcnow().isoformat()}
+    })
+    return slug
+
+
+async def remove_saved_path(user_id: str, career_name: str):
+    await _write_user(user_id, updates={_saved_path_field(career_slug(career_name)): DELETE_FIELD})
+    return {"ok": True}
+
+
+async def set_skill_status(user_id: str, career_name: str, skill: str, complete: bool, score: float | None = None):
+    """
+    Field-level update of one skill of a saved path: only the skill's own
+    fields plus the completed-skills set are written. ArrayUnion/ArrayRemove
+    keep the completed count right even when the same toggle is sent twice.
+
+    The path and skill must exist, otherwise nothing is written: a dotted
+    update would recreate a removed path as a nameless entry. The check
+    reads without flush-on-read, so checkbox bursts stay batched; buffered
+    updates only ever touch skills, never which paths exist. Documents below
+    the current schema version (saved paths still in an array) are upgraded
+    first, and the skill update is then staged behind the upgrade.
+    """
+    slug = career_slug(career_name)
+    data = await _load_user(user_id, flush=False)
+    upgrade = data is not None and schema.document_version(data) < schema.CURRENT_SCHEMA_VERSION
+    if upgrade:
+        data = await ensure_user_document(user_id)
+    path = ((data or {}).get("compass") or {}).get("saved_paths") or {}
+    path = path.get(slug) if isinstance(path, dict) else None
+    if not isinstance(path, dict) or not path.get("career_name"):
+        return {"ok": False, "msg": "Career path not found"}
+    if skill not in (path.get("skills_status") or {}):
+        return {"ok": False, "msg": "Skill not found in career path"}
+
+    updates = {
+        _saved_path_field(slug, "skills_status", skill, "status"): "complete" if complete else "pending",
+        _saved_path_field(slug, "completed_skills"): (
+            ArrayUnion([skill]) if complete else ArrayRemove([skill])
+        ),
+    }
+    if score is not None:
+        updates[_saved_path_field(slug, "skills_status", skill, "score")] = score
+    # Checkbox bursts are merged by the write-behind batcher; after an upgrade
+    # the update must be committed with it, in order
+    await _write_user(user_id, updates=updates, defer=not upgrade)
+    return {"ok": True}
 
 
-def update_compass_recommendations(user_id: str, recommendations: list):
+async def update_compass_recommendations(user_id: str, recommendations: list, fingerprint: str | None = None):
     """
-    Updates the 'recommendations' list in the user's compass document.
+    Updates the 'recommendations' list in the user's compass document, with the
+    fingerprint of the profile they were made for (see recommendation_cache).
     """
-    ensure_user_document(user_id)
-    ref = db.collection("users").document(user_id)
+    await ensure_user_document(user_id)
 
     update_data = {
         "compass.recommendations": recommendations,
+        "compass.fingerprint": fingerprint,
         "compass.lastUpdated": datetime.utcnow().isoformat()
     }
 
-    ref.update(update_data)
+    await _write_user(user_id, updates=update_data)
     print(f"[Compass] Updated {user_id} with {len(recommendations)} recommendations")
     return {"ok": True, "count": len(recommendations)}
 
 # -----------------------------------------------------
 # COMBINED ACCESS
 # -----------------------------------------------------
-def get_full_user_data(user_id: str):
+async def get_full_user_data(user_id: str):
     """Return unified data block: profile + compass + email."""
-    ensure_user_document(user_id)
-    doc = db.collection("users").document(user_id).get()
-    if not doc.exists:
-        return {}
-    data = doc.to_dict() or {}
+    data = await ensure_user_document(user_id)
     return {
         "email": data.get("email", ""),
         "profile": data.get("profile", PROFILE_SKELETON.copy()),
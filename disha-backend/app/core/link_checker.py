@@ -0,0 +1,173 @@
+# app/core/link_checker.py
+"""
+Link checker for forge learning resources.
+
+- one pooled `httpx.AsyncClient` shared by every check, with a cap on
+  concurrent checks per host
+- an overall deadline per batch; links still pending at the deadline are
+  dropped (and not cached)
+- positive and negative results cached with separate TTLs, so retries and
+  repeated lookups do not hit the network again
+- a ranged GET fallback for servers that reject HEAD
+- early return once enough valid links have been found
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core import tracing
+from app.core.config import (
+    LINK_CHECK_BATCH_DEADLINE_SECONDS,
+    LINK_CHECK_CACHE_MAX_ENTRIES,
+    LINK_CHECK_MAX_CONNECTIONS,
+    LINK_CHECK_NEGATIVE_TTL_SECONDS,
+    LINK_CHECK_PER_HOST,
+    LINK_CHECK_POSITIVE_TTL_SECONDS,
+    LINK_CHECK_TIMEOUT_SECONDS,
+)
+
+# Statuses some servers return for HEAD even though GET works
+HEAD_REJECTED_STATUSES = {400, 403, 405, 501}
+USER_AGENT = "Mozilla/5.0 (compatible; DishaGuideLinkChecker/1.0)"
+
+
+class LinkChecker:
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        # url -> (is_valid, expires_at)
+        self._cache: "OrderedDict[str, tuple[bool, float]]" = OrderedDict()
+        self.stats = {"checks": 0, "cache_hits": 0, "head_fallbacks": 0, "errors": 0, "deadline_dropped": 0}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                follow_redirects=True,
+                timeout=httpx.Timeout(LINK_CHECK_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=LINK_CHECK_MAX_CONNECTIONS,
+                    max_keepalive_connections=LINK_CHECK_MAX_CONNECTIONS // 2,
+                ),
+                headers={"User-Agent": USER_AGENT},
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # -------------------------------------------------
+    # Result cache
+    # -------------------------------------------------
+    def _cached(self, url: str) -> Optional[bool]:
+        entry = self._cache.get(url)
+        if entry is None:
+            return None
+        is_valid, expires_at = entry
+        if expires_at <= time.time():
+            del self._cache[url]
+            return None
+        self._cache.move_to_end(url)
+        return is_valid
+
+    def _remember(self, url: str, is_valid: bool):
+        ttl = LINK_CHECK_POSITIVE_TTL_SECONDS if is_valid else LINK_CHECK_NEGATIVE_TTL_SECONDS
+        self._cache[url] = (is_valid, time.time() + ttl)
+        self._cache.move_to_end(url)
+        while len(self._cache) > LINK_CHECK_CACHE_MAX_ENTRIES:
+            self._cache.popitem(last=False)
+
+    # -------------------------------------------------
+    # Checks
+    # -------------------------------------------------
+    async def _probe(self, url: str) -> bool:
+        client = self._get_client()
+        attributes = {"http.request.method": "HEAD", "url.full": url, "server.address": urlsplit(url).hostname}
+        with tracing.span("link_check.head", attributes, kind="client") as span:
+            response = await client.head(url)
+            span.set_attribute("http.response.status_code", response.status_code)
+            if response.status_code in HEAD_REJECTED_STATUSES:
+                # Ask for a single byte and close without reading the body
+                self.stats["head_fallbacks"] += 1
+                async with client.stream("GET", url, headers={"Range": "bytes=0-0"}) as streamed:
+                    span.set_attributes({"link_check.get_fallback": True, "http.response.status_code": streamed.status_code})
+                    return streamed.status_code < 400
+            return response.status_code < 400
+
+    async def check(self, url: str, use_cache: bool = True) -> bool:
+        """Whether `url` currently resolves to a non-error response."""
+        if use_cache:
+            cached = self._cached(url)
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+                return cached
+
+        parts = urlsplit(url or "")
+        if parts.scheme not in ("http", "https") or not parts.netloc:
+            self._remember(url, False)
+            return False
+
+        host = parts.netloc.lower()
+        semaphore = self._host_semaphores.setdefault(host, asyncio.Semaphore(LINK_CHECK_PER_HOST))
+        self.stats["checks"] += 1
+        async with semaphore:
+            try:
+                is_valid = await self._probe(url)
+            except Exception as e:
+                # Network errors, timeouts and malformed URLs all count as broken links
+                self.stats["errors"] += 1
+                print(f"URL validation failed for {url}: {e}")
+                is_valid = False
+        self._remember(url, is_valid)
+        return is_valid
+
+    async def filter_valid(
+        self,
+        resources: List[dict],
+        enough: Optional[int] = None,
+        deadline: float = LINK_CHECK_BATCH_DEADLINE_SECONDS,
+        use_cache: bool = True,
+    ) -> List[dict]:
+        """
+        Return the resources whose "url" validates, in their original order.
+        Stops as soon as `enough` are valid or when `deadline` seconds pass.
+        """
+        if not resources:
+            return []
+
+        tasks = {
+            asyncio.create_task(self.check(r.get("url", ""), use_cache=use_cache)): index
+            for index, r in enumerate(resources)
+        }
+        found = 0
+        try:
+            for next_done in asyncio.as_completed(tasks, timeout=deadline):
+                if await next_done:
+                    found += 1
+                    if enough and found >= enough:
+                        break
+        except asyncio.TimeoutError:
+            pending = sum(1 for t in tasks if not t.done())
+            self.stats["deadline_dropped"] += pending
+            print(f"[LinkChecker] Batch deadline hit; dropped {pending} unchecked links")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        valid = sorted(
+            index for task, index in tasks.items()
+            if task.done() and not task.cancelled() and task.exception() is None and task.result()
+        )
+        return [resources[i] for i in valid]
+
+    def snapshot(self) -> dict:
+        return {"cached_urls": len(self._cache), "hosts": len(self._host_semaphores), **self.stats}
+
+
+link_checker = LinkChecker()
@@ -0,0 +1,448 @@
+# app/core/llm.py
+"""
+Single gateway for every Gemini call made by the backend.
+
+Routers never build `GenerativeModel`s or HTTP clients themselves; they call
+`generate_text(profile, prompt)` (SDK models) or `generate_rest(profile, payload)`
+(raw REST, e.g. google_search grounding) with a registered profile name.
+
+The gateway provides:
+- non-blocking calls (`generate_content_async`, a shared pooled `httpx.AsyncClient`)
+- a global and a per-profile concurrency semaphore
+- a deadline per call that covers queueing and retries
+- jittered exponential retry on 429 / 503; the backoff sleep holds no
+  concurrency slot, so a failing upstream does not block healthy calls
+- latency, token usage, error and retry counters per profile
+"""
+import asyncio
+import contextlib
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+import httpx
+from google.api_core import exceptions as google_exceptions
+
+from app.core import metrics, prompts, tracing
+from app.core.config import (
+    GEMINI_API_KEY,
+    GEMINI_MODEL,
+    LLM_DEFAULT_DEADLINE_SECONDS,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+)
+from app.core.services import services
+
+if TYPE_CHECKING:
+    import google.generativeai as genai
+
+GEMINI_REST_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+
+RETRYABLE_STATUS_CODES = {429, 503}
+RETRYABLE_SDK_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+)
+
+
+class LLMError(Exception):
+    """Raised when a gateway call misses its deadline or exhausts its retries."""
+
+
+# -----------------------------------------------------
+# PROFILES
+# -----------------------------------------------------
+@dataclass
+class ModelProfile:
+    name: str
+    model_name: str = GEMINI_MODEL
+    system_instruction: Optional[str] = None
+    max_concurrency: int = 8
+    deadline_seconds: float = LLM_DEFAULT_DEADLINE_SECONDS
+    stats: Dict[str, Any] = field(default_factory=lambda: {
+        "calls": 0,
+        "errors": 0,
+        "retries": 0,
+        "timeouts": 0,
+        "tokens_in": 0,
+        "tokens_out": 0,
+        "latency_seconds_total": 0.0,
+        "latency_seconds_max": 0.0,
+        "streams": 0,
+        "streams_cancelled": 0,
+        "ttft_count": 0,
+        "ttft_seconds_total": 0.0,
+        "ttft_seconds_max": 0.0,
+    })
+
+
+_profiles: Dict[str, ModelProfile] = {}
+_models: Dict[str, "genai.GenerativeModel"] = {}
+_profile_semaphores: Dict[str, asyncio.Semaphore] = {}
+_global_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def register_profile(name: str, **kwargs) -> ModelProfile:
+    """Register (or replace) a named model profile."""
+    profile = ModelProfile(name=name, **kwargs)
+    _profiles[name] = profile
+    _profile_semaphores[name] = asyncio.Semaphore(profile.max_concurrency)
+    _models.pop(name, None)
+    return profile
+
+
+def start() -> None:
+    """
+    Fresh semaphores for this event loop; called from the app lifespan. An
+    asyncio.Semaphore binds to the first loop that waits on it, and tests and
+    benchmarks may run several app lifespans, each on its own loop.
+    """
+    global _global_semaphore
+    _global_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    for name, profile in _profiles.items():
+        _profile_semaphores[name] = asyncio.Semaphore(profile.max_concurrency)
+
+
+def get_profile(name: str) -> ModelProfile:
+    try:
+        return _profiles[name]
+    except KeyError:
+        raise LLMError(f"Unknown model profile '{name}'")
+
+
+def _gemini_sdk():
+    # The SDK import alone takes about half a second; keep it out of app import
+    import google.generativeai as genai
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai
+
+
+services.register("gemini", _gemini_sdk)
+
+
+def _get_model(profile: ModelProfile) -> "genai.GenerativeModel":
+    """Build the SDK model for a profile on first use."""
+    model = _models.get(profile.name)
+    if model is None:
+        genai = services.get("gemini")
+        model = genai.GenerativeModel(profile.model_name, system_instruction=profile.system_instruction)
+        _models[profile.name] = model
+    return model
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Shared pooled client for REST calls to the Gemini API."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY * 2, max_keepalive_connections=LLM_MAX_CONCURRENCY),
+            timeout=httpx.Timeout(LLM_DEFAULT_DEADLINE_SECONDS, connect=10),
+        )
+    return _http_client
+
+
+async def aclose():
+    """Close pooled connections; called from the app lifespan on shutdown."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+# -----------------------------------------------------
+# HELPERS
+# -----------------------------------------------------
+def extract_text(resp) -> str:
+    """Best-effort text extraction from an SDK response."""
+    try:
+        if getattr(resp, "text", None):
+            return resp.text
+    except Exception:
+        pass
+    try:
+        candidates = getattr(resp, "candidates", None)
+        if candidates:
+            cand = candidates[0]
+            content = getattr(cand, "content", None)
+            if isinstance(content, str):
+                return content
+            if isinstance(content, list):
+                return " ".join(
+                    p if isinstance(p, str) else p.get("text") or str(p)
+                    for p in content
+                )
+    except Exception:
+        pass
+    return str(resp)
+
+
+def extract_json_object(text: str) -> dict | None:
+    """Parse the outermost {...} block of a model reply, or None."""
+    try:
+        json_start = text.find('{')
+        json_end = text.rfind('}') + 1
+        if json_start == -1 or json_end == 0:
+            return None
+        return json.loads(text[json_start:json_end])
+    except (json.JSONDecodeError, IndexError):
+        return None
+
+
+def _chunk_text(chunk) -> str:
+    """Text of one streamed chunk; chunks without text parts yield ""."""
+    try:
+        return chunk.text or ""
+    except Exception:
+        return ""
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff: 0..(0.5 * 2^attempt) seconds, capped at 8s."""
+    return random.uniform(0, min(8.0, 0.5 * (2 ** attempt)))
+
+
+def _record_usage(profile: ModelProfile, tokens_in: int, tokens_out: int, span=None):
+    profile.stats["tokens_in"] += tokens_in or 0
+    profile.stats["tokens_out"] += tokens_out or 0
+    usage = {"gen_ai.usage.input_tokens": tokens_in or 0, "gen_ai.usage.output_tokens": tokens_out or 0}
+    if span is not None:
+        span.set_attributes(usage)
+    else:
+        tracing.set_attributes(usage)
+
+
+def _span_attributes(profile: ModelProfile) -> dict:
+    return {"gen_ai.system": "gemini", "gen_ai.request.model": profile.model_name, "llm.profile": profile.name}
+
+
+@contextlib.asynccontextmanager
+async def _slots(profile: ModelProfile):
+    """Hold one global and one per-profile concurrency slot."""
+    async with _global_semaphore, _profile_semaphores[profile.name]:
+        yield
+
+
+async def _call_with_policy(profile: ModelProfile, attempt_fn, is_retryable, deadline: Optional[float]):
+    """Run `attempt_fn` under the semaphores, deadline and retry policy of `profile`."""
+    budget = deadline or profile.deadline_seconds
+    started = time.perf_counter()
+    profile.stats["calls"] += 1
+
+    async def _run():
+        attempt = 0
+        while True:
+            tracing.set_attributes({"llm.attempts": attempt + 1})
+            async with _slots(profile):
+                try:
+                    return await attempt_fn()
+                except Exception as e:
+                    if not is_retryable(e) or attempt >= LLM_MAX_RETRIES:
+                        raise
+                    profile.stats["retries"] += 1
+                    delay = _backoff_delay(attempt)
+                    print(f"[LLM] {profile.name} got a retryable error ({e}); retrying in {delay:.2f}s")
+            # Back off without holding the slots
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    outcome = "error"
+    with tracing.span("gemini.generate_content", _span_attributes(profile), kind="client") as span:
+        try:
+            result = await asyncio.wait_for(_run(), timeout=budget)
+            outcome = "ok"
+            return result
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            profile.stats["timeouts"] += 1
+            profile.stats["errors"] += 1
+            raise LLMError(f"{profile.name} call exceeded its {budget:g}s deadline")
+        except Exception:
+            profile.stats["errors"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            profile.stats["latency_seconds_total"] += elapsed
+            profile.stats["latency_seconds_max"] = max(profile.stats["latency_seconds_max"], elapsed)
+            metrics.LLM_LATENCY.observe(elapsed, profile=profile.name, outcome=outcome)
+            span.set_attribute("llm.outcome", outcome)
+
+# -----------------------------------------------------
+# PUBLIC API
+# -----------------------------------------------------
+async def generate(profile_name: str, prompt, deadline: Optional[float] = None, **kwargs):
+    """Non-blocking `generate_content` for a registered profile; returns the SDK response."""
+    profile = get_profile(profile_name)
+    model = _get_model(profile)
+
+    async def attempt():
+        resp = await model.generate_content_async(prompt, **kwargs)
+        usage = getattr(resp, "usage_metadata", None)
+        if usage is not None:
+            _record_usage(profile, getattr(usage, "prompt_token_count", 0), getattr(usage, "candidates_token_count", 0))
+        return resp
+
+    return await _call_with_policy(profile, attempt, lambda e: isinstance(e, RETRYABLE_SDK_ERRORS), deadline)
+
+
+async def generate_text(profile_name: str, prompt, deadline: Optional[float] = None, **kwargs) -> str:
+    """Like `generate`, but returns the response text."""
+    resp = await generate(profile_name, prompt, deadline=deadline, **kwargs)
+    return extract_text(resp)
+
+
+async def generate_rest(profile_name: str, payload: dict, deadline: Optional[float] = None) -> dict:
+    """
+    POST a raw `generateContent` payload (for features the SDK model does not
+    expose, such as google_search grounding) over the shared HTTP pool.
+    Non-retryable HTTP errors surface as `httpx.HTTPStatusError`.
+    """
+    profile = get_profile(profile_name)
+    url = GEMINI_REST_URL.format(model=profile.model_name)
+    headers = {"Content-Type": "application/json"}
+    if GEMINI_API_KEY:
+        headers["x-goog-api-key"] = GEMINI_API_KEY
+
+    async def attempt():
+        response = await _get_http_client().post(url, json=payload, headers=headers)
+        response.raise_for_status()
+        data = response.json()
+        usage = data.get("usageMetadata", {})
+        _record_usage(profile, usage.get("promptTokenCount", 0), usage.get("candidatesTokenCount", 0))
+        return data
+
+    def is_retryable(e):
+        return isinstance(e, httpx.HTTPStatusError) and e.response.status_code in RETRYABLE_STATUS_CODES
+
+    return await _call_with_policy(profile, attempt, is_retryable, deadline)
+
+
+async def stream(profile_name: str, prompt, deadline: Optional[float] = None, **kwargs):
+    """
+    Stream reply text chunks for a registered profile as they arrive.
+
+    Retries (429/503) only happen before the first chunk. Time-to-first-token
+    is recorded per profile. Close the generator (e.g. with
+    `contextlib.aclosing`) to abandon the stream; its slots are released.
+    """
+    profile = get_profile(profile_name)
+    model = _get_model(profile)
+    budget = deadline or profile.deadline_seconds
+    started = time.perf_counter()
+    profile.stats["calls"] += 1
+    profile.stats["streams"] += 1
+
+    def remaining() -> float:
+        left = budget - (time.perf_counter() - started)
+        if left <= 0:
+            raise asyncio.TimeoutError()
+        return left
+
+    # Spans the whole stream, so it is ended by hand rather than made current
+    span = tracing.start_span("gemini.stream_generate_content", _span_attributes(profile), kind="client")
+    completed = False
+    outcome = "error"
+    try:
+        # The slots are held for the whole stream, but released during backoff
+        async with contextlib.AsyncExitStack() as slots:
+            attempt = 0
+            while True:
+                await slots.enter_async_context(_slots(profile))
+                try:
+                    resp = await asyncio.wait_for(
+                        model.generate_content_async(prompt, stream=True, **kwargs), timeout=remaining()
+                    )
+                    chunks = resp.__aiter__()
+                    first = await asyncio.wait_for(chunks.__anext__(), timeout=remaining())
+                    break
+                except StopAsyncIteration:
+                    completed = True
+                    return
+                except RETRYABLE_SDK_ERRORS as e:
+                    if attempt >= LLM_MAX_RETRIES:
+                        raise
+                    profile.stats["retries"] += 1
+                    delay = _backoff_delay(attempt)
+                    print(f"[LLM] {profile.name} stream got a retryable error ({e}); retrying in {delay:.2f}s")
+                    attempt += 1
+                    await slots.aclose()
+                    await asyncio.sleep(min(delay, remaining()))
+
+            ttft = time.perf_counter() - started
+            profile.stats["ttft_count"] += 1
+            profile.stats["ttft_seconds_total"] += ttft
+            profile.stats["ttft_seconds_max"] = max(profile.stats["ttft_seconds_max"], ttft)
+            span.set_attributes({"llm.attempts": attempt + 1, "llm.ttft_ms": round(ttft * 1000, 1)})
+
+            chunk = first
+            while True:
+                text = _chunk_text(chunk)
+                if text:
+                    yield text
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=remaining())
+                except StopAsyncIteration:
+                    break
+
+            usage = getattr(resp, "usage_metadata", None)
+            if usage is not None:
+                _record_usage(
+                    profile, getattr(usage, "prompt_token_count", 0), getattr(usage, "candidates_token_count", 0), span=span
+                )
+            completed = True
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        profile.stats["timeouts"] += 1
+        profile.stats["errors"] += 1
+        raise LLMError(f"{profile.name} stream exceeded its {budget:g}s deadline")
+    except GeneratorExit:
+        # Consumer went away (e.g. client disconnected)
+        outcome = "cancelled"
+        profile.stats["streams_cancelled"] += 1
+        raise
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        profile.stats["streams_cancelled"] += 1
+        raise
+    except Exception as e:
+        profile.stats["errors"] += 1
+        span.record_exception(e)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        profile.stats["latency_seconds_total"] += elapsed
+        profile.stats["latency_seconds_max"] = max(profile.stats["latency_seconds_max"], elapsed)
+        metrics.LLM_LATENCY.observe(elapsed, profile=profile.name, outcome="ok" if completed else outcome)
+        span.set_attribute("llm.outcome", "ok" if completed else outcome)
+        span.end()
+        if not completed:
+            print(f"[LLM] {profile.name} stream ended early after {elapsed:.2f}s")
+
+
+def snapshot() -> dict:
+    """Per-profile call counters, latency and token usage."""
+    result = {}
+    for name, profile in _profiles.items():
+        stats = dict(profile.stats)
+        calls = stats["calls"]
+        stats["latency_seconds_avg"] = round(stats["latency_seconds_total"] / calls, 3) if calls else 0.0
+        stats["latency_seconds_total"] = round(stats["latency_seconds_total"], 3)
+        stats["latency_seconds_max"] = round(stats["latency_seconds_max"], 3)
+        stats["ttft_seconds_avg"] = round(stats["ttft_seconds_total"] / stats["ttft_count"], 3) if stats["ttft_count"] else 0.0
+        stats["ttft_seconds_total"] = round(stats["ttft_seconds_total"], 3)
+        stats["ttft_seconds_max"] = round(stats["ttft_seconds_max"], 3)
+        result[name] = {"model": profile.model_name, **stats}
+    return result
+
+# -----------------------------------------------------
+# REGISTERED PROFILES
+# -----------------------------------------------------
+register_profile("chat", system_instruction=prompts.CHAT_MODEL_INSTRUCTION, max_concurrency=12, deadline_seconds=30)
+register_profile("profile", system_instruction=prompts.PROFILE_EXTRACTION_INSTRUCTION, max_concurrency=4, deadline_seconds=30)
+register_profile("career", system_instruction=prompts.CAREER_RECOMMENDATION_INSTRUCTION, max_concurrency=4, deadline_seconds=45)
+register_profile("summary", system_instruction=prompts.CONVERSATION_SUMMARY_INSTRUCTION, max_concurrency=4, deadline_seconds=30)
+register_profile("quiz", max_concurrency=6, deadline_seconds=45)
+register_profile("feedback", max_concurrency=6, deadline_seconds=30)
+register_profile("resources", max_concurrency=4, deadline_seconds=60)
@@ -0,0 +1,66 @@
+# app/core/memory.py
+"""
+Conversation memory helpers.
+
+The chat prompt is built from a stored running summary of older turns plus a
+sliding window of the most recent turns, so its size stays bounded no matter
+how long a student has been talking. Everything here is pure (no Firestore,
+no Gemini) so it can be benchmarked in isolation.
+"""
+from typing import List, Dict, Any
+
+# Rough chars-per-token ratio for Gemini on English text; good enough for budgeting.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for prompt budgeting."""
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "head") -> str:
+    """Trim text to roughly `max_tokens`, keeping its start ("head") or end ("tail")."""
+    max_chars = max(max_tokens, 0) * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    if keep == "tail":
+        return "…" + text[-max_chars:]
+    return text[:max_chars] + "…"
+
+
+def format_turn(turn: Dict[str, Any]) -> str:
+    """Render one stored chat turn as transcript lines."""
+    lines = []
+    if turn.get("user", {}).get("text"):
+        lines.append(f"User: {turn['user']['text']}")
+    if turn.get("ai", {}).get("text"):
+        lines.append(f"AI: {turn['ai']['text']}")
+    return "\n".join(lines)
+
+
+def format_turns(turns: List[Dict[str, Any]]) -> str:
+    return "\n".join(text for text in (format_turn(t) for t in turns) if text)
+
+
+def fit_turns_to_budget(turns: List[Dict[str, Any]], max_tokens: int) -> str:
+    """
+    Render as many of the most recent turns as fit in `max_tokens`, dropping
+    the oldest first. The newest turn is always kept (tail-truncated if needed).
+    """
+    kept: List[str] = []
+    used = 0
+    for turn in reversed(turns):
+        text = format_turn(turn)
+        if not text:
+            continue
+        cost = estimate_tokens(text)
+        if used + cost > max_tokens:
+            if not kept:
+                kept.append(truncate_to_tokens(text, max_tokens, keep="tail"))
+            break
+        kept.append(text)
+        used += cost
+    kept.reverse()
+    return "\n".join(kept)
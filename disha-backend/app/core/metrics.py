@@ -0,0 +1,351 @@
+# app/core/metrics.py
+"""
+Minimal Prometheus metrics registry, served as text at GET /metrics (bearer
+STATUS_TOKEN, like the /ping status endpoints).
+
+Request-path code updates counters, gauges and histograms directly (HTTP
+middleware, LLM gateway, Firestore unit of work). Components that already
+keep their own counters (LLM profiles, background schedulers, caches, the
+write batcher, the event hub) are read at scrape time by `_collect_components`, so they need
+no extra bookkeeping.
+
+Only what the exposition format needs is implemented: labelled counters,
+gauges and histograms, rendered in text format 0.0.4.
+"""
+import abc
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers fast cached reads up to slow Gemini calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    @abc.abstractmethod
+    def samples(self) -> Iterable[Sample]:
+        ...
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, self._labels(key), value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, self._labels(key), value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> [per-bucket counts, sum, count]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total, n)) for key, (counts, total, n) in self._values.items()]
+        for key, (counts, total, n) in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(float(bound))}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, n
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector) -> None:
+        """`collector()` yields (name, type, help, [(labels, value), ...]) at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"[Metrics] Collector {getattr(collector, '__name__', collector)} failed: {e}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+# -----------------------------------------------------
+# REQUEST-PATH METRICS
+# -----------------------------------------------------
+HTTP_REQUESTS = counter("disha_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+HTTP_LATENCY = histogram(
+    "disha_http_request_duration_seconds", "Time until the response starts, by route.", ("method", "route")
+)
+HTTP_IN_FLIGHT = gauge("disha_http_requests_in_flight", "Requests currently being handled, by route.", ("method", "route"))
+
+LLM_LATENCY = histogram(
+    "disha_llm_call_duration_seconds",
+    "Gemini call latency per model profile, including queueing and retries.",
+    ("profile", "outcome"),
+)
+
+FIRESTORE_READS = counter("disha_firestore_reads_total", "Documents read, by route ('background' outside requests).", ("route",))
+FIRESTORE_WRITES = counter("disha_firestore_writes_total", "Documents written, by route.", ("route",))
+FIRESTORE_COMMITS = counter("disha_firestore_commits_total", "Batch commits, by route.", ("route",))
+FIRESTORE_BYTES_READ = counter("disha_firestore_read_bytes_total", "Approximate bytes of documents read, by route.", ("route",))
+FIRESTORE_BYTES_WRITTEN = counter("disha_firestore_written_bytes_total", "Approximate bytes of documents written, by route.", ("route",))
+
+
+def record_firestore(route: str, stats: dict) -> None:
+    """Add a unit of work's operation counts (see firestore_utils) under `route`."""
+    if stats.get("reads"):
+        FIRESTORE_READS.inc(stats["reads"], route=route)
+    if stats.get("writes"):
+        FIRESTORE_WRITES.inc(stats["writes"], route=route)
+    if stats.get("commits"):
+        FIRESTORE_COMMITS.inc(stats["commits"], route=route)
+    if stats.get("bytes_read"):
+        FIRESTORE_BYTES_READ.inc(stats["bytes_read"], route=route)
+    if stats.get("bytes_written"):
+        FIRESTORE_BYTES_WRITTEN.inc(stats["bytes_written"], route=route)
+
+# -----------------------------------------------------
+# COMPONENT SNAPSHOTS (read at scrape time)
+# -----------------------------------------------------
+def _family(name, kind, documentation, samples):
+    return name, kind, documentation, list(samples)
+
+
+def _collect_components():
+    from app.core import llm, quiz_pool, recommendation_cache, resource_cache
+    from app.core.admission import admission
+    from app.core.background import profile_pipeline
+    from app.core.events import event_hub
+    from app.core.link_checker import link_checker
+    from app.core.security import token_cache_snapshot
+    from app.core.write_batcher import write_batcher
+
+    profiles = llm.snapshot()
+    for stat, name, documentation in (
+        ("calls", "disha_llm_calls_total", "Gemini calls per model profile."),
+        ("errors", "disha_llm_errors_total", "Failed Gemini calls per model profile."),
+        ("retries", "disha_llm_retries_total", "Retried Gemini attempts (429/503) per model profile."),
+        ("timeouts", "disha_llm_timeouts_total", "Gemini calls that missed their deadline."),
+        ("streams_cancelled", "disha_llm_streams_cancelled_total", "Streamed replies abandoned by the client."),
+    ):
+        yield _family(name, "counter", documentation, (({"profile": p}, s[stat]) for p, s in profiles.items()))
+    yield _family(
+        "disha_llm_tokens_total", "counter", "Prompt (in) and reply (out) tokens per model profile.",
+        [({"profile": p, "direction": "in"}, s["tokens_in"]) for p, s in profiles.items()]
+        + [({"profile": p, "direction": "out"}, s["tokens_out"]) for p, s in profiles.items()],
+    )
+
+    schedulers = {
+        "profile_pipeline": profile_pipeline.snapshot(),
+        "quiz_warmer": quiz_pool.quiz_warmer.snapshot(),
+        "resource_refresher": resource_cache.refresher.snapshot(),
+    }
+    yield _family(
+        "disha_background_queue_depth", "gauge", "Jobs waiting to start, per background scheduler.",
+        (({"scheduler": n}, s["queue_depth"]) for n, s in schedulers.items()),
+    )
+    yield _family(
+        "disha_background_running", "gauge", "Jobs running, per background scheduler.",
+        (({"scheduler": n}, s["running"]) for n, s in schedulers.items()),
+    )
+    yield _family(
+        "disha_background_oldest_pending_seconds", "gauge", "Age of the oldest job waiting to start.",
+        (({"scheduler": n}, s["oldest_pending_seconds"]) for n, s in schedulers.items()),
+    )
+    yield _family(
+        "disha_background_jobs_total", "counter", "Background jobs by outcome.",
+        [
+            ({"scheduler": n, "outcome": outcome}, s[outcome])
+            for n, s in schedulers.items()
+            for outcome in ("submitted", "coalesced", "completed", "failed", "dropped")
+        ],
+    )
+
+    batcher = write_batcher.snapshot()
+    yield _family("disha_write_batcher_pending_documents", "gauge", "Documents with buffered updates.", [({}, batcher["pending_documents"])])
+    yield _family("disha_write_batcher_committed_writes_total", "counter", "Buffered updates committed.", [({}, batcher["committed_writes"])])
+    yield _family("disha_write_batcher_failed_total", "counter", "Buffered updates that failed permanently (recorded in write_failures).", [({}, batcher["failed"])])
+
+    hub = event_hub.snapshot()
+    yield _family("disha_event_streams_open", "gauge", "Open server-sent event streams.", [({}, hub["subscribers"])])
+    yield _family(
+        "disha_events_total", "counter", "Push events by outcome (delivered and dropped count per stream).",
+        (({"outcome": outcome}, hub[outcome]) for outcome in ("published", "delivered", "dropped", "publish_errors")),
+    )
+
+    tokens = token_cache_snapshot()
+    quizzes = quiz_pool.snapshot()
+    resources = resource_cache.snapshot()
+    links = link_checker.snapshot()
+    recommendations = recommendation_cache.snapshot()
+    caches = {
+        "auth_token": (tokens["hits"], tokens["misses"]),
+        "quiz_pool": (quizzes["hits"], quizzes["misses"]),
+        "resources": (resources["hits"] + resources["stale_hits"] + resources["joined"], resources["misses"]),
+        "link_checker": (links["cache_hits"], links["checks"]),
+        "recommendations": (recommendations["hits"] + recommendations["joined"], recommendations["misses"]),
+    }
+    yield _family("disha_cache_hits_total", "counter", "Cache hits per cache.", (({"cache": c}, h) for c, (h, _) in caches.items()))
+    yield _family("disha_cache_misses_total", "counter", "Cache misses per cache.", (({"cache": c}, m) for c, (_, m) in caches.items()))
+    yield _family(
+        "disha_cache_hit_ratio", "gauge", "Hits / lookups since start, per cache.",
+        (({"cache": c}, round(h / (h + m), 4) if h + m else 0.0) for c, (h, m) in caches.items()),
+    )
+
+    yield _family(
+        "disha_recommendations_unchanged_total", "counter",
+        "Recommendation updates skipped because the profile fingerprint did not change.",
+        [({}, recommendations["unchanged"])],
+    )
+
+    route_classes = admission.snapshot()["classes"]
+    yield _family(
+        "disha_admission_limit", "gauge", "Current adaptive concurrency limit per route class.",
+        (({"route_class": n}, c["limit"]) for n, c in route_classes.items()),
+    )
+    yield _family(
+        "disha_admission_in_flight", "gauge", "Admitted requests running per route class.",
+        (({"route_class": n}, c["in_flight"]) for n, c in route_classes.items()),
+    )
+    yield _family(
+        "disha_admission_queue_depth", "gauge", "Requests waiting for admission per route class.",
+        (({"route_class": n}, c["queued"]) for n, c in route_classes.items()),
+    )
+    yield _family(
+        "disha_admission_rejected_total", "counter", "Requests shed with 503, by route class and reason.",
+        [
+            ({"route_class": n, "reason": reason}, c["stats"][f"rejected_{reason}"])
+            for n, c in route_classes.items()
+            for reason in ("queue_full", "timeout")
+        ],
+    )
+
+
+REGISTRY.add_collector(_collect_components)
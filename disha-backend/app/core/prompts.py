@@ -3,6 +3,9 @@ import json
 from typing import List, Dict, Any
 import re
 
+from app.core import memory
+from app.core.config import CHAT_PROMPT_TOKEN_BUDGET, CHAT_SUMMARY_MAX_TOKENS
+
 # -----------------------------------------------------
 # HELPER FUNCTIONS
 # -----------------------------------------------------
@@ -38,14 +41,16 @@ not robotic answers.
 """
 
 PROFILE_EXTRACTION_INSTRUCTION = """
-You are a data extractor. From the given conversation between an AI career guide and a student, extract a structured JSON object ONLY with the keys:
+You are a data extractor. You are given a student's current stored profile and their newest messages to an AI career guide.
+Return a JSON patch containing ONLY what the new messages add or change, using only these keys:
 {
   "name": "string or null",
   "education": "string or null",
-  "interests": ["list of strings"],
-  "skills": ["list of strings"],
+  "interests": ["list of NEW strings only"],
+  "skills": ["list of NEW strings only"],
   "career_goals": "string or null"
 }
+Use null or an empty list for anything the new messages do not mention. Do not repeat values already in the profile.
 Respond with **valid JSON only**, no explanations.
 """
 
@@ -62,15 +67,29 @@ Respond with **valid JSON array only**
 no text before or after.
 """
 
+CONVERSATION_SUMMARY_INSTRUCTION = f"""
+You maintain the running memory of a conversation between 'Disha Guide', an AI career mentor, and an Indian student.
+Given the existing summary and a batch of newer conversation turns, return an updated summary that:
+1. Keeps every durable fact about the student (name, education, interests, skills, goals, constraints, careers discussed).
+2. Notes what the mentor has already asked or suggested, so questions are not repeated.
+3. Drops small talk and exact wording.
+Keep it under {CHAT_SUMMARY_MAX_TOKENS * 3 // 4} words. Respond with the summary text only.
+"""
+
 # -----------------------------------------------------
 # DYNAMIC PROMPT GENERATOR FUNCTIONS
 # -----------------------------------------------------
 
 # --- Prompts for Chat Router ---
 
-def get_profile_extraction_prompt(transcript: str) -> str:
-    """Generates the prompt for extracting a user's profile from a conversation."""
-    return f"Extract a structured JSON profile from the user's statements (no explanations):\n\n{transcript}\n\nJSON:"
+def get_profile_delta_prompt(current_profile: Dict[str, Any], new_messages: str) -> str:
+    """Generates the prompt for extracting a profile patch from the newest user messages only."""
+    profile_json = json.dumps(current_profile, indent=2)
+    return (
+        f"Current stored profile:\n{profile_json}\n\n"
+        f"New messages from the student:\n{new_messages}\n\n"
+        "JSON patch:"
+    )
 
 def get_career_recommendation_prompt(profile_data: Dict[str, Any]) -> str:
     """Generates the prompt for recommending careers based on a user profile."""
@@ -82,12 +101,41 @@ def get_career_recommendation_prompt(profile_data: Dict[str, Any]) -> str:
         f"Profile:\n{profile_json}"
     )
 
-def get_chat_prompt(conversation_text: str) -> str:
-    """Generates the main prompt for the conversational AI mentor."""
-    return (
+def get_chat_prompt(
+    user_message: str,
+    recent_turns: List[Dict[str, Any]],
+    summary: str = "",
+    token_budget: int = CHAT_PROMPT_TOKEN_BUDGET,
+) -> str:
+    """
+    Generates the main prompt for the conversational AI mentor from the running
+    summary plus the most recent turns, capped at roughly `token_budget` tokens.
+    """
+    header = (
         "You are Disha Guide, a friendly AI career mentor helping Indian students.\n"
         "Guide step-by-step through name, education, interests, skills, and career goals.\n\n"
-        f"Here’s the conversation so far:\n\n{conversation_text}\n\nAI:"
+    )
+    # The new message and the summary get bounded shares; recent turns take the rest.
+    remaining = token_budget - memory.estimate_tokens(header)
+    message = memory.truncate_to_tokens(user_message, remaining // 4)
+    remaining -= memory.estimate_tokens(message)
+    summary_text = memory.truncate_to_tokens(summary or "", min(CHAT_SUMMARY_MAX_TOKENS, remaining // 3))
+    remaining -= memory.estimate_tokens(summary_text)
+    recent_text = memory.fit_turns_to_budget(recent_turns, max(remaining, 0))
+
+    parts = [header]
+    if summary_text:
+        parts.append(f"What you remember from earlier in the conversation:\n{summary_text}\n\n")
+    conversation = "\n".join(p for p in (recent_text, f"User: {message}") if p)
+    parts.append(f"Here’s the conversation so far:\n\n{conversation}\n\nAI:")
+    return "".join(parts)
+
+def get_summary_update_prompt(summary: str, new_turns_text: str) -> str:
+    """Generates the prompt for folding older turns into the running conversation summary."""
+    return (
+        f"Existing summary:\n{summary or '(none yet)'}\n\n"
+        f"Newer conversation turns:\n{new_turns_text}\n\n"
+        "Updated summary:"
     )
 
 # --- Prompts for Forge Router ---
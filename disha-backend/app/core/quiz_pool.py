@@ -0,0 +1,180 @@
+# app/core/quiz_pool.py
+"""
+Pre-generated quiz pool keyed by normalized (skill, career_name).
+
+Each key holds a few validated quiz variants that are served round-robin, so
+students asking for the same pathway skill still see different quizzes. A
+variant is retired after QUIZ_VARIANT_MAX_SERVES serves; whenever a key drops
+below the low-water mark a background refill tops it back up. Saving a path
+to the compass warms the pool for every pathway skill.
+"""
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.core import llm, prompts
+from app.core.background import KeyedScheduler
+from app.core.config import (
+    QUIZ_POOL_LOW_WATER,
+    QUIZ_POOL_MAX_KEYS,
+    QUIZ_POOL_TARGET,
+    QUIZ_VARIANT_MAX_SERVES,
+)
+
+PoolKey = Tuple[str, str]
+
+# Refills are coalesced per key and share a small concurrency budget
+quiz_warmer = KeyedScheduler("QuizPool", max_concurrency=2, debounce_seconds=0)
+
+
+class _Variant:
+    __slots__ = ("quiz", "serves", "created_at")
+
+    def __init__(self, quiz: dict):
+        self.quiz = quiz
+        self.serves = 0
+        self.created_at = time.time()
+
+
+class _PoolEntry:
+    __slots__ = ("variants", "cursor")
+
+    def __init__(self):
+        self.variants: List[_Variant] = []
+        self.cursor = 0
+
+
+_pool: "OrderedDict[PoolKey, _PoolEntry]" = OrderedDict()
+# Cold generations in flight, so concurrent misses for one key share a single call
+_inflight: Dict[PoolKey, "asyncio.Future"] = {}
+_stats = {"hits": 0, "misses": 0, "generated": 0, "invalid": 0, "retired": 0}
+
+
+def normalize_key(skill: str, career_name: str) -> PoolKey:
+    def _norm(text: str) -> str:
+        return re.sub(r"\s+", " ", (text or "").strip().lower())
+    return _norm(skill), _norm(career_name)
+
+
+def is_valid_quiz(quiz: Optional[dict]) -> bool:
+    """A quiz is usable if every question has options and its answer is one of them."""
+    if not isinstance(quiz, dict):
+        return False
+    questions = quiz.get("questions")
+    if not isinstance(questions, list) or not questions:
+        return False
+    for q in questions:
+        if not isinstance(q, dict) or not q.get("question_text"):
+            return False
+        options = q.get("options")
+        if not isinstance(options, list) or len(options) < 2:
+            return False
+        if q.get("correct_answer") not in options:
+            return False
+    return True
+
+
+def _entry(key: PoolKey) -> _PoolEntry:
+    entry = _pool.get(key)
+    if entry is None:
+        entry = _PoolEntry()
+        _pool[key] = entry
+        while len(_pool) > QUIZ_POOL_MAX_KEYS:
+            _pool.popitem(last=False)
+    _pool.move_to_end(key)
+    return entry
+
+
+async def _generate_variant(skill: str, career_name: str) -> Optional[dict]:
+    prompt = prompts.generate_assessment_prompt(skill, career_name)
+    quiz = llm.extract_json_object(await llm.generate_text("quiz", prompt))
+    if not is_valid_quiz(quiz):
+        _stats["invalid"] += 1
+        return None
+    _stats["generated"] += 1
+    return quiz
+
+
+def _schedule_refill(skill: str, career_name: str):
+    key = normalize_key(skill, career_name)
+
+    async def refill():
+        entry = _entry(key)
+        # Allow a few bad generations before giving up until the next trigger
+        attempts = 0
+        while len(entry.variants) < QUIZ_POOL_TARGET and attempts < QUIZ_POOL_TARGET * 2:
+            attempts += 1
+            quiz = await _generate_variant(skill, career_name)
+            if quiz is not None:
+                entry.variants.append(_Variant(quiz))
+        print(f"[QuizPool] {key} refilled to {len(entry.variants)} variants")
+
+    quiz_warmer.submit("|".join(key), refill)
+
+
+# -----------------------------------------------------
+# PUBLIC API
+# -----------------------------------------------------
+async def get_quiz(skill: str, career_name: str) -> Optional[dict]:
+    """
+    Serve the next variant for (skill, career_name). Falls back to a cold
+    generation when the key is empty. Returns None if no valid quiz could be made.
+    """
+    key = normalize_key(skill, career_name)
+    entry = _entry(key)
+
+    if entry.variants:
+        _stats["hits"] += 1
+        index = entry.cursor % len(entry.variants)
+        entry.cursor = index + 1
+        variant = entry.variants[index]
+        variant.serves += 1
+        if variant.serves >= QUIZ_VARIANT_MAX_SERVES:
+            entry.variants.pop(index)
+            entry.cursor = index
+            _stats["retired"] += 1
+        if len(entry.variants) < QUIZ_POOL_LOW_WATER:
+            _schedule_refill(skill, career_name)
+        return variant.quiz
+
+    _stats["misses"] += 1
+    pending = _inflight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    quiz = None
+    try:
+        quiz = await _generate_variant(skill, career_name)
+        if quiz is not None:
+            entry.variants.append(_Variant(quiz))
+        return quiz
+    finally:
+        # Waiters get None if this call failed or was cancelled; they are not retried
+        future.set_result(quiz)
+        _inflight.pop(key, None)
+        _schedule_refill(skill, career_name)
+
+
+def warm(skills: List[str], career_name: str) -> None:
+    """Queue background fills for every skill of a pathway that is below the low-water mark."""
+    for skill in skills:
+        if not isinstance(skill, str) or not skill.strip():
+            continue
+        entry = _pool.get(normalize_key(skill, career_name))
+        if entry is None or len(entry.variants) < QUIZ_POOL_LOW_WATER:
+            _schedule_refill(skill, career_name)
+
+
+def snapshot() -> Dict[str, object]:
+    total = _stats["hits"] + _stats["misses"]
+    return {
+        "keys": len(_pool),
+        "variants": sum(len(e.variants) for e in _pool.values()),
+        "hit_ratio": round(_stats["hits"] / total, 3) if total else 0.0,
+        "warmer": quiz_warmer.snapshot(),
+        **_stats,
+    }
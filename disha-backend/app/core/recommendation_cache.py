@@ -0,0 +1,145 @@
+# app/core/recommendation_cache.py
+"""
+Career recommendations keyed by a profile fingerprint.
+
+Recommendations only depend on the normalized profile: education, sorted
+lowercased skills and interests, and the career goal. Its fingerprint gates
+regeneration twice:
+- per user: the fingerprint of the stored recommendations is kept in
+  compass.fingerprint, and an unchanged profile keeps them as they are
+- across users: generated recommendations are shared in the configured cache
+  store (see cache_store.py) for RECOMMENDATION_CACHE_TTL_SECONDS, so
+  students with identical profiles reuse one Gemini call
+
+Shared entries are generated from the normalized profile alone, so they carry
+nothing user-specific. Concurrent misses for one fingerprint in a worker wait
+for a single generation.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.cache_store import CacheStore, make_store
+from app.core.config import RECOMMENDATION_CACHE_TTL_SECONDS
+from app.core.services import services
+
+Generator = Callable[[dict], Awaitable[List[dict]]]
+
+# Built on first use or by the startup warm-up; a Firestore backend needs the Firebase app
+services.register("recommendation_cache_store", lambda: make_store("recommendations"))
+
+
+def _store() -> CacheStore:
+    return services.get("recommendation_cache_store")
+
+
+_inflight: Dict[str, asyncio.Future] = {}
+_stats = {"hits": 0, "misses": 0, "unchanged": 0, "bypassed": 0, "joined": 0}
+
+
+def _norm(text) -> str:
+    return re.sub(r"\s+", " ", str(text or "").strip().lower())
+
+
+def normalized_profile(profile: dict) -> dict:
+    """The profile fields recommendations depend on, in canonical form."""
+    profile = profile or {}
+
+    def _terms(values) -> list:
+        if isinstance(values, str):
+            values = [values]
+        return sorted({_norm(v) for v in values or [] if _norm(v)})
+
+    return {
+        "education": _norm(profile.get("education")),
+        "skills": _terms(profile.get("skills")),
+        "interests": _terms(profile.get("interests")),
+        "career_goals": _norm(profile.get("career_goals")),
+    }
+
+
+def profile_fingerprint(profile: dict) -> str:
+    canonical = json.dumps(normalized_profile(profile), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def note_unchanged() -> None:
+    """Count a regeneration skipped because the user's fingerprint did not change."""
+    _stats["unchanged"] += 1
+
+
+async def _lookup(fingerprint: str) -> Optional[list]:
+    entry = await _store().get(fingerprint)
+    if entry and time.time() < entry.get("fresh_until", 0):
+        return entry["recommendations"]
+    if entry:
+        await _store().delete(fingerprint)
+    return None
+
+
+async def _generate(fingerprint: str, profile: dict, generate: Generator) -> list:
+    recommendations = await generate(normalized_profile(profile))
+    if recommendations:
+        now = time.time()
+        await _store().set(fingerprint, {
+            "recommendations": recommendations,
+            "created_at": now,
+            "fresh_until": now + RECOMMENDATION_CACHE_TTL_SECONDS,
+        })
+    return recommendations
+
+# -----------------------------------------------------
+# PUBLIC API
+# -----------------------------------------------------
+async def get_recommendations(profile: dict, generate: Generator, force: bool = False) -> Tuple[list, str]:
+    """
+    Recommendations for `profile` and where they came from ("cache" or
+    "generated"). `generate` receives the normalized profile; its result is
+    shared under the fingerprint. `force` skips the shared lookup (the result
+    still replaces the shared entry).
+    """
+    fingerprint = profile_fingerprint(profile)
+    if force:
+        _stats["bypassed"] += 1
+        return await _generate(fingerprint, profile, generate), "generated"
+
+    cached = await _lookup(fingerprint)
+    if cached is not None:
+        _stats["hits"] += 1
+        return cached, "cache"
+
+    pending = _inflight.get(fingerprint)
+    if pending is not None:
+        _stats["joined"] += 1
+        return await asyncio.shield(pending), "generated"
+
+    _stats["misses"] += 1
+    future = asyncio.get_running_loop().create_future()
+    _inflight[fingerprint] = future
+    try:
+        recommendations = await _generate(fingerprint, profile, generate)
+        future.set_result(recommendations)
+        return recommendations, "generated"
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Waiters see the error too; mark it retrieved in case there are none
+        future.exception()
+        raise
+    finally:
+        _inflight.pop(fingerprint, None)
+
+
+def snapshot() -> dict:
+    lookups = _stats["hits"] + _stats["misses"] + _stats["joined"]
+    return {
+        "backend": type(_store()).__name__,
+        "hit_ratio": round((_stats["hits"] + _stats["joined"]) / lookups, 3) if lookups else 0.0,
+        "inflight": len(_inflight),
+        **_stats,
+    }
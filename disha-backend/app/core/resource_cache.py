@@ -0,0 +1,198 @@
+# app/core/resource_cache.py
+"""
+Stale-while-revalidate cache for learning-resource lookups.
+
+Entries are keyed by normalized (skill, career) and live in the configured
+cache store (see cache_store.py). A fresh entry is returned immediately; a
+stale one is returned immediately while a background refresh runs; only a
+miss waits for the loader. A periodic sweep re-checks the links of entries
+close to expiry and either extends them or refreshes them from the model.
+
+The forge router registers the loader (Gemini + link validation) and the
+link validator with `register_loader`.
+"""
+import asyncio
+import re
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.core.background import KeyedScheduler
+from app.core.cache_store import CacheStore, make_store
+from app.core.config import (
+    RESOURCE_CACHE_REFRESH_AHEAD_SECONDS,
+    RESOURCE_CACHE_STALE_SECONDS,
+    RESOURCE_CACHE_SWEEP_INTERVAL_SECONDS,
+    RESOURCE_CACHE_TTL_SECONDS,
+)
+from app.core.services import services
+
+Loader = Callable[[str, str], Awaitable[dict]]
+Validator = Callable[[list], Awaitable[list]]
+
+# Built on first use or by the startup warm-up; a Firestore backend needs the Firebase app
+services.register("resource_cache_store", lambda: make_store("resources"))
+refresher = KeyedScheduler("ResourceCache", max_concurrency=2, debounce_seconds=0)
+
+_loader: Optional[Loader] = None
+_validator: Optional[Validator] = None
+_sweep_task: Optional[asyncio.Task] = None
+# Loads for misses in flight, so concurrent misses for one key share a single load
+_inflight: Dict[str, "asyncio.Future"] = {}
+_stats = {"hits": 0, "stale_hits": 0, "misses": 0, "joined": 0, "refreshes": 0, "revalidated": 0, "refresh_failures": 0}
+
+
+def _store() -> CacheStore:
+    return services.get("resource_cache_store")
+
+
+def register_loader(loader: Loader, validator: Validator) -> None:
+    global _loader, _validator
+    _loader = loader
+    _validator = validator
+
+
+def cache_key(skill: str, career_name: str) -> str:
+    def _norm(text: str) -> str:
+        return re.sub(r"\s+", " ", (text or "").strip().lower())
+    return f"{_norm(skill)}|{_norm(career_name)}"
+
+
+def _make_entry(skill: str, career_name: str, value: dict) -> dict:
+    now = time.time()
+    return {
+        "skill": skill,
+        "career_name": career_name,
+        "value": value,
+        "created_at": now,
+        "fresh_until": now + RESOURCE_CACHE_TTL_SECONDS,
+        "stale_until": now + RESOURCE_CACHE_TTL_SECONDS + RESOURCE_CACHE_STALE_SECONDS,
+    }
+
+
+async def _refresh(skill: str, career_name: str) -> dict:
+    value = await _loader(skill, career_name)
+    await _store().set(cache_key(skill, career_name), _make_entry(skill, career_name, value))
+    _stats["refreshes"] += 1
+    return value
+
+
+def _schedule_refresh(skill: str, career_name: str) -> None:
+    async def job():
+        try:
+            await _refresh(skill, career_name)
+        except Exception as e:
+            # Keep serving the stale entry; the next read or sweep tries again
+            _stats["refresh_failures"] += 1
+            print(f"[ResourceCache] Refresh failed for {cache_key(skill, career_name)}: {e}")
+
+    refresher.submit(cache_key(skill, career_name), job)
+
+# -----------------------------------------------------
+# PUBLIC API
+# -----------------------------------------------------
+async def get_resources(skill: str, career_name: str) -> dict:
+    """Return cached resources for (skill, career_name), loading them on a miss."""
+    entry = await _store().get(cache_key(skill, career_name))
+    now = time.time()
+
+    if entry and now < entry.get("fresh_until", 0):
+        _stats["hits"] += 1
+        return entry["value"]
+
+    if entry and now < entry.get("stale_until", 0):
+        _stats["stale_hits"] += 1
+        _schedule_refresh(skill, career_name)
+        return entry["value"]
+
+    key = cache_key(skill, career_name)
+    pending = _inflight.get(key)
+    if pending is not None:
+        _stats["joined"] += 1
+        return await asyncio.shield(pending)
+
+    _stats["misses"] += 1
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        value = await _refresh(skill, career_name)
+        future.set_result(value)
+        return value
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        # Waiters see the same error (e.g. the loader's 503); mark it retrieved in case there are none
+        future.set_exception(e)
+        future.exception()
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+
+async def _revalidate_entry(key: str, entry: dict) -> None:
+    """Re-check stored links; extend the entry if most still work, otherwise refresh it."""
+    resources = entry.get("value", {}).get("resources", [])
+    valid = await _validator(resources) if resources else []
+    if resources and len(valid) * 2 >= len(resources):
+        value = {**entry["value"], "resources": valid}
+        await _store().set(key, _make_entry(entry["skill"], entry["career_name"], value))
+        _stats["revalidated"] += 1
+    else:
+        _schedule_refresh(entry["skill"], entry["career_name"])
+
+
+async def sweep_once(limit: int = 50) -> int:
+    """Revalidate entries that expire within the refresh-ahead window. Returns the count."""
+    if _loader is None or _validator is None:
+        return 0
+    due = await _store().expiring(time.time() + RESOURCE_CACHE_REFRESH_AHEAD_SECONDS, limit=limit)
+    for key, entry in due:
+        if not entry or "skill" not in entry:
+            continue
+        try:
+            await _revalidate_entry(key, entry)
+        except Exception as e:
+            print(f"[ResourceCache] Revalidation failed for {key}: {e}")
+    return len(due)
+
+
+async def _sweep_loop():
+    while True:
+        await asyncio.sleep(RESOURCE_CACHE_SWEEP_INTERVAL_SECONDS)
+        try:
+            count = await sweep_once()
+            if count:
+                print(f"[ResourceCache] Revalidated {count} entries near expiry")
+        except Exception as e:
+            print(f"[ResourceCache] Sweep failed: {e}")
+
+
+def start_background_revalidation() -> None:
+    global _sweep_task
+    refresher.start()
+    if _sweep_task is None or _sweep_task.done():
+        _sweep_task = asyncio.create_task(_sweep_loop())
+
+
+async def stop_background_revalidation() -> None:
+    global _sweep_task
+    if _sweep_task is not None:
+        _sweep_task.cancel()
+        try:
+            await _sweep_task
+        except asyncio.CancelledError:
+            pass
+        _sweep_task = None
+    await refresher.drain(timeout=5)
+
+
+def snapshot() -> dict:
+    served = _stats["hits"] + _stats["stale_hits"] + _stats["joined"]
+    lookups = served + _stats["misses"]
+    return {
+        "backend": type(_store()).__name__,
+        "hit_ratio": round(served / lookups, 3) if lookups else 0.0,
+        "inflight": len(_inflight),
+        "refresher": refresher.snapshot(),
+        **_stats,
+    }
@@ -0,0 +1,161 @@
+# app/core/schema.py
+"""
+Versioned layout of users/{uid} documents.
+
+Every user document carries a `schema_version`. Migrations are registered
+with `@migration(version)` and upgrade a document from `version - 1` to
+`version`; `upgrade()` runs whichever ones a document still needs. Reads
+upgrade documents lazily on first touch (see
+firestore_utils.ensure_user_document) and `python -m scripts.migrate_schema`
+upgrades everything in one pass, so documents already at
+CURRENT_SCHEMA_VERSION skip repair entirely.
+
+A migration receives the user id and the document dict, mutates the dict
+into its new shape and returns the Firestore field-path updates that make
+the stored document match. Migrations that write other documents themselves
+are coroutines.
+"""
+import copy
+import hashlib
+import inspect
+import re
+from typing import Awaitable, Callable, Dict, Union
+
+PROFILE_SKELETON = {
+    "name": "",
+    "education": "",
+    "skills": [],
+    "interests": [],
+    "career_goals": ""
+}
+
+Migration = Callable[[str, dict], Union[dict, Awaitable[dict]]]
+
+_migrations: Dict[int, Migration] = {}
+
+
+def migration(version: int):
+    """Register the function that upgrades documents to `version`."""
+    def register(fn: Migration) -> Migration:
+        if version in _migrations:
+            raise ValueError(f"Duplicate user schema migration for version {version}")
+        _migrations[version] = fn
+        return fn
+    return register
+
+
+def career_slug(career_name: str) -> str:
+    """Stable key of a saved path in compass.saved_paths."""
+    slug = re.sub(r"[^a-z0-9]+", "-", (career_name or "").strip().lower()).strip("-")
+    # Names without any latin letters or digits still need a distinct key
+    return slug or hashlib.sha1((career_name or "").encode("utf-8")).hexdigest()[:12]
+
+
+def document_version(data: dict | None) -> int:
+    return (data or {}).get("schema_version", 0)
+
+
+def new_user_document(email: str | None = None) -> dict:
+    """A fresh user document, already at the current schema version."""
+    return {
+        "email": email or "",
+        "profile": copy.deepcopy(PROFILE_SKELETON),
+        "compass": {
+            "recommendations": [],
+            "saved_paths": {}
+        },
+        "schema_version": CURRENT_SCHEMA_VERSION,
+    }
+
+
+async def upgrade(user_id: str, data: dict) -> dict:
+    """
+    Run every migration newer than the document's version, in order. Mutates
+    `data` and returns the combined field-path updates (empty if current).
+    """
+    version = document_version(data)
+    updates = {}
+    for target in range(version + 1, CURRENT_SCHEMA_VERSION + 1):
+        fixes = _migrations[target](user_id, data)
+        updates.update(await fixes if inspect.isawaitable(fixes) else fixes)
+        data["schema_version"] = target
+    if updates or version < CURRENT_SCHEMA_VERSION:
+        updates["schema_version"] = CURRENT_SCHEMA_VERSION
+    return updates
+
+# -----------------------------------------------------
+# MIGRATIONS
+# -----------------------------------------------------
+@migration(1)
+def _fill_skeleton(user_id: str, data: dict) -> dict:
+    """Profile skeleton fields and the compass structure."""
+    fixes = {}
+
+    profile = data.get("profile")
+    if not isinstance(profile, dict):
+        profile = {}
+        fixes["profile"] = profile
+    for k, v in PROFILE_SKELETON.items():
+        if k not in profile:
+            profile[k] = copy.deepcopy(v)
+            fixes[f"profile.{k}"] = v
+    data["profile"] = profile
+
+    compass = data.get("compass")
+    if not isinstance(compass, dict):
+        compass = {}
+        fixes["compass"] = compass
+    for k in ("recommendations", "saved_paths"):
+        if k not in compass:
+            compass[k] = []
+            fixes[f"compass.{k}"] = []
+    data["compass"] = compass
+
+    return fixes
+
+
+@migration(2)
+async def _chats_to_subcollection(user_id: str, data: dict) -> dict:
+    """Legacy `chats` array field -> users/{uid}/chats subcollection."""
+    if "chats" not in data:
+        return {}
+    from app.core import firestore_utils as fs
+    # Writes the turns and removes the array field itself
+    await fs.migrate_chats_to_subcollection(user_id, data.pop("chats"))
+    return {}
+
+
+@migration(3)
+def _saved_paths_to_map(user_id: str, data: dict) -> dict:
+    """
+    compass.saved_paths: array of paths -> map keyed by career slug, with the
+    completed skills kept as an array so progress can be derived without
+    walking skills_status.
+    """
+    compass = data.get("compass")
+    paths = compass.get("saved_paths") if isinstance(compass, dict) else None
+    if not isinstance(paths, list):
+        return {}
+
+    keyed = {}
+    for index, path in enumerate(paths):
+        if not isinstance(path, dict) or not path.get("career_name"):
+            continue
+        skills_status = path.get("skills_status") or {}
+        slug = career_slug(path["career_name"])
+        keyed[slug] = {
+            **{k: v for k, v in path.items() if k != "progress"},
+            "slug": slug,
+            # Keeps the old array order when listing paths
+            "added_at": path.get("added_at") or f"1970-01-01T00:00:00.{index:06d}",
+            "completed_skills": [
+                skill for skill, status in skills_status.items()
+                if isinstance(status, dict) and status.get("status") == "complete"
+            ],
+            "total_skills": len(skills_status),
+        }
+    compass["saved_paths"] = keyed
+    return {"compass.saved_paths": keyed}
+
+
+CURRENT_SCHEMA_VERSION = max(_migrations)
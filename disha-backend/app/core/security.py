@@ -1,18 +1,124 @@
+import asyncio
+import hashlib
+import hmac
+import time
+from collections import OrderedDict
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from firebase_admin import auth
+
+from app.core import tracing
+from app.core.config import STATUS_TOKEN, TOKEN_CACHE_MAX_SIZE
+from app.core.firebase import get_auth
 
 security = HTTPBearer()
+_status_security = HTTPBearer(auto_error=False)
+
+# -----------------------------------------------------
+# VERIFIED TOKEN CACHE
+# -----------------------------------------------------
+# sha256(token) -> (exp, decoded claims), least recently used first.
+# Raw tokens are never kept in memory as keys.
+_token_cache: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+_token_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "verify_seconds": 0.0}
+
+
+def _cache_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str) -> dict | None:
+    entry = _token_cache.get(key)
+    if entry is None:
+        return None
+    exp, decoded = entry
+    if exp <= time.time():
+        del _token_cache[key]
+        _token_cache_stats["expired"] += 1
+        return None
+    _token_cache.move_to_end(key)
+    return decoded
+
+
+def _cache_put(key: str, decoded: dict) -> None:
+    exp = float(decoded.get("exp") or 0)
+    if exp <= time.time():
+        return
+    _token_cache[key] = (exp, decoded)
+    _token_cache.move_to_end(key)
+    while len(_token_cache) > TOKEN_CACHE_MAX_SIZE:
+        _token_cache.popitem(last=False)
+        _token_cache_stats["evictions"] += 1
 
-def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Verifies Firebase ID token passed in Authorization header."""
+
+def token_cache_snapshot() -> dict:
+    """Cache counters plus the verification time the hits have saved."""
+    misses = _token_cache_stats["misses"]
+    avg_verify = _token_cache_stats["verify_seconds"] / misses if misses else 0.0
+    return {
+        "size": len(_token_cache),
+        "max_size": TOKEN_CACHE_MAX_SIZE,
+        "hits": _token_cache_stats["hits"],
+        "misses": misses,
+        "evictions": _token_cache_stats["evictions"],
+        "expired": _token_cache_stats["expired"],
+        "avg_verify_ms": round(avg_verify * 1000, 2),
+        "estimated_saved_ms": round(_token_cache_stats["hits"] * avg_verify * 1000, 2),
+    }
+
+# -----------------------------------------------------
+# DEPENDENCY
+# -----------------------------------------------------
+def _verify(token: str) -> dict:
+    # In the worker thread, so a first use that initializes Firebase stays off the loop
+    return get_auth().verify_id_token(token)
+
+
+async def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """
+    Verifies Firebase ID token passed in Authorization header.
+    Verified tokens are cached until their `exp`; misses are verified in a worker thread.
+    """
     token = credentials.credentials
-    try:
-        decoded_token = auth.verify_id_token(token)
-        return decoded_token
-    except Exception as e:
-        print(f"❌ Firebase token verification failed: {e}")
+    key = _cache_key(token)
+
+    with tracing.span("auth.verify_token") as span:
+        decoded_token = _cache_get(key)
+        span.set_attribute("auth.cache_hit", decoded_token is not None)
+        if decoded_token is not None:
+            _token_cache_stats["hits"] += 1
+            return dict(decoded_token)
+
+        _token_cache_stats["misses"] += 1
+        started = time.perf_counter()
+        try:
+            decoded_token = await asyncio.to_thread(_verify, token)
+        except Exception as e:
+            print(f"❌ Firebase token verification failed: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid or expired Firebase token",
+            )
+        finally:
+            _token_cache_stats["verify_seconds"] += time.perf_counter() - started
+
+        _cache_put(key, decoded_token)
+        return dict(decoded_token)
+
+
+# -----------------------------------------------------
+# STATUS ENDPOINTS
+# -----------------------------------------------------
+async def verify_status_token(credentials: HTTPAuthorizationCredentials | None = Depends(_status_security)):
+    """
+    Guard for the internal /ping status endpoints: 404 while STATUS_TOKEN is
+    unset, 401 unless the request carries it as its bearer token.
+    """
+    if not STATUS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if credentials is None or not hmac.compare_digest(credentials.credentials.encode(), STATUS_TOKEN.encode()):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired Firebase token",
+            detail="Invalid status token",
+            headers={"WWW-Authenticate": "Bearer"},
         )
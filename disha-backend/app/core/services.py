@@ -0,0 +1,166 @@
+# app/core/services.py
+"""
+Lazily created external clients, warmed by the app lifespan.
+
+Modules register a factory per component instead of building clients at
+import time (Firebase Admin app, Firestore clients, the Gemini SDK). A
+component is created on its first `get()`, or during startup when the
+lifespan calls `warm()`, which builds every registered component
+concurrently in worker threads. Importing the app therefore stays cheap,
+and the first request does not pay for what the warm-up already built.
+
+Startup is reported per component (import of the app, each client, each
+lifespan step). `ready()` turns true once the warm-up has finished and every
+warmed component exists; a component whose warm-up failed counts as soon as
+a later first use builds it. This is what GET /ping/ready reports to load
+balancers.
+
+STARTUP_WARMUP selects the warm-up mode:
+- "background": the server accepts connections at once, /ping/ready answers
+  503 until the warm-up is done (default)
+- "blocking":   startup waits for the warm-up
+- "none":       no warm-up; components are built on first use
+"""
+import asyncio
+import contextlib
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import STARTUP_WARMUP
+
+
+class _Component:
+    __slots__ = ("name", "factory", "warm", "value", "seconds", "error", "created", "_lock")
+
+    def __init__(self, name: str, factory: Callable[[], Any], warm: bool):
+        self.name = name
+        self.factory = factory
+        self.warm = warm
+        self.value = None
+        self.seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self.created = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self.created:
+            return self.value
+        # Factories run once, even when a request and the warm-up race for them
+        with self._lock:
+            if not self.created:
+                started = time.perf_counter()
+                try:
+                    self.value = self.factory()
+                except Exception as e:
+                    self.error = str(e)
+                    raise
+                finally:
+                    self.seconds = time.perf_counter() - started
+                self.created, self.error = True, None
+        return self.value
+
+
+class ServiceContainer:
+    def __init__(self):
+        self._components: Dict[str, _Component] = {}
+        # Timings of startup steps that are not components (import, lifespan steps)
+        self._steps: Dict[str, float] = {}
+        self._warmup_task: Optional[asyncio.Task] = None
+        self._warmup_seconds: Optional[float] = None
+        self._warmed = False
+        self._ready = False
+
+    def register(self, name: str, factory: Callable[[], Any], warm: bool = True) -> None:
+        """Register a component; `warm=False` leaves it to be built on first use."""
+        self._components[name] = _Component(name, factory, warm)
+
+    def get(self, name: str):
+        """The component, built now if it has not been yet."""
+        return self._components[name].get()
+
+    # -------------------------------------------------
+    # Startup
+    # -------------------------------------------------
+    def record(self, step: str, seconds: float) -> None:
+        self._steps[step] = seconds
+
+    @contextlib.contextmanager
+    def timed(self, step: str):
+        """Record how long the block takes as a startup step."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(step, time.perf_counter() - started)
+
+    async def _warm(self) -> None:
+        started = time.perf_counter()
+
+        async def build(component):
+            try:
+                await asyncio.to_thread(component.get)
+            except Exception as e:
+                print(f"[Services] Warm-up of {component.name} failed: {e}")
+
+        await asyncio.gather(*(build(c) for c in self._components.values() if c.warm))
+        self._warmup_seconds = time.perf_counter() - started
+        self._warmed = True
+        print(f"[Services] {self._summary()}")
+
+    async def start(self, mode: Optional[str] = None) -> None:
+        """Warm the registered components according to STARTUP_WARMUP; called from the lifespan."""
+        mode = (mode or STARTUP_WARMUP).lower()
+        if mode == "none":
+            self._ready = True
+        elif mode == "blocking":
+            await self._warm()
+        elif mode == "background":
+            self._warmup_task = asyncio.create_task(self._warm())
+        else:
+            raise ValueError(f"Unknown STARTUP_WARMUP '{mode}' (expected background, blocking or none)")
+
+    async def stop(self) -> None:
+        if self._warmup_task is not None and not self._warmup_task.done():
+            self._warmup_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._warmup_task
+        self._warmup_task = None
+
+    def ready(self) -> bool:
+        if not self._ready and self._warmed:
+            # Re-checked on every call, so a retried component makes the instance ready
+            self._ready = all(c.created for c in self._components.values() if c.warm)
+        return self._ready
+
+    # -------------------------------------------------
+    # Introspection
+    # -------------------------------------------------
+    def _summary(self) -> str:
+        parts = [f"{name} {seconds * 1000:.0f} ms" for name, seconds in self._steps.items()]
+        parts += [
+            f"{c.name} {c.seconds * 1000:.0f} ms" + (" (failed)" if c.error else "")
+            for c in self._components.values() if c.seconds is not None
+        ]
+        total = f"warm-up {self._warmup_seconds * 1000:.0f} ms; " if self._warmup_seconds is not None else ""
+        return f"Startup: {total}{', '.join(parts)}"
+
+    def snapshot(self) -> dict:
+        return {
+            "ready": self.ready(),
+            "warmup_mode": STARTUP_WARMUP,
+            "warmup_seconds": round(self._warmup_seconds, 4) if self._warmup_seconds is not None else None,
+            "steps": {name: round(seconds, 4) for name, seconds in self._steps.items()},
+            "components": {
+                c.name: {
+                    "created": c.created,
+                    "warm": c.warm,
+                    "seconds": round(c.seconds, 4) if c.seconds is not None else None,
+                    "error": c.error,
+                }
+                for c in self._components.values()
+            },
+        }
+
+
+services = ServiceContainer()
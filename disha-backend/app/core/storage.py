@@ -0,0 +1,538 @@
+# app/core/storage.py
+"""
+Pluggable document storage behind firestore_utils.
+
+firestore_utils is the repository for users, profiles, chats and compass
+data; it talks to a `DocumentStore` instead of the Firestore client. A store
+holds JSON-like documents addressed by slash paths ("users/{uid}",
+"users/{uid}/chats/{turn_id}") and supports atomic multi-document commits,
+field-path updates and ordered queries over one collection.
+
+Updates use the neutral sentinels defined here (DELETE_FIELD, Increment,
+ArrayUnion, ArrayRemove) and Firestore's field-path syntax; the Firestore
+backend translates them, the embedded ones apply them with `apply_updates`.
+
+The store API is async so no storage I/O ever blocks the event loop.
+
+Backends, selected with STORAGE_BACKEND:
+- "firestore": the production Firestore database, through the async client
+- "memory":    in-process dicts, for tests and API benchmarks
+- "sqlite":    a local SQLite file (WAL mode), for local runs that keep data;
+               queries run in worker threads
+"""
+import abc
+import asyncio
+import copy
+import json
+import re
+import sqlite3
+import threading
+from typing import AsyncIterator, List, NamedTuple, Optional, Tuple
+
+from app.core.config import STORAGE_BACKEND, STORAGE_SQLITE_PATH
+
+# Firestore caps a WriteBatch at 500 operations; stay comfortably below it.
+BATCH_WRITE_LIMIT = 450
+
+# -----------------------------------------------------
+# SENTINELS AND FIELD PATHS
+# -----------------------------------------------------
+class _DeleteField:
+    def __repr__(self):
+        return "DELETE_FIELD"
+
+
+DELETE_FIELD = _DeleteField()
+
+
+class Increment:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return f"Increment({self.value!r})"
+
+
+class ArrayUnion:
+    __slots__ = ("values",)
+
+    def __init__(self, values):
+        self.values = list(values)
+
+    def __repr__(self):
+        return f"ArrayUnion({self.values!r})"
+
+
+class ArrayRemove:
+    __slots__ = ("values",)
+
+    def __init__(self, values):
+        self.values = list(values)
+
+    def __repr__(self):
+        return f"ArrayRemove({self.values!r})"
+
+
+_TRANSFORMS = (Increment, ArrayUnion, ArrayRemove)
+_SIMPLE_FIELD = re.compile(r"^[_a-zA-Z][_a-zA-Z0-9]*$")
+
+
+def field_path(*parts: str) -> str:
+    """Join field names into a field path, backtick-quoting names like "Node.js"."""
+    quoted = []
+    for part in parts:
+        if _SIMPLE_FIELD.match(part):
+            quoted.append(part)
+        else:
+            quoted.append("`" + part.replace("\\", "\\\\").replace("`", "\\`") + "`")
+    return ".".join(quoted)
+
+
+def parse_field_path(path: str) -> List[str]:
+    """Inverse of `field_path`."""
+    parts, current, quoted, escaped = [], [], False, False
+    for char in path:
+        if escaped:
+            current.append(char)
+            escaped = False
+        elif quoted and char == "\\":
+            escaped = True
+        elif char == "`":
+            quoted = not quoted
+        elif char == "." and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return parts
+
+# -----------------------------------------------------
+# UPDATE ALGEBRA
+# -----------------------------------------------------
+def apply_updates(doc: dict, updates: dict) -> None:
+    """Apply a field-path update (sentinels and transforms included) to a local dict."""
+    for path, value in updates.items():
+        *parents, leaf = parse_field_path(path)
+        node = doc
+        for part in parents:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+        current = node.get(leaf)
+        if value is DELETE_FIELD:
+            node.pop(leaf, None)
+        elif isinstance(value, Increment):
+            node[leaf] = (current if isinstance(current, (int, float)) else 0) + value.value
+        elif isinstance(value, ArrayUnion):
+            existing = list(current) if isinstance(current, list) else []
+            node[leaf] = existing + [v for v in value.values if v not in existing]
+        elif isinstance(value, ArrayRemove):
+            node[leaf] = [v for v in (current if isinstance(current, list) else []) if v not in value.values]
+        else:
+            node[leaf] = copy.deepcopy(value)
+
+
+_UNMERGEABLE = object()
+
+
+def _combine(pending: dict, path: str, value):
+    """One value with the effect of writing pending[path] and then `value`."""
+    if path not in pending or not isinstance(value, _TRANSFORMS):
+        return value
+    previous = pending[path]
+    if not isinstance(previous, _TRANSFORMS):
+        # Transform on top of a plain value (or a delete): resolve it locally
+        holder = {} if previous is DELETE_FIELD else {"v": copy.deepcopy(previous)}
+        apply_updates(holder, {"v": value})
+        return holder["v"]
+    if type(previous) is not type(value):
+        return _UNMERGEABLE
+    if isinstance(value, Increment):
+        return Increment(previous.value + value.value)
+    if isinstance(value, ArrayUnion):
+        return ArrayUnion(list(previous.values) + [v for v in value.values if v not in previous.values])
+    return ArrayRemove(list(previous.values) + list(value.values))
+
+
+def merge_updates(pending: dict, updates: dict) -> bool:
+    """
+    Fold `updates` (field path -> value) into `pending` so it stays one valid
+    update. Returns False, leaving `pending` untouched, when a field would need
+    two different transforms (e.g. ArrayUnion then ArrayRemove).
+    """
+    combined = {path: _combine(pending, path, value) for path, value in updates.items()}
+    if any(value is _UNMERGEABLE for value in combined.values()):
+        return False
+    for path, value in combined.items():
+        parts = parse_field_path(path)
+        # A later write to a field supersedes earlier writes to anything under it
+        for existing in [p for p in pending if parse_field_path(p)[:len(parts)] == parts]:
+            del pending[existing]
+        ancestor = next((p for p in pending if parts[:len(parse_field_path(p))] == parse_field_path(p)), None)
+        if ancestor is None:
+            pending[path] = value
+            continue
+        # Fold into the map already being written at the ancestor path
+        if not isinstance(pending[ancestor], dict):
+            pending[ancestor] = {}
+        relative = field_path(*parts[len(parse_field_path(ancestor)):])
+        apply_updates(pending[ancestor], {relative: value})
+    return True
+
+
+def fold_updates(ops: list, updates: dict) -> None:
+    """
+    Add `updates` to a document's list of pending updates, merged into the
+    last one when possible. Each list entry is committed as its own write, in
+    order, within the same batch.
+    """
+    if not ops or not merge_updates(ops[-1], updates):
+        fresh = {}
+        merge_updates(fresh, updates)
+        ops.append(fresh)
+
+# -----------------------------------------------------
+# INTERFACE
+# -----------------------------------------------------
+class Write(NamedTuple):
+    op: str            # "set", "update" or "delete"
+    path: str          # document path, e.g. "users/{uid}"
+    data: Optional[dict] = None
+
+
+class DocumentNotFound(Exception):
+    """An update targeted a document that does not exist."""
+
+
+class DocumentStore(abc.ABC):
+    """Interface shared by all storage backends."""
+
+    # Exceptions worth retrying a commit for (contention, unavailability)
+    retryable_errors: Tuple[type, ...] = ()
+
+    @abc.abstractmethod
+    async def get(self, path: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def commit(self, writes: List[Write]) -> None:
+        """Apply all writes atomically, in order. Updates to missing documents raise."""
+
+    @abc.abstractmethod
+    async def query(
+        self,
+        collection: str,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        start_after: Optional[str] = None,
+        where: Optional[Tuple[str, str, object]] = None,
+        limit: Optional[int] = None,
+    ) -> Optional[List[Tuple[str, dict]]]:
+        """
+        (id, document) pairs of one collection. `start_after` is a document id
+        cursor; returns None if that document does not exist. `where` is a
+        single (field, op, value) filter with op one of == < <= > >=.
+        """
+
+    @abc.abstractmethod
+    def stream(self, collection: str) -> AsyncIterator[Tuple[str, dict]]:
+        """Every (id, document) of a collection, for batch jobs (`async for`)."""
+
+    async def set(self, path: str, data: dict) -> None:
+        await self.commit([Write("set", path, data)])
+
+    async def update(self, path: str, updates: dict) -> None:
+        await self.commit([Write("update", path, updates)])
+
+    async def delete(self, path: str) -> None:
+        await self.commit([Write("delete", path)])
+
+
+def split_path(path: str) -> Tuple[str, str]:
+    """"users/u1/chats/c1" -> ("users/u1/chats", "c1")"""
+    collection, _, doc_id = path.rpartition("/")
+    return collection, doc_id
+
+
+_COMPARE = {
+    "==": lambda a, b: a == b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+# -----------------------------------------------------
+# IN-MEMORY
+# -----------------------------------------------------
+class MemoryDocumentStore(DocumentStore):
+    def __init__(self):
+        # collection path -> {doc id -> document}
+        self._collections: dict = {}
+        self._lock = threading.RLock()
+
+    async def get(self, path):
+        collection, doc_id = split_path(path)
+        with self._lock:
+            doc = self._collections.get(collection, {}).get(doc_id)
+            return copy.deepcopy(doc) if doc is not None else None
+
+    async def commit(self, writes):
+        with self._lock:
+            # Validate first so a failing batch changes nothing
+            staged = {}
+            for write in writes:
+                collection, doc_id = split_path(write.path)
+                key = (collection, doc_id)
+                if key not in staged:
+                    current = self._collections.get(collection, {}).get(doc_id)
+                    staged[key] = copy.deepcopy(current) if current is not None else None
+                if write.op == "set":
+                    staged[key] = copy.deepcopy(write.data)
+                elif write.op == "update":
+                    if staged[key] is None:
+                        raise DocumentNotFound(write.path)
+                    apply_updates(staged[key], write.data)
+                else:
+                    staged[key] = None
+            for (collection, doc_id), doc in staged.items():
+                docs = self._collections.setdefault(collection, {})
+                if doc is None:
+                    docs.pop(doc_id, None)
+                else:
+                    docs[doc_id] = doc
+
+    async def query(self, collection, order_by=None, descending=False, start_after=None, where=None, limit=None):
+        with self._lock:
+            docs = self._collections.get(collection, {})
+            if start_after is not None and start_after not in docs:
+                return None
+            items = list(docs.items())
+            cursor = docs.get(start_after) if start_after is not None else None
+            items = _select(items, order_by, descending, start_after, cursor, where, limit)
+            return [(doc_id, copy.deepcopy(doc)) for doc_id, doc in items]
+
+    async def stream(self, collection):
+        with self._lock:
+            items = [(doc_id, copy.deepcopy(doc)) for doc_id, doc in self._collections.get(collection, {}).items()]
+        for item in items:
+            yield item
+
+
+def _select(items, order_by, descending, start_after, cursor, where, limit):
+    """Filter, order, page and limit (id, document) pairs like a Firestore query."""
+    if where is not None:
+        field, op, value = where
+        items = [(i, d) for i, d in items if field in d and _COMPARE[op](d[field], value)]
+    if order_by is not None:
+        # Like Firestore: documents without the field are left out, ties go by id
+        items = [(i, d) for i, d in items if order_by in d]
+        items.sort(key=lambda item: (item[1][order_by], item[0]), reverse=descending)
+        if start_after is not None:
+            position = (cursor.get(order_by), start_after)
+            if descending:
+                items = [(i, d) for i, d in items if (d[order_by], i) < position]
+            else:
+                items = [(i, d) for i, d in items if (d[order_by], i) > position]
+    else:
+        items.sort(key=lambda item: item[0])
+        if start_after is not None:
+            items = [(i, d) for i, d in items if i > start_after]
+    return items[:limit] if limit else items
+
+# -----------------------------------------------------
+# SQLITE
+# -----------------------------------------------------
+class SQLiteDocumentStore(DocumentStore):
+    def __init__(self, path: str = STORAGE_SQLITE_PATH):
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " collection TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL,"
+                " PRIMARY KEY (collection, id))"
+            )
+            self._conn.commit()
+
+    def _read(self, collection, doc_id):
+        row = self._conn.execute(
+            "SELECT data FROM documents WHERE collection = ? AND id = ?", (collection, doc_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _get(self, path):
+        with self._lock:
+            return self._read(*split_path(path))
+
+    def _commit(self, writes):
+        with self._lock:
+            staged = {}
+            for write in writes:
+                key = split_path(write.path)
+                if key not in staged:
+                    staged[key] = self._read(*key)
+                if write.op == "set":
+                    staged[key] = copy.deepcopy(write.data)
+                elif write.op == "update":
+                    if staged[key] is None:
+                        raise DocumentNotFound(write.path)
+                    apply_updates(staged[key], write.data)
+                else:
+                    staged[key] = None
+            with self._conn:
+                for (collection, doc_id), doc in staged.items():
+                    if doc is None:
+                        self._conn.execute(
+                            "DELETE FROM documents WHERE collection = ? AND id = ?", (collection, doc_id)
+                        )
+                    else:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)",
+                            (collection, doc_id, json.dumps(doc)),
+                        )
+
+    def _query(self, collection, order_by, descending, start_after, where, limit):
+        with self._lock:
+            cursor = None
+            if start_after is not None:
+                cursor = self._read(collection, start_after)
+                if cursor is None:
+                    return None
+            rows = self._conn.execute(
+                "SELECT id, data FROM documents WHERE collection = ?", (collection,)
+            ).fetchall()
+        # Collections here are one user's chats, so ordering in Python is cheap
+        items = [(doc_id, json.loads(data)) for doc_id, data in rows]
+        return _select(items, order_by, descending, start_after, cursor, where, limit)
+
+    def _rows(self, collection):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, data FROM documents WHERE collection = ?", (collection,)
+            ).fetchall()
+
+    async def get(self, path):
+        return await asyncio.to_thread(self._get, path)
+
+    async def commit(self, writes):
+        await asyncio.to_thread(self._commit, writes)
+
+    async def query(self, collection, order_by=None, descending=False, start_after=None, where=None, limit=None):
+        return await asyncio.to_thread(self._query, collection, order_by, descending, start_after, where, limit)
+
+    async def stream(self, collection):
+        for doc_id, data in await asyncio.to_thread(self._rows, collection):
+            yield doc_id, json.loads(data)
+
+# -----------------------------------------------------
+# FIRESTORE
+# -----------------------------------------------------
+class FirestoreDocumentStore(DocumentStore):
+    def __init__(self):
+        from google.api_core import exceptions as gexc
+        from app.core.firebase import get_async_db
+        self._db = get_async_db()
+        self.retryable_errors = (
+            gexc.Aborted,
+            gexc.DeadlineExceeded,
+            gexc.InternalServerError,
+            gexc.ResourceExhausted,
+            gexc.ServiceUnavailable,
+        )
+
+    def _ref(self, path):
+        return self._db.document(path)
+
+    @staticmethod
+    def _native(value):
+        """Neutral sentinels -> Firestore ones (recursively inside maps)."""
+        from firebase_admin import firestore
+        if value is DELETE_FIELD:
+            return firestore.DELETE_FIELD
+        if isinstance(value, Increment):
+            return firestore.Increment(value.value)
+        if isinstance(value, ArrayUnion):
+            return firestore.ArrayUnion(value.values)
+        if isinstance(value, ArrayRemove):
+            return firestore.ArrayRemove(value.values)
+        if isinstance(value, dict):
+            return {k: FirestoreDocumentStore._native(v) for k, v in value.items()}
+        return value
+
+    async def get(self, path):
+        snap = await self._ref(path).get()
+        return (snap.to_dict() or {}) if snap.exists else None
+
+    async def commit(self, writes):
+        from google.api_core.exceptions import NotFound
+        batch = self._db.batch()
+        for write in writes:
+            ref = self._ref(write.path)
+            if write.op == "set":
+                batch.set(ref, self._native(write.data))
+            elif write.op == "update":
+                batch.update(ref, self._native(write.data))
+            else:
+                batch.delete(ref)
+        try:
+            await batch.commit()
+        except NotFound as e:
+            raise DocumentNotFound(str(e)) from e
+
+    async def query(self, collection, order_by=None, descending=False, start_after=None, where=None, limit=None):
+        from firebase_admin import firestore
+        from google.cloud.firestore_v1.base_query import FieldFilter
+        ref = self._db.collection(collection)
+        query = ref
+        if where is not None:
+            query = query.where(filter=FieldFilter(*where))
+        if order_by is not None:
+            direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+            query = query.order_by(order_by, direction=direction)
+        if start_after is not None:
+            cursor = await ref.document(start_after).get()
+            if not cursor.exists:
+                return None
+            query = query.start_after(cursor)
+        if limit:
+            query = query.limit(limit)
+        return [(snap.id, snap.to_dict()) async for snap in query.stream()]
+
+    async def stream(self, collection):
+        async for snap in self._db.collection(collection).stream():
+            yield snap.id, snap.to_dict() or {}
+
+
+def make_document_store(backend: str | None = None) -> DocumentStore:
+    """Build the configured storage backend."""
+    backend = (backend or STORAGE_BACKEND).lower()
+    if backend == "firestore":
+        return FirestoreDocumentStore()
+    if backend == "memory":
+        return MemoryDocumentStore()
+    if backend == "sqlite":
+        return SQLiteDocumentStore()
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}' (expected firestore, memory or sqlite)")
+
+
+_store: Optional[DocumentStore] = None
+
+
+def get_store() -> DocumentStore:
+    """The process-wide store, built from config on first use."""
+    global _store
+    if _store is None:
+        _store = make_document_store()
+    return _store
+
+
+def set_store(store: DocumentStore) -> None:
+    """Swap the process-wide store (benchmarks, tests, tooling)."""
+    global _store
+    _store = store
@@ -0,0 +1,147 @@
+# app/core/tracing.py
+"""
+Optional OpenTelemetry tracing.
+
+Spans cover each stage of a request: the HTTP request itself (main.py), token
+verification, every storage operation in firestore_utils and the write
+batcher, every Gemini call in the LLM gateway and every link-checker probe.
+Background profile/compass jobs start their own trace, linked to the request
+that scheduled them.
+
+Enabled with TRACING_EXPORTER:
+- "none":    off (default); `span()` is a no-op
+- "console": spans printed to stdout
+- "file":    one JSON span per line in TRACING_FILE_PATH
+
+Both exporters work offline. If opentelemetry-sdk is not installed, tracing
+stays off and the app runs unchanged.
+"""
+import contextlib
+from typing import Iterable, Optional
+
+from app.core.config import TRACING_EXPORTER, TRACING_FILE_PATH, TRACING_SERVICE_NAME
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.context import Context
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.trace import Link, SpanKind
+except ImportError:  # optional dependency
+    trace = None
+
+_tracer = None
+_provider = None
+_output = None
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is off."""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+    def end(self):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def setup() -> bool:
+    """Install the tracer for TRACING_EXPORTER. Returns whether tracing is on."""
+    global _tracer, _provider, _output
+    if _tracer is not None:
+        return True
+    exporter = (TRACING_EXPORTER or "none").lower()
+    if exporter == "none":
+        return False
+    if trace is None:
+        print("[Tracing] TRACING_EXPORTER is set but opentelemetry-sdk is not installed; tracing is off")
+        return False
+
+    if exporter == "console":
+        span_exporter = ConsoleSpanExporter()
+    elif exporter == "file":
+        _output = open(TRACING_FILE_PATH, "a", encoding="utf-8")
+        span_exporter = ConsoleSpanExporter(out=_output, formatter=lambda s: s.to_json(indent=None) + "\n")
+    else:
+        raise ValueError(f"Unknown TRACING_EXPORTER '{exporter}' (expected none, console or file)")
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": TRACING_SERVICE_NAME}))
+    _provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    _tracer = _provider.get_tracer("disha-backend")
+    print(f"[Tracing] Exporting spans to {TRACING_FILE_PATH if exporter == 'file' else 'stdout'}")
+    return True
+
+
+def shutdown() -> None:
+    """Flush buffered spans; called from the app lifespan."""
+    global _tracer, _provider, _output
+    if _provider is not None:
+        _provider.shutdown()
+    if _output is not None:
+        _output.close()
+    _tracer = _provider = _output = None
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def _clean(attributes: Optional[dict]) -> dict:
+    # OpenTelemetry attributes must be primitives; drop unset ones
+    return {k: v for k, v in (attributes or {}).items() if v is not None}
+
+
+def _kind(kind: str):
+    return {"server": SpanKind.SERVER, "client": SpanKind.CLIENT}.get(kind, SpanKind.INTERNAL)
+
+
+@contextlib.contextmanager
+def span(name: str, attributes: Optional[dict] = None, kind: str = "internal",
+         links: Iterable = (), root: bool = False):
+    """
+    Run the block inside a span that is current for everything it calls
+    (threads started with asyncio.to_thread and new tasks included).
+    `root` starts a new trace; `links` relate it to other spans.
+    """
+    if _tracer is None:
+        yield _NOOP_SPAN
+        return
+    with _tracer.start_as_current_span(
+        name,
+        context=Context() if root else None,
+        kind=_kind(kind),
+        attributes=_clean(attributes),
+        links=[link for link in links if link is not None],
+    ) as current:
+        yield current
+
+
+def start_span(name: str, attributes: Optional[dict] = None, kind: str = "internal"):
+    """A span the caller must `end()`, for work spread over several resumptions (streams)."""
+    if _tracer is None:
+        return _NOOP_SPAN
+    return _tracer.start_span(name, kind=_kind(kind), attributes=_clean(attributes))
+
+
+def set_attributes(attributes: dict) -> None:
+    """Add attributes to the current span, if any."""
+    if _tracer is not None:
+        trace.get_current_span().set_attributes(_clean(attributes))
+
+
+def current_link():
+    """Link to the current span, to relate background work to the request that started it."""
+    if _tracer is None:
+        return None
+    context = trace.get_current_span().get_span_context()
+    return Link(context) if context.is_valid else None
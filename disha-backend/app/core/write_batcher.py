@@ -0,0 +1,276 @@
+# app/core/write_batcher.py
+"""
+Write-behind batcher for field updates to stored documents.
+
+Bursts of small updates (pathway checkboxes, quiz scores, background
+profile/compass writes) are buffered per document for
+WRITE_BATCH_WINDOW_SECONDS, merged into one update per document and
+committed together as a single store commit. Transient failures (contention,
+unavailability) are retried with jittered backoff; updates that still fail
+are buffered again, underneath anything submitted since.
+
+The request that submitted an update has already returned, so an update
+that fails permanently (e.g. InvalidArgument) cannot be reported to it.
+It is recorded instead: in `write_failures/{id}` in the store (document
+path, the updates, the error), in the last few entries of `snapshot()` and
+in the failed-writes metric, so the lost change can be found and replayed.
+
+Rules callers rely on:
+- flush-on-read: `flush_document(path)` commits a document's pending
+  update before it is read (firestore_utils does this in `_load_user`)
+- flush-on-shutdown: `stop()` commits everything still buffered
+
+Buffering only happens while the flush loop is running (see `start()`);
+otherwise `submit` returns False and the caller writes directly.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.core import tracing
+from app.core.config import WRITE_BATCH_MAX_RETRIES, WRITE_BATCH_WINDOW_SECONDS
+from app.core.storage import BATCH_WRITE_LIMIT, Write, fold_updates, get_store
+
+# Window over which committed writes per second are averaged
+RATE_WINDOW_SECONDS = 60
+FAILURES_COLLECTION = "write_failures"
+RECENT_FAILURES = 20
+
+
+class _Pending:
+    __slots__ = ("path", "updates", "submitted")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.updates: list = []  # field-path updates, committed in order
+        self.submitted = 0
+
+
+class WriteBatcher:
+    def __init__(self, window_seconds: float = WRITE_BATCH_WINDOW_SECONDS, max_retries: int = WRITE_BATCH_MAX_RETRIES):
+        self.window_seconds = window_seconds
+        self.max_retries = max_retries
+        self._pending: Dict[str, _Pending] = {}
+        # Paths taken from the buffer whose commit has not finished yet
+        self._inflight: set = set()
+        self._lock = threading.Lock()
+        # Serialises commits so a flush-on-read never overtakes an older flush
+        self._commit_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._committed: deque = deque()  # (monotonic time, writes)
+        self._recent_failures: deque = deque(maxlen=RECENT_FAILURES)
+        self.stats = {"submitted": 0, "merged": 0, "commits": 0, "committed_writes": 0, "retries": 0, "requeued": 0, "failed": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # -------------------------------------------------
+    # Buffering
+    # -------------------------------------------------
+    def submit(self, path: str, updates: dict) -> bool:
+        """
+        Buffer a field-path update for the document at `path`. Returns False when
+        the batcher is not running, in which case the caller must write itself.
+        """
+        if not self.running or self.window_seconds <= 0:
+            return False
+
+        with self._lock:
+            pending = self._pending.get(path)
+            if pending is None:
+                pending = self._pending[path] = _Pending(path)
+            else:
+                self.stats["merged"] += 1
+            fold_updates(pending.updates, updates)
+            pending.submitted += 1
+            self.stats["submitted"] += 1
+        return True
+
+    def has_pending(self, path: str) -> bool:
+        with self._lock:
+            return path in self._pending or path in self._inflight
+
+    async def discard(self, path: str) -> None:
+        """
+        Drop the buffered update for `path` (its document is being deleted). A
+        commit already in flight is waited for, so it cannot land after the delete.
+        """
+        with self._lock:
+            self._pending.pop(path, None)
+            inflight = path in self._inflight
+        if inflight:
+            async with self._commit_lock:
+                pass
+            # A failed in-flight commit may have been requeued meanwhile
+            with self._lock:
+                self._pending.pop(path, None)
+
+    def _take(self, paths=None) -> list:
+        with self._lock:
+            if paths is None:
+                taken, self._pending = list(self._pending.values()), {}
+            else:
+                taken = [self._pending.pop(p) for p in paths if p in self._pending]
+            self._inflight.update(item.path for item in taken)
+        return taken
+
+    def _requeue(self, failed: list) -> None:
+        """Put failed updates back, underneath anything submitted since."""
+        with self._lock:
+            for item in failed:
+                newer = self._pending.get(item.path)
+                if newer is not None:
+                    for updates in newer.updates:
+                        fold_updates(item.updates, updates)
+                    item.submitted += newer.submitted
+                self._pending[item.path] = item
+
+    # -------------------------------------------------
+    # Committing
+    # -------------------------------------------------
+    async def _commit(self, items: list) -> None:
+        store = get_store()
+        attributes = {"db.system": type(store).__name__, "db.operation": "commit", "documents": len(items)}
+        with tracing.span("firestore.commit", attributes, kind="client") as span:
+            for attempt in range(self.max_retries + 1):
+                span.set_attribute("attempts", attempt + 1)
+                try:
+                    await store.commit([Write("update", item.path, updates) for item in items for updates in item.updates])
+                    break
+                except store.retryable_errors as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    self.stats["retries"] += 1
+                    delay = min(0.1 * (2 ** attempt), 2.0) * random.uniform(0.5, 1.5)
+                    print(f"[WriteBatcher] Commit attempt {attempt + 1} failed ({e}); retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+
+        writes = sum(len(item.updates) for item in items)
+        self.stats["commits"] += 1
+        self.stats["committed_writes"] += writes
+        self._committed.append((time.monotonic(), writes))
+
+    async def _flush_items(self, items: list) -> int:
+        try:
+            return await self._commit_all(items)
+        finally:
+            with self._lock:
+                self._inflight.difference_update(item.path for item in items)
+
+    async def _commit_all(self, items: list) -> int:
+        retryable = get_store().retryable_errors
+        committed = 0
+        # Also makes a flush-on-read wait for a commit already in progress
+        async with self._commit_lock:
+            for start in range(0, len(items), BATCH_WRITE_LIMIT):
+                chunk = items[start:start + BATCH_WRITE_LIMIT]
+                try:
+                    await self._commit(chunk)
+                    committed += len(chunk)
+                except retryable as e:
+                    print(f"[WriteBatcher] Requeued {len(chunk)} updates after repeated failures: {e}")
+                    self.stats["requeued"] += len(chunk)
+                    self._requeue(chunk)
+                except Exception:
+                    # A permanent error (e.g. NotFound for a deleted user) fails the
+                    # whole batch; commit documents one by one so the rest still land
+                    for item in chunk:
+                        try:
+                            await self._commit([item])
+                            committed += 1
+                        except retryable:
+                            self.stats["requeued"] += 1
+                            self._requeue([item])
+                        except Exception as e:
+                            await self._record_failure(item, e)
+        return committed
+
+    async def _record_failure(self, item: _Pending, error: Exception) -> None:
+        """Keep a permanently failed update where it can be found and replayed."""
+        self.stats["failed"] += 1
+        record = {
+            "path": item.path,
+            # Sentinels (ArrayUnion, DELETE_FIELD, ...) are kept as their repr
+            "updates": json.dumps(item.updates, default=repr),
+            "submitted": item.submitted,
+            "error": f"{type(error).__name__}: {error}",
+            "failed_at": datetime.utcnow().isoformat(),
+        }
+        self._recent_failures.append(record)
+        print(f"[WriteBatcher] Update for {item.path} failed permanently: {record['error']}")
+        try:
+            await get_store().set(f"{FAILURES_COLLECTION}/{uuid.uuid4().hex}", record)
+        except Exception as e:
+            print(f"[WriteBatcher] Could not record the failed update for {item.path}: {e}; updates: {record['updates']}")
+
+    async def flush(self) -> int:
+        """Commit everything buffered now. Returns the number of documents written."""
+        return await self._flush_items(self._take())
+
+    async def flush_document(self, path: str) -> int:
+        """Flush-on-read: commit the buffered update for one document, if any."""
+        if not self.has_pending(path):
+            return 0
+        return await self._flush_items(self._take([path]))
+
+    # -------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.window_seconds)
+            if self._pending:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    print(f"[WriteBatcher] Flush failed: {e}")
+
+    def start(self) -> None:
+        if self.window_seconds > 0 and not self.running:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop buffering and commit everything still pending (flush-on-shutdown)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        written = await self.flush()
+        if written:
+            print(f"[WriteBatcher] Flushed {written} buffered updates on shutdown")
+
+    # -------------------------------------------------
+    # Introspection
+    # -------------------------------------------------
+    def writes_per_second(self) -> float:
+        cutoff = time.monotonic() - RATE_WINDOW_SECONDS
+        while self._committed and self._committed[0][0] < cutoff:
+            self._committed.popleft()
+        return round(sum(n for _, n in self._committed) / RATE_WINDOW_SECONDS, 3)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            pending_docs = len(self._pending)
+            pending_updates = sum(p.submitted for p in self._pending.values())
+        return {
+            "running": self.running,
+            "window_seconds": self.window_seconds,
+            "pending_documents": pending_docs,
+            "pending_updates": pending_updates,
+            "committed_writes_per_second": self.writes_per_second(),
+            **self.stats,
+            "recent_failures": list(self._recent_failures),
+        }
+
+
+write_batcher = WriteBatcher()
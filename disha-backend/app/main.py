@@ -1,15 +1,172 @@
 # app/main.py
-from fastapi import FastAPI
+import time
+
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Match
 from app.routers import auth, users, career, health, chat, forge
-from app.core import firebase  # ensures Firebase Admin SDK is initialized
+from app.core import llm, metrics, quiz_pool, resource_cache, tracing
+from app.core import firestore_utils as fs
+from app.core.admission import Rejected, admission
+from app.core.background import profile_pipeline
+from app.core.events import event_hub
+from app.core.link_checker import link_checker
+from app.core.security import verify_status_token
+from app.core.services import services
+from app.core.write_batcher import write_batcher
+from app.core.config import PIPELINE_DRAIN_TIMEOUT_SECONDS
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Firebase, Firestore and Gemini clients are built here (or on first use), not on import
+    await services.start()
+    with services.timed("tracing"):
+        tracing.setup()
+    llm.start()
+    profile_pipeline.start()
+    quiz_pool.quiz_warmer.start()
+    resource_cache.start_background_revalidation()
+    write_batcher.start()
+    with services.timed("event_hub"):
+        await event_hub.start()
+    yield
+    await services.stop()
+    await resource_cache.stop_background_revalidation()
+    # Let queued profile/compass updates finish instead of dropping them on shutdown
+    await profile_pipeline.drain(timeout=PIPELINE_DRAIN_TIMEOUT_SECONDS)
+    # Commit buffered write-behind updates, including the pipeline's last writes
+    await write_batcher.stop()
+    # Pool warming is only an optimisation, so give it a short grace period
+    await quiz_pool.quiz_warmer.drain(timeout=5)
+    await event_hub.stop()
+    await llm.aclose()
+    await link_checker.aclose()
+    tracing.shutdown()
+
 
 app = FastAPI(
     title="Disha Backend",
     description="Backend API for Disha Guide – The Personalized Career Architect",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
+def _route_template(request: Request) -> str:
+    """Path template of the matching route (e.g. /users/{user_id}), to keep metric labels bounded."""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "other")
+    return "unmatched"
+
+def _discard_unit(request: Request, unit) -> None:
+    dropped = unit.discard()
+    if dropped:
+        print(f"[Firestore] {request.method} {request.url.path} failed; discarded {dropped} staged writes")
+
+@app.middleware("http")
+async def firestore_unit_of_work(request: Request, call_next):
+    """
+    One Firestore unit of work per request: each user document is read at most
+    once and staged writes are committed in a single batch before the
+    response goes out. A request that raises or answers 5xx commits nothing,
+    so a half-finished handler leaves no partial state. Logs the request's
+    Firestore read/write counts.
+    """
+    unit, token = fs.begin_unit_of_work(route=request.state.route)
+    try:
+        response = await call_next(request)
+    except BaseException:
+        fs.end_unit_of_work(token)
+        _discard_unit(request, unit)
+        raise
+    fs.end_unit_of_work(token)
+    if response.status_code >= 500:
+        _discard_unit(request, unit)
+    else:
+        await unit.flush()
+    metrics.record_firestore(unit.route, unit.stats)
+    stats = unit.stats
+    if stats["reads"] or stats["writes"]:
+        print(
+            f"[Firestore] {request.method} {request.url.path} → "
+            f"reads={stats['reads']} writes={stats['writes']} commits={stats['commits']}"
+        )
+    return response
+
+@app.middleware("http")
+async def request_span(request: Request, call_next):
+    """Root span of the request trace; auth, storage, Gemini and link-check spans nest under it."""
+    route = request.state.route
+    attributes = {"http.request.method": request.method, "http.route": route, "url.path": request.url.path}
+    with tracing.span(f"{request.method} {route}", attributes, kind="server") as span:
+        response = await call_next(request)
+        span.set_attribute("http.response.status_code", response.status_code)
+        return response
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    """
+    Per-class concurrency limits and bounded queues for the Gemini-backed routes
+    (see admission.py); sheds with 503 + Retry-After. Other routes pass straight through.
+    """
+    route_class = admission.classify(request.method, request.state.route)
+    if route_class is None:
+        return await call_next(request)
+    try:
+        await route_class.acquire()
+    except Rejected as e:
+        print(f"[Admission] Shed {request.method} {request.url.path} ({e})")
+        return JSONResponse(
+            {"detail": "The server is busy, please retry shortly."},
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except BaseException:
+        route_class.release(None)
+        raise
+
+    body = response.body_iterator
+
+    async def release_after_body():
+        # Streamed replies keep their slot until the last chunk has been sent
+        completed = False
+        try:
+            async for chunk in body:
+                yield chunk
+            completed = True
+        finally:
+            route_class.release(time.perf_counter() - started if completed else None)
+
+    response.body_iterator = release_after_body()
+    return response
+
+@app.middleware("http")
+async def http_metrics(request: Request, call_next):
+    """Per-route latency (until the response starts), status counts and in-flight gauge."""
+    route = request.state.route = _route_template(request)
+    labels = {"method": request.method, "route": route}
+    metrics.HTTP_IN_FLIGHT.inc(**labels)
+    started = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        metrics.HTTP_IN_FLIGHT.dec(**labels)
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - started, **labels)
+        metrics.HTTP_REQUESTS.inc(**labels, status=status)
+
 # ✅ Allow local and deployed frontend to talk to backend
 origins = [
     "http://localhost:5173",
@@ -17,18 +174,27 @@ origins = [
     "https://disha-guide-project.vercel.app",
 ]
 
+# Added after the @app.middleware functions so it is the outermost layer: responses
+# those build themselves (admission-control 503s) also get the CORS headers
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Not CORS-safelisted; the frontend reads it to back off after a 503
+    expose_headers=["Retry-After"],
 )
 
 @app.get("/")
 def root():
     return {"message": "Welcome to Disha Backend"}
 
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(verify_status_token)])
+def prometheus_metrics():
+    """Prometheus scrape endpoint; scrape it with STATUS_TOKEN as bearer token."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 # ✅ Register all routers
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(users.router, prefix="/users", tags=["Users"])
@@ -36,3 +202,6 @@ app.include_router(career.router, prefix="/career", tags=["Career"])
 app.include_router(chat.router, prefix="/chat", tags=["Chat"])
 app.include_router(forge.router, prefix="/forge", tags=["Skill Forge"])
 app.include_router(health.router, prefix="/ping", tags=["Health"])
+app.include_router(health.status_router, prefix="/ping", tags=["Health"])
+
+services.record("import", time.perf_counter() - _import_started)
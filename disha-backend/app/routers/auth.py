@@ -1,6 +1,7 @@
+import asyncio
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, EmailStr
-from app.core.firebase import firebase_auth
+from app.core.firebase import get_auth
 
 router = APIRouter(tags=["auth"])
 
@@ -13,8 +14,9 @@ async def check_email_exists(req: EmailCheckRequest):
     Checks if a user exists in Firebase Authentication based on their email.
     This is used to provide a better UX for the password reset flow.
     """
+    firebase_auth = get_auth()
     try:
-        firebase_auth.get_user_by_email(req.email)
+        await asyncio.to_thread(firebase_auth.get_user_by_email, req.email)
         return {"exists": True}
     except firebase_auth.UserNotFoundError:
         return {"exists": False}
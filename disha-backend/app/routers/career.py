@@ -1,9 +1,14 @@
 # app/routers/career.py
-from fastapi import APIRouter, Depends, HTTPException, Body
+import time
+from fastapi import APIRouter, Depends, HTTPException, Body, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from app.core.security import verify_firebase_token
 from app.core import firestore_utils as fs
-from google.cloud.firestore_v1.transforms import ArrayUnion
+from app.core import quiz_pool
+from app.core.config import EVENTS_KEEPALIVE_SECONDS, EVENTS_STREAM_MAX_SECONDS
+from app.core.etag import conditional_json
+from app.core.events import event_hub, format_sse
 
 router = APIRouter()
 
@@ -16,10 +21,44 @@ class SkillUpdateRequest(BaseModel):
     is_complete: bool
 
 @router.get("/recommendations")
-async def get_recommendations(user=Depends(verify_firebase_token)):
+async def get_recommendations(request: Request, user=Depends(verify_firebase_token)):
     user_id = user.get("uid")
-    compass_data = fs.get_user_compass(user_id)
-    return {"recommendations": compass_data.get("recommendations", [])}
+    compass_data = await fs.get_user_compass(user_id)
+    return conditional_json(request, {"recommendations": compass_data.get("recommendations", [])})
+
+@router.get("/recommendations/events")
+async def recommendation_events(user=Depends(verify_firebase_token)):
+    """
+    Server-sent events for the user's background pipeline, instead of polling:
+    `ready` with the current recommendations on connect, then `profile` and
+    `recommendations` as the pipeline stores them. The stream ends after
+    EVENTS_STREAM_MAX_SECONDS; clients reconnect.
+    """
+    user_id = user.get("uid")
+    # Subscribe before reading, so nothing published in between is missed
+    subscription = event_hub.subscribe(user_id)
+    try:
+        recommendations = (await fs.get_user_compass(user_id)).get("recommendations", [])
+    except Exception:
+        subscription.close()
+        raise
+
+    async def event_stream():
+        try:
+            yield format_sse("ready", {"recommendations": recommendations})
+            closes_at = time.monotonic() + EVENTS_STREAM_MAX_SECONDS
+            while time.monotonic() < closes_at:
+                message = await subscription.next(timeout=EVENTS_KEEPALIVE_SECONDS)
+                # A comment line keeps proxies from closing an idle stream
+                yield format_sse(*message) if message is not None else ": keepalive\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.post("/compass/add")
 async def add_to_compass(
@@ -31,14 +70,16 @@ async def add_to_compass(
     if not all(k in career_data for k in ["career_name", "description", "pathway", "education_pathway"]):
         raise HTTPException(status_code=400, detail="Invalid career data provided.")
 
-    user_doc = fs.get_user(user_id)
+    user_doc = await fs.get_user(user_id)
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
+    # Upgrades documents still using the saved_paths array (no extra read)
+    user_doc = await fs.ensure_user_document(user_id)
 
-    compass = user_doc.get("compass", {})
-    saved_paths = compass.get("saved_paths", [])
-    
-    if any(p.get("career_name") == career_data["career_name"] for p in saved_paths):
+    saved_paths = user_doc.get("compass", {}).get("saved_paths", {})
+    existing = saved_paths.get(fs.career_slug(career_data["career_name"]))
+    # A nameless entry is the leftover of a skill update that raced a removal; overwrite it
+    if isinstance(existing, dict) and existing.get("career_name"):
         return {"status": "info", "message": "This career is already in your Compass."}
 
     user_skills = {s.lower() for s in user_doc.get("profile", {}).get("skills", [])}
@@ -51,27 +92,26 @@ async def add_to_compass(
         }
         for skill in pathway_skills
     }
-    
-    completed_count = sum(1 for data in skills_status.values() if data["status"] == "complete")
-    total_skills = len(pathway_skills)
-    initial_progress = round((completed_count / total_skills) * 100) if total_skills > 0 else 0
 
+    # Progress is derived from these counters when the compass is read
     new_path = {
         **career_data,
-        "progress": initial_progress,
-        "skills_status": skills_status
+        "skills_status": skills_status,
+        "completed_skills": [skill for skill, data in skills_status.items() if data["status"] == "complete"],
+        "total_skills": len(skills_status),
     }
-    saved_paths.append(new_path)
-    
-    fs.db.collection("users").document(user_id).update({"compass.saved_paths": saved_paths})
-    
+    await fs.add_saved_path(user_id, new_path)
+
+    # Pre-generate quizzes for the pathway so the Skill Forge opens instantly
+    quiz_pool.warm(pathway_skills, career_data["career_name"])
+
     return {"status": "success", "message": f"'{career_data['career_name']}' added."}
 
 @router.get("/compass")
-async def get_compass(user=Depends(verify_firebase_token)):
+async def get_compass(request: Request, user=Depends(verify_firebase_token)):
     user_id = user.get("uid")
-    compass_data = fs.get_user_compass(user_id)
-    return {"compass": compass_data.get("saved_paths", [])}
+    compass_data = await fs.get_user_compass(user_id)
+    return conditional_json(request, {"compass": compass_data.get("saved_paths", [])})
 
 @router.post("/compass/skill/update")
 async def update_skill_status(
@@ -79,50 +119,13 @@ async def update_skill_status(
     user=Depends(verify_firebase_token)
 ):
     user_id = user.get("uid")
-    doc_ref = fs.db.collection("users").document(user_id)
-    user_doc = doc_ref.get()
-
-    if not user_doc.exists:
-        raise HTTPException(status_code=404, detail="User not. found")
-
-    compass = user_doc.to_dict().get("compass", {})
-    saved_paths = compass.get("saved_paths", [])
-    
-    path_found = False
-    skill_newly_completed = False
-    for path in saved_paths:
-        if path.get("career_name") == req.career_name:
-            path_found = True
-            skills_status = path.get("skills_status", {})
-            
-            # --- Robust Update Logic ---
-            skill_data = skills_status.get(req.skill)
-            if not isinstance(skill_data, dict):
-                skill_data = {} # Create a new dict if it's not one
-
-            current_status = skill_data.get("status", "pending")
-            new_status = "complete" if req.is_complete else "pending"
-            
-            if current_status != "complete" and new_status == "complete":
-                skill_newly_completed = True
-
-            skill_data["status"] = new_status
-            skills_status[req.skill] = skill_data
-            path["skills_status"] = skills_status
-            # --- End of Robust Update Logic ---
-            
-            completed = sum(1 for s in path["skills_status"].values() if isinstance(s, dict) and s.get("status") == "complete")
-            total = len(path["skills_status"])
-            path["progress"] = round((completed / total) * 100) if total > 0 else 0
-            break
-    
-    if not path_found:
-        raise HTTPException(status_code=404, detail="Career path or skill not found.")
-
     # Per user request, checking a pathway item only updates progress in the compass.
     # It does not add the item to the main user profile's skills list.
-    doc_ref.update({"compass.saved_paths": saved_paths})
-    
+    # Field-level write of this one skill; the path and skill must exist
+    result = await fs.set_skill_status(user_id, req.career_name, req.skill, req.is_complete)
+    if not result["ok"]:
+        raise HTTPException(status_code=404, detail="Career path or skill not found.")
+
     return {"status": "success", "message": "Skill status updated."}
 
 @router.delete("/compass/remove")
@@ -131,12 +134,12 @@ async def remove_from_compass(
     user=Depends(verify_firebase_token)
 ):
     user_id = user.get("uid")
-    compass = fs.get_user_compass(user_id)
+    compass = await fs.get_user_compass(user_id)
     
     updated_paths = [p for p in compass.get("saved_paths", []) if p.get("career_name") != req.career_name]
 
     if len(updated_paths) == len(compass.get("saved_paths", [])):
         raise HTTPException(status_code=404, detail=f"Career '{req.career_name}' not found.")
 
-    fs.db.collection("users").document(user_id).update({"compass.saved_paths": updated_paths})
+    await fs.remove_saved_path(user_id, req.career_name)
     return {"status": "success", "message": f"'{req.career_name}' removed."}
\ No newline at end of file
@@ -1,99 +1,82 @@
 # app/routers/chat.py
-import os
 import json
+import time
 import asyncio
-from fastapi import APIRouter, Depends, HTTPException
+from contextlib import aclosing
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-from dotenv import load_dotenv
-import google.generativeai as genai
 
 from app.core.security import verify_firebase_token
 from app.core import firestore_utils as fs
 from app.models.user import UserProfile
 from app.core import prompts
+from app.core import llm
+from app.core import memory
+from app.core import recommendation_cache
+from app.core import tracing
+from app.core.etag import compute_etag, conditional_json, etag_matches, not_modified
+from app.core.background import profile_pipeline
+from app.core.events import event_hub, format_sse
+from app.core.config import CHAT_WINDOW_TURNS, CHAT_SUMMARY_BATCH
 
 router = APIRouter()
-load_dotenv()
 
 # -----------------------------------------------------
 # GEMINI CONFIG
 # -----------------------------------------------------
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
-# Models now use centralized system instructions from prompts.py
-chat_model = genai.GenerativeModel(
-    "gemini-2.0-flash-001",
-    system_instruction=prompts.CHAT_MODEL_INSTRUCTION
-)
-profile_model = genai.GenerativeModel(
-    "gemini-2.0-flash-001",
-    system_instruction=prompts.PROFILE_EXTRACTION_INSTRUCTION
-)
-career_model = genai.GenerativeModel(
-    "gemini-2.0-flash-001",
-    system_instruction=prompts.CAREER_RECOMMENDATION_INSTRUCTION
-)
+# Calls go through the LLM gateway; "chat", "profile", "career" and "summary"
+# are registered there with their system instructions from prompts.py.
+
+# Upper bound for a single page of GET /chat/history
+HISTORY_PAGE_MAX = 100
+# Turns sent to the profile extractor per call when catching up on a backlog
+PROFILE_DELTA_MAX_TURNS = 20
+# Turns folded into the running summary per Gemini call when catching up on a backlog
+SUMMARY_FOLD_MAX_TURNS = 40
 
 # -----------------------------------------------------
 # MODELS
 # -----------------------------------------------------
 class ChatRequest(BaseModel):
     message: str
+    # Id of the newest turn the client already has; the response then also
+    # carries any turns saved after it (e.g. from another device)
+    since: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
     reply: str
+    # Only turns the client does not have yet, oldest-first; the full
+    # history when `reset` is set
     history: List[Dict[str, Any]]
     turn: Optional[Dict[str, Any]] = None
+    reset: bool = False
 
 
 # -----------------------------------------------------
 # HELPERS
 # -----------------------------------------------------
-def _extract_text_from_genai(resp) -> str:
-    try:
-        if getattr(resp, "text", None):
-            return resp.text
-    except Exception:
-        pass
-    try:
-        candidates = getattr(resp, "candidates", None)
-        if candidates:
-            cand = candidates[0]
-            content = getattr(cand, "content", None)
-            if isinstance(content, str):
-                return content
-            if isinstance(content, list):
-                return " ".join(
-                    p if isinstance(p, str) else p.get("text") or str(p)
-                    for p in content
-                )
-    except Exception:
-        pass
-    return str(resp)
-
-
-async def _extract_profile_from_history(history: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Asynchronously generate structured profile JSON from user messages."""
-    loop = asyncio.get_running_loop()
-    
+async def _extract_profile_patch(current_profile: Dict[str, Any], new_turns: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Asynchronously extract a profile patch from only the new user messages.
+    Raises ValueError when the model's reply is not a non-empty JSON object
+    (the instruction asks for every key, null when unchanged), so the turns
+    are not marked as processed.
+    """
     user_messages = [
         f"User: {turn['user']['text']}"
-        for turn in history
+        for turn in new_turns
         if turn.get("user", {}).get("text")
     ]
-    transcript = "\n".join(user_messages)
-
-    if not transcript:
+    if not user_messages:
         return {}
 
     # Use the centralized prompt generator
-    prompt = prompts.get_profile_extraction_prompt(transcript)
-    
-    resp = await loop.run_in_executor(None, lambda: profile_model.generate_content(prompt))
-    
-    profile_text = _extract_text_from_genai(resp).strip()
+    prompt = prompts.get_profile_delta_prompt(current_profile, "\n".join(user_messages))
+
+    profile_text = (await llm.generate_text("profile", prompt)).strip()
     json_start = profile_text.find("{")
     json_end = profile_text.rfind("}") + 1
     if json_start != -1 and json_end > json_start:
@@ -102,36 +85,47 @@ async def _extract_profile_from_history(history: List[Dict[str, Any]]) -> Dict[s
     try:
         data = json.loads(profile_text)
     except Exception:
-        print(f"[WARN] Could not parse profile JSON: {profile_text}")
-        data = {}
-
+        raise ValueError(f"Could not parse profile JSON: {profile_text[:200]}")
+    if not isinstance(data, dict) or not data:
+        raise ValueError(f"Profile reply is not a JSON patch: {profile_text[:200]}")
     return data
 
 
-async def _update_user_profile(user_id: str, history: List[Dict[str, Any]], email: str):
-    """Asynchronously extract structured profile info and update Firestore."""
-    try:
-        if not history:
-            return {}
-
-        profile_data = await _extract_profile_from_history(history)
+async def _update_user_profile(user_id: str, email: str) -> Dict[str, Any]:
+    """
+    Incrementally extract profile info from turns newer than the stored
+    watermark and merge it into Firestore. Returns the merged profile.
 
+    The watermark only moves past turns whose patch was extracted. A failed
+    extraction raises (failing the pipeline job) and leaves the turns
+    pending, so the user's next pipeline run extracts them again.
+    """
+    await fs.ensure_user_document(user_id, email=email)
+    user_data = await fs.get_user_profile(user_id) or {}
+    profile = user_data.get("profile", {})
+    watermark = await fs.get_profile_watermark(user_id)
+
+    # Normally one new turn; a backlog (e.g. first run after upgrading) is walked in batches
+    while True:
+        new_turns = await fs.get_chat_turns_since(user_id, watermark["timestamp"], PROFILE_DELTA_MAX_TURNS)
+        if not new_turns:
+            return profile
+
+        patch = await _extract_profile_patch(profile, new_turns)
         try:
-            profile_obj = UserProfile(**profile_data)
-            validated = profile_obj.dict(exclude_none=True)
+            validated = UserProfile(**patch).dict(exclude_none=True)
         except Exception as e:
             print(f"[WARN] Profile validation failed: {e}")
-            validated = profile_data
+            validated = patch
 
-        await asyncio.to_thread(fs.ensure_user_document, user_id, email=email)
-        await asyncio.to_thread(fs.update_user_profile, user_id, validated)
-        
-        print(f"[Profile Updated] {user_id} ", "\u2192", " {validated}")
-        return validated
+        watermark = {"turn_id": new_turns[-1].get("id"), "timestamp": new_turns[-1].get("timestamp")}
+        result = await fs.update_user_profile(user_id, validated, watermark)
+        profile = result.get("profile", profile)
+        print(f"[Profile Updated] {user_id} \u2192 {len(new_turns)} new turns processed")
+        await event_hub.publish(user_id, "profile", {"profile": profile})
 
-    except Exception as e:
-        print(f"[WARN] Profile extraction failed: {e}")
-        return {}
+        if len(new_turns) < PROFILE_DELTA_MAX_TURNS:
+            return profile
 
 
 def _is_profile_ready(profile: Dict[str, Any]) -> bool:
@@ -147,31 +141,48 @@ def _is_profile_ready(profile: Dict[str, Any]) -> bool:
     return has_education and has_skills and has_interests and has_goal
 
 
-async def _update_compass_recommendations(user_id: str, profile_data: Dict[str, Any]):
+async def _generate_recommendations(profile: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Ask the career model for recommendations; [] if none could be parsed."""
+    # Use the centralized prompt generator
+    prompt = prompts.get_career_recommendation_prompt(profile)
+
+    text = (await llm.generate_text("career", prompt)).strip()
+    list_start = text.find("[")
+    list_end = text.rfind("]") + 1
+    if list_start != -1 and list_end > list_start:
+        text = text[list_start:list_end]
+
+    recommendations = json.loads(text)
+    return recommendations if isinstance(recommendations, list) else []
+
+
+async def _update_compass_recommendations(user_id: str, profile_data: Dict[str, Any], force: bool = False):
     """
-    Asynchronously generates career recommendations, saves them to Firestore,
-    and returns the generated list.
+    Stores career recommendations for the user's current profile and returns
+    them. Skipped when the profile fingerprint matches the stored
+    recommendations; otherwise served from the shared recommendation cache or
+    generated. `force` regenerates regardless.
     """
-    loop = asyncio.get_running_loop()
     try:
         if not _is_profile_ready(profile_data):
             print("[INFO] Skipping compass update ", "\u2014", " profile incomplete.")
             return []
 
-        # Use the centralized prompt generator
-        prompt = prompts.get_career_recommendation_prompt(profile_data)
-
-        resp = await loop.run_in_executor(None, lambda: career_model.generate_content(prompt))
-        text = _extract_text_from_genai(resp).strip()
-        list_start = text.find("[")
-        list_end = text.rfind("]") + 1
-        if list_start != -1 and list_end > list_start:
-            text = text[list_start:list_end]
+        fingerprint = recommendation_cache.profile_fingerprint(profile_data)
+        if not force:
+            compass = await fs.get_user_compass(user_id)
+            if compass.get("fingerprint") == fingerprint and compass.get("recommendations"):
+                recommendation_cache.note_unchanged()
+                print(f"[Compass] {user_id} profile unchanged; keeping stored recommendations")
+                return compass["recommendations"]
 
-        recommendations = json.loads(text)
-        if isinstance(recommendations, list) and recommendations:
-            await asyncio.to_thread(fs.update_compass_recommendations, user_id, recommendations)
-            print(f"[Compass Updated] {user_id} ", "\u2192", " {len(recommendations)} recommendations stored.")
+        recommendations, source = await recommendation_cache.get_recommendations(
+            profile_data, _generate_recommendations, force=force
+        )
+        if recommendations:
+            await fs.update_compass_recommendations(user_id, recommendations, fingerprint)
+            await event_hub.publish(user_id, "recommendations", {"recommendations": recommendations})
+            print(f"[Compass Updated] {user_id} \u2192 {len(recommendations)} recommendations stored ({source}).")
             return recommendations
         else:
             print("[INFO] No valid career recommendations parsed.")
@@ -182,6 +193,80 @@ async def _update_compass_recommendations(user_id: str, profile_data: Dict[str,
         return []
 
 
+async def _update_conversation_memory(user_id: str):
+    """
+    Fold turns that have slid out of the verbatim window into the running
+    summary. Runs in the background; only calls Gemini once a batch is ready.
+    A backlog (e.g. the first fold for a long-standing user) is folded
+    SUMMARY_FOLD_MAX_TURNS at a time, so each summary prompt stays bounded.
+    """
+    try:
+        stored = await fs.get_conversation_memory(user_id)
+        summary, summarized_through, summarized_turns = (
+            stored["summary"], stored["summarized_through"], stored["summarized_turns"]
+        )
+        limit = SUMMARY_FOLD_MAX_TURNS + CHAT_WINDOW_TURNS
+
+        while True:
+            pending = await fs.get_chat_turns_since(user_id, summarized_through, limit)
+
+            # The newest turns are still sent verbatim, so keep them out of the summary
+            to_fold = pending[:-CHAT_WINDOW_TURNS] if CHAT_WINDOW_TURNS else pending
+            if len(to_fold) < CHAT_SUMMARY_BATCH:
+                return
+
+            prompt = prompts.get_summary_update_prompt(summary, memory.format_turns(to_fold))
+            folded = (await llm.generate_text("summary", prompt)).strip()
+            if not folded:
+                return
+
+            summary, summarized_through = folded, to_fold[-1]["timestamp"]
+            summarized_turns += len(to_fold)
+            await fs.save_conversation_memory(user_id, summary, summarized_through, summarized_turns)
+
+            # A short page means everything foldable has been folded
+            if len(pending) < limit:
+                return
+    except Exception as e:
+        print(f"[WARN] Conversation memory update failed: {e}")
+
+
+async def _build_chat_prompt(user_id: str, email: str, user_message: str) -> str:
+    """Prompt = running summary + the turns it does not cover yet, for a new message."""
+    await fs.ensure_user_document(user_id, email=email)
+    history = await fs.get_chat_history(user_id, limit=CHAT_WINDOW_TURNS + CHAT_SUMMARY_BATCH) or []
+
+    # Folding happens in batches, so that is at most window + batch turns,
+    # further capped by the token budget.
+    stored_memory = await fs.get_conversation_memory(user_id)
+    recent_turns = [
+        turn for turn in history
+        if not stored_memory["summarized_through"]
+        or turn.get("timestamp", "") > stored_memory["summarized_through"]
+    ]
+    return prompts.get_chat_prompt(user_message, recent_turns, summary=stored_memory["summary"])
+
+
+def _schedule_profile_pipeline(user_id: str, email: str):
+    """
+    Queue memory, profile and compass updates after a saved turn. Coalesced per
+    user: a burst of messages triggers one run over the latest state. Profile
+    extraction picks up the saved turn via its watermark, so the job is only
+    queued once the turn is committed. The run gets its own trace, linked to
+    the request that scheduled it.
+    """
+    parent = tracing.current_link()
+
+    async def update_profile_and_compass():
+        with tracing.span("background.update_profile_and_compass", {"user.id": user_id}, links=[parent], root=True):
+            await _update_conversation_memory(user_id)
+            profile_data = await _update_user_profile(user_id, email)
+            if _is_profile_ready(profile_data):
+                await _update_compass_recommendations(user_id, profile_data)
+
+    fs.after_commit(lambda: profile_pipeline.submit(user_id, update_profile_and_compass))
+
+
 # -----------------------------------------------------
 # ROUTES
 # -----------------------------------------------------
@@ -195,44 +280,23 @@ async def chat(req: ChatRequest, user=Depends(verify_firebase_token)):
         if not user_message:
             raise HTTPException(status_code=400, detail="Message cannot be empty")
 
-        await asyncio.to_thread(fs.ensure_user_document, user_id, email=email)
-        history = await asyncio.to_thread(fs.get_chat_history, user_id) or []
-
-        temp_history_for_extraction = history + [{
-            "user": {"text": user_message},
-            "ai": {"text": ""},
-            "id": "temp" 
-        }]
-
-        async def update_profile_and_compass():
-            profile_data = await _update_user_profile(user_id, temp_history_for_extraction, email)
-            if _is_profile_ready(profile_data):
-                await _update_compass_recommendations(user_id, profile_data)
-
-        asyncio.create_task(update_profile_and_compass())
+        prompt = await _build_chat_prompt(user_id, email, user_message)
+        ai_reply = await llm.generate_text("chat", prompt) or "Sorry, I couldn't form an answer."
 
-        transcript_parts = []
-        for turn in history:
-            if turn.get("user", {}).get("text"):
-                transcript_parts.append(f"User: {turn['user']['text']}")
-            if turn.get("ai", {}).get("text"):
-                transcript_parts.append(f"AI: {turn['ai']['text']}")
-        transcript_parts.append(f"User: {user_message}")
-        conversation_text = "\n".join(transcript_parts)
+        saved_turn = await fs.save_chat_turn(user_id, user_message, ai_reply, email=email)
+        _schedule_profile_pipeline(user_id, email)
 
-        # Use the centralized prompt generator
-        prompt = prompts.get_chat_prompt(conversation_text)
+        new_turns, reset = [saved_turn], False
+        if req.since:
+            # The cursor may have been deleted meanwhile; then send everything
+            new_turns = await fs.get_chat_turns_after(user_id, req.since)
+            if new_turns is None:
+                new_turns, reset = await fs.get_chat_history(user_id), True
+            # The new turn is only committed with the request's unit of work
+            if all(turn.get("id") != saved_turn["id"] for turn in new_turns):
+                new_turns.append(saved_turn)
 
-        gemini_response = await asyncio.get_running_loop().run_in_executor(
-            None, lambda: chat_model.generate_content(prompt)
-        )
-        ai_reply = _extract_text_from_genai(gemini_response) or "Sorry, I couldn't form an answer."
-
-        new_turn_id = await asyncio.to_thread(fs.save_chat_turn, user_id, user_message, ai_reply, email=email)
-        updated_history = await asyncio.to_thread(fs.get_chat_history, user_id) or []
-        
-        saved_turn = next((t for t in updated_history if t.get("id") == new_turn_id), None)
-        return ChatResponse(reply=ai_reply, history=updated_history, turn=saved_turn)
+        return ChatResponse(reply=ai_reply, history=new_turns, turn=saved_turn, reset=reset)
 
     except HTTPException:
         raise
@@ -241,26 +305,117 @@ async def chat(req: ChatRequest, user=Depends(verify_firebase_token)):
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
 
+@router.post("/stream")
+async def chat_stream(req: ChatRequest, user=Depends(verify_firebase_token)):
+    """
+    Server-Sent Events version of POST /chat. Emits `chunk` events with reply
+    text as Gemini produces it, then one `done` event with the saved turn.
+    The turn is only saved once the reply completes; if the client disconnects
+    first, generation is cancelled and nothing is stored.
+    """
+    user_id = user.get("uid")
+    email = user.get("email")
+    user_message = req.message.strip()
+    if not user_message:
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+
+    try:
+        prompt = await _build_chat_prompt(user_id, email, user_message)
+    except Exception as e:
+        print(f"[ERROR] Chat stream exception: {e}")
+        raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
+
+    async def event_stream():
+        started = time.perf_counter()
+        ttft_ms = None
+        chunks: List[str] = []
+        try:
+            # On disconnect Starlette cancels this generator; aclosing() then
+            # closes the gateway stream so its concurrency slots are released.
+            async with aclosing(llm.stream("chat", prompt)) as reply_chunks:
+                async for text in reply_chunks:
+                    if ttft_ms is None:
+                        ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+                    chunks.append(text)
+                    yield format_sse("chunk", {"text": text})
+        except asyncio.CancelledError:
+            print(f"[Chat] Stream for {user_id} cancelled by client disconnect")
+            raise
+        except Exception as e:
+            print(f"[ERROR] Chat stream exception: {e}")
+            yield format_sse("error", {"detail": "Chat error: the reply could not be generated."})
+            return
+
+        ai_reply = "".join(chunks) or "Sorry, I couldn't form an answer."
+        saved_turn = await fs.save_chat_turn(user_id, user_message, ai_reply, email=email)
+        _schedule_profile_pipeline(user_id, email)
+        yield format_sse("done", {"turn": saved_turn, "ttft_ms": ttft_ms})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/history")
-async def get_history(user=Depends(verify_firebase_token)):
+async def get_history(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=HISTORY_PAGE_MAX),
+    before: Optional[str] = None,
+    since: Optional[str] = None,
+    epoch: Optional[int] = None,
+    user=Depends(verify_firebase_token),
+):
+    """
+    Returns chat history oldest-first. Pass `limit` to page from the newest turn
+    backwards and `before` (a turn id, usually `next_before`) for older pages.
+
+    Delta sync: pass `since` (usually the previous `next_since`) and the
+    previous `epoch` to get only newer turns. If turns were deleted or the
+    cursor is gone, the response has `reset: true` and carries the full
+    (or latest `limit`) history instead. Responses carry an ETag derived from
+    the chat version, so an unchanged history answers 304 without being read.
+    """
     user_id = user.get("uid")
-    fs.ensure_user_document(user_id)
-    history = fs.get_chat_history(user_id)
-    return {"history": history}
+    chat_meta = fs.get_chat_meta(await fs.ensure_user_document(user_id))
+    etag = compute_etag("chat-history", user_id, chat_meta, limit, before, since, epoch)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    reset = False
+    if since:
+        history = None
+        if epoch is None or epoch == chat_meta["epoch"]:
+            history = await fs.get_chat_turns_after(user_id, since, limit=limit)
+        if history is None:
+            history, reset = await fs.get_chat_history(user_id, limit=limit), True
+    else:
+        history = await fs.get_chat_history(user_id, limit=limit, before=before)
+
+    has_more = bool(limit) and len(history) == limit and (reset or not since)
+    payload = {
+        "history": history,
+        "next_before": history[0]["id"] if has_more else None,
+        "next_since": history[-1]["id"] if history else (None if reset else since),
+        "epoch": chat_meta["epoch"],
+        "reset": reset,
+    }
+    return conditional_json(request, payload, etag=etag)
 
 
 @router.delete("/all")
 @router.delete("/clear")
 async def clear_history(user=Depends(verify_firebase_token)):
     user_id = user.get("uid")
-    fs.delete_chat_history(user_id)
+    await fs.delete_chat_history(user_id)
     return {"message": "All chat history cleared"}
 
 
 @router.delete("/{message_id}")
 async def delete_message(message_id: str, user=Depends(verify_firebase_token)):
     user_id = user.get("uid")
-    fs.delete_single_message(user_id, message_id)
+    await fs.delete_single_message(user_id, message_id)
     return {"message": f"Message {message_id} deleted"}
 
 
@@ -271,7 +426,7 @@ async def refresh_recommendations(user=Depends(verify_firebase_token)):
     and overwrites the old ones.
     """
     user_id = user.get("uid")
-    user_data = fs.get_user_profile(user_id)
+    user_data = await fs.get_user_profile(user_id)
 
     if not user_data or "profile" not in user_data:
         raise HTTPException(status_code=404, detail="User profile not found or is incomplete.")
@@ -279,7 +434,8 @@ async def refresh_recommendations(user=Depends(verify_firebase_token)):
     user_profile = user_data["profile"]
 
     try:
-        new_recommendations = await _update_compass_recommendations(user_id, user_profile)
+        # An explicit refresh always asks the model again
+        new_recommendations = await _update_compass_recommendations(user_id, user_profile, force=True)
         
         return {
             "status": "success",
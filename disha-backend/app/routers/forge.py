@@ -1,29 +1,26 @@
 # app/routers/forge.py
-import os
 import json
 import httpx
-import asyncio
 import re
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-import google.generativeai as genai
 from app.core.security import verify_firebase_token
 from app.core import firestore_utils as fs
-from google.cloud.firestore_v1.transforms import ArrayUnion
 from typing import List
 from app.core import prompts
+from app.core import llm
+from app.core import quiz_pool
+from app.core import resource_cache
+from app.core.link_checker import link_checker
+from app.core.config import LINK_CHECK_ENOUGH_VALID
 
 router = APIRouter()
 
 # -----------------------------------------------------
 # GEMINI CONFIG
 # -----------------------------------------------------
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-001:generateContent"
-
-quiz_model = genai.GenerativeModel("gemini-2.0-flash-001")# free model 
-feedback_model = genai.GenerativeModel("gemini-2.0-flash-001") 
+# Calls go through the LLM gateway: "quiz" and "feedback" are SDK profiles,
+# "resources" is a raw REST call with google_search grounding.
 
 # -----------------------------------------------------
 # MODELS
@@ -48,31 +45,57 @@ class FeedbackRequest(BaseModel):
 # -----------------------------------------------------
 # HELPERS
 # -----------------------------------------------------
-async def _validate_url(client: httpx.AsyncClient, url: str) -> bool:
-    """Asynchronously validates a single URL."""
-    try:
-        response = await client.head(url, follow_redirects=True, timeout=10)
-        return response.status_code < 400
-    except httpx.RequestError as e:
-        print(f"URL validation failed for {url}: {e}")
-        return False
-
-async def _validate_resources(resources: list) -> list:
-    """Filters a list of resources, returning only those with valid and accessible URLs."""
-    async with httpx.AsyncClient() as client:
-        validation_tasks = [_validate_url(client, resource.get("url", "")) for resource in resources]
-        results = await asyncio.gather(*validation_tasks)
-    return [resources[i] for i, is_valid in enumerate(results) if is_valid]
-
-def _extract_json_from_response(text: str) -> dict:
-    try:
-        json_start = text.find('{')
-        json_end = text.rfind('}') + 1
-        if json_start == -1 or json_end == 0: return None
-        json_str = text[json_start:json_end]
-        return json.loads(json_str)
-    except (json.JSONDecodeError, IndexError):
-        return None
+async def _revalidate_links(resources: list) -> list:
+    """Fresh link check (bypassing cached results) for the resource cache sweep."""
+    return await link_checker.filter_valid(resources, use_cache=False)
+
+async def _fetch_resources(skill: str, career_name: str) -> dict:
+    """
+    Asks Gemini (with google_search grounding) for resources and keeps only the
+    ones whose URLs validate. This is the resource cache's loader.
+    """
+    # Use the centralized prompt generator
+    prompt = prompts.find_resources_prompt(skill, career_name)
+
+    payload = {"contents": [{"parts": [{"text": prompt}]}], "tools": [{"google_search": {}}]}
+
+    # The gateway already retries 429/503; these attempts cover unusable answers
+    for attempt in range(3):
+        try:
+            api_response = await llm.generate_rest("resources", payload)
+            if not api_response.get("candidates"):
+                raise HTTPException(status_code=500, detail="AI response was empty or invalid.")
+            parts = api_response["candidates"][0].get("content", {}).get("parts", [])
+            resource_json = None
+            for part in parts:
+                if part.get("text"):
+                    json_from_text = llm.extract_json_object(part["text"])
+                    if json_from_text and "resources" in json_from_text:
+                        resource_json = json_from_text
+                        break
+            if resource_json and resource_json.get("resources"):
+                # Retries reuse cached link results, so only new URLs are checked
+                validated_resources = await link_checker.filter_valid(
+                    resource_json["resources"], enough=LINK_CHECK_ENOUGH_VALID
+                )
+                if not validated_resources:
+                    print(f"Attempt {attempt + 1}: All resource URLs were invalid. Retrying...")
+                    continue
+                resource_json["resources"] = validated_resources
+                return resource_json
+            continue
+        except httpx.HTTPStatusError as e:
+            print(f"❌ HTTP Error on attempt {attempt + 1}: {e.response.text}")
+            if attempt == 2:
+                raise HTTPException(status_code=500, detail="An error occurred while fetching resources.")
+        except Exception as e:
+            print(f"❌ Unhandled Error on attempt {attempt + 1}: {e}")
+            if attempt == 2:
+                raise HTTPException(status_code=500, detail="An unexpected error occurred.")
+    
+    raise HTTPException(status_code=503, detail="The model is currently overloaded or failed to find valid resources. Please try again in a few moments.")
+
+resource_cache.register_loader(_fetch_resources, _revalidate_links)
 
 # -----------------------------------------------------
 # ROUTES
@@ -82,13 +105,10 @@ async def generate_assessment(req: AssessmentRequest, user=Depends(verify_fireba
     """
     Generates a multiple-choice quiz with explanations for each answer.
     """
-    # Use the centralized prompt generator
-    prompt = prompts.generate_assessment_prompt(req.skill, req.career_name)
-    
     try:
-        response = quiz_model.generate_content(prompt)
-        quiz_json = _extract_json_from_response(response.text)
-        if not quiz_json or "questions" not in quiz_json:
+        # Popular skills are served straight from the pre-generated pool
+        quiz_json = await quiz_pool.get_quiz(req.skill, req.career_name)
+        if not quiz_json:
             raise HTTPException(status_code=500, detail="Failed to generate a valid quiz from the model.")
         return quiz_json
     except Exception as e:
@@ -101,86 +121,19 @@ async def save_assessment_score(req: ScoreRequest, user=Depends(verify_firebase_
     Saves the user's assessment score to their profile in Firestore.
     """
     user_id = user.get("uid")
-    doc_ref = fs.db.collection("users").document(user_id)
-    user_doc = doc_ref.get()
-    if not user_doc.exists:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    compass = user_doc.to_dict().get("compass", {})
-    saved_paths = compass.get("saved_paths", [])
-    
-    path_found = False
-    for path in saved_paths:
-        if path.get("career_name") == req.career_name:
-            path_found = True
-            skills_status = path.get("skills_status", {})
-            skill_data = skills_status.get(req.skill)
-            if not isinstance(skill_data, dict):
-                skill_data = {}
-            skill_data["score"] = req.score
-            skill_data["status"] = "complete"
-            skills_status[req.skill] = skill_data
-            path["skills_status"] = skills_status
-            
-            completed_count = sum(1 for s in path["skills_status"].values() if isinstance(s, dict) and s.get("status") == "complete")
-            total_skills = len(path["skills_status"])
-            path["progress"] = round((completed_count / total_skills) * 100) if total_skills > 0 else 0
-            break
-    
-    if not path_found:
+    # Field-level write of this one skill; progress is derived on read
+    result = await fs.set_skill_status(user_id, req.career_name, req.skill, complete=True, score=req.score)
+    if not result["ok"]:
         raise HTTPException(status_code=404, detail="Career path not found in user's compass.")
-
-    doc_ref.update({"compass.saved_paths": saved_paths})
     return {"status": "success", "message": "Score saved and progress updated."}
 
 @router.post("/resources")
 async def find_learning_resources(req: ResourceRequest, user=Depends(verify_firebase_token)):
     """
     Finds verified learning resources for a given skill and career.
+    Served from the resource cache; only a miss waits for Gemini.
     """
-    # Use the centralized prompt generator
-    prompt = prompts.find_resources_prompt(req.skill, req.career_name)
-
-    payload = {"contents": [{"parts": [{"text": prompt}]}], "tools": [{"google_search": {}}]}
-    headers = {"Content-Type": "application/json", "x-goog-api-key": GEMINI_API_KEY}
-
-    for attempt in range(3):
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(GEMINI_API_URL, json=payload, headers=headers, timeout=60)
-                if response.status_code == 503:
-                    await asyncio.sleep(1 + attempt)
-                    continue
-                response.raise_for_status()
-                api_response = response.json()
-                if not api_response.get("candidates"):
-                    raise HTTPException(status_code=500, detail="AI response was empty or invalid.")
-                parts = api_response["candidates"][0].get("content", {}).get("parts", [])
-                resource_json = None
-                for part in parts:
-                    if part.get("text"):
-                        json_from_text = _extract_json_from_response(part["text"])
-                        if json_from_text and "resources" in json_from_text:
-                            resource_json = json_from_text
-                            break
-                if resource_json and resource_json.get("resources"):
-                    validated_resources = await _validate_resources(resource_json["resources"])
-                    if not validated_resources:
-                        print(f"Attempt {attempt + 1}: All resource URLs were invalid. Retrying...")
-                        continue
-                    resource_json["resources"] = validated_resources
-                    return resource_json
-                continue
-        except httpx.HTTPStatusError as e:
-            print(f"❌ HTTP Error on attempt {attempt + 1}: {e.response.text}")
-            if attempt == 2:
-                raise HTTPException(status_code=500, detail="An error occurred while fetching resources.")
-        except Exception as e:
-            print(f"❌ Unhandled Error on attempt {attempt + 1}: {e}")
-            if attempt == 2:
-                raise HTTPException(status_code=500, detail="An unexpected error occurred.")
-    
-    raise HTTPException(status_code=503, detail="The model is currently overloaded or failed to find valid resources. Please try again in a few moments.")
+    return await resource_cache.get_resources(req.skill, req.career_name)
 
 @router.post("/feedback")
 async def generate_feedback(req: FeedbackRequest):
@@ -194,8 +147,8 @@ async def generate_feedback(req: FeedbackRequest):
     prompt = prompts.generate_feedback_prompt(req.incorrect_questions)
     
     try:
-        response = feedback_model.generate_content(prompt)
-        feedback_json = _extract_json_from_response(response.text)
+        response_text = await llm.generate_text("feedback", prompt)
+        feedback_json = llm.extract_json_object(response_text)
         if not feedback_json or "topics" not in feedback_json:
             return {"topics": ["Could not determine specific topics, but please review the explanations for the questions you got wrong."]}
         return feedback_json
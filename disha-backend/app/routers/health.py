@@ -1,6 +1,18 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from app.core import llm, quiz_pool, recommendation_cache, resource_cache
+from app.core.admission import admission
+from app.core.background import profile_pipeline
+from app.core.events import event_hub
+from app.core.link_checker import link_checker
+from app.core.services import services
+from app.core.write_batcher import write_batcher
+from app.core.security import token_cache_snapshot, verify_status_token
 
+# Public: liveness and readiness for load balancers
 router = APIRouter(tags=["Health"])
+# Internal state (queues, caches, LLM usage): operators only, see STATUS_TOKEN
+status_router = APIRouter(tags=["Health"], dependencies=[Depends(verify_status_token)])
 
 @router.get("/")
 def health_check():
@@ -8,3 +20,92 @@ def health_check():
     Health check endpoint for monitoring.
     """
     return {"status": "ok"}
+
+
+@router.get("/ready")
+def readiness_check():
+    """
+    Readiness: 503 until the startup warm-up has built the external clients.
+    Includes the startup time of each component.
+    """
+    return JSONResponse(services.snapshot(), status_code=200 if services.ready() else 503)
+
+
+@status_router.get("/background")
+def background_status():
+    """
+    Queue depth, lag and counters for the per-user profile/compass pipeline.
+    """
+    return profile_pipeline.snapshot()
+
+
+@status_router.get("/auth-cache")
+def auth_cache_status():
+    """
+    Hit/miss/eviction counters for the verified-token cache.
+    """
+    return token_cache_snapshot()
+
+
+@status_router.get("/llm")
+def llm_status():
+    """
+    Per-profile Gemini call counts, latency, token usage, errors and retries.
+    """
+    return llm.snapshot()
+
+
+@status_router.get("/quiz-pool")
+def quiz_pool_status():
+    """
+    Quiz pool size, hit ratio and background warmer state.
+    """
+    return quiz_pool.snapshot()
+
+
+@status_router.get("/resource-cache")
+def resource_cache_status():
+    """
+    Learning-resource cache backend, hit ratio and refresh counters.
+    """
+    return resource_cache.snapshot()
+
+
+@status_router.get("/recommendation-cache")
+def recommendation_cache_status():
+    """
+    Shared recommendation cache hit ratio and skipped (unchanged profile) updates.
+    """
+    return recommendation_cache.snapshot()
+
+
+@status_router.get("/link-checker")
+def link_checker_status():
+    """
+    Link checker cache size and check/fallback/deadline counters.
+    """
+    return link_checker.snapshot()
+
+
+@status_router.get("/write-batcher")
+def write_batcher_status():
+    """
+    Buffered documents, merged updates, retries and committed writes per second.
+    """
+    return write_batcher.snapshot()
+
+
+@status_router.get("/events")
+def events_status():
+    """
+    Event backend, open event streams and published/delivered/dropped counters.
+    """
+    return event_hub.snapshot()
+
+
+@status_router.get("/admission")
+def admission_status():
+    """
+    Adaptive limit, in-flight requests, queue depth and shed counts per route class.
+    """
+    return admission.snapshot()
@@ -1,9 +1,11 @@
 # app/routers/users.py
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Request
 from app.models.user import UserProfile
 from app.core.security import verify_firebase_token
 from app.core import firestore_utils as fs
-from app.core.firebase import firebase_auth # Import the admin auth module
+from app.core.etag import conditional_json
+from app.core.firebase import get_auth
 
 router = APIRouter()
 
@@ -11,7 +13,7 @@ router = APIRouter()
 # USER PROFILE MANAGEMENT
 # ---------------------------------------------------------
 @router.post("/{user_id}")
-def upsert_user_profile(
+async def upsert_user_profile(
     user_id: str,
     profile: UserProfile,
     decoded_token: dict = Depends(verify_firebase_token)
@@ -24,7 +26,7 @@ def upsert_user_profile(
 
     profile_data = profile.dict(exclude_none=True)
     
-    fs.upsert_user(
+    await fs.upsert_user(
         user_id,
         {"email": decoded_token.get("email"), "profile": profile_data}
     )
@@ -37,53 +39,51 @@ def upsert_user_profile(
 
 
 @router.get("/{user_id}")
-def fetch_user_profile(
+async def fetch_user_profile(
     user_id: str,
+    request: Request,
     decoded_token: dict = Depends(verify_firebase_token)
 ):
     """
     Fetch full Firestore user document.
     If the document doesn't exist, it creates a default one and returns it.
+    Answers 304 when the client's If-None-Match matches the document's ETag.
     """
     if user_id != decoded_token.get("uid"):
         raise HTTPException(status_code=403, detail="User ID mismatch")
 
-    user_data = fs.get_user(user_id)
-    
     # If user document doesn't exist, create it with a default structure.
-    if not user_data:
+    email = None
+    if not await fs.get_user(user_id):
         print(f"[INFO] User document for {user_id} not found. Creating a new one.")
         email = decoded_token.get("email", "")
-        fs.ensure_user_document(user_id, email)
-        # Fetch the newly created document to return it
-        user_data = fs.get_user(user_id)
-        # If it's still not found (which would be an issue), return a default
-        if not user_data:
-             return {"email": email, "profile": {}, "compass": {"recommendations": [], "saved_paths": []}}
+    # Also upgrades older documents to the current schema (same cached read)
+    user_data = await fs.ensure_user_document(user_id, email)
 
-    return user_data
+    return conditional_json(request, fs.present_user(user_data))
 
 
 @router.delete("/me")
-def delete_current_user(decoded_token: dict = Depends(verify_firebase_token)):
+async def delete_current_user(decoded_token: dict = Depends(verify_firebase_token)):
     """
     Deletes the currently authenticated user's account from Firebase Auth
     and their corresponding data from Firestore.
     """
     user_id = decoded_token.get("uid")
+    firebase_auth = get_auth()
     
     try:
         # 1. Delete the user from Firebase Authentication
-        firebase_auth.delete_user(user_id)
+        await asyncio.to_thread(firebase_auth.delete_user, user_id)
         
-        # 2. Delete the user's document from Firestore
-        fs.db.collection("users").document(user_id).delete()
+        # 2. Delete the user's document and chat history
+        await fs.delete_user_data(user_id)
         
         return {"status": "success", "message": f"User {user_id} and all their data have been deleted."}
 
     except firebase_auth.UserNotFoundError:
-        # If the auth user doesn't exist, still try to delete Firestore data
-        fs.db.collection("users").document(user_id).delete()
+        # If the auth user doesn't exist, still try to delete stored data
+        await fs.delete_user_data(user_id)
         # This is a client-side error, so a 404 is appropriate.
         raise HTTPException(status_code=404, detail="User not found.")
     except Exception as e:
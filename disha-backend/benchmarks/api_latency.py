@@ -0,0 +1,277 @@
+# benchmarks/api_latency.py
+"""
+Per-route latency and throughput of the API itself.
+
+Runs `app.main.app` in-process over ASGI (httpx.ASGITransport, lifespan
+included) with the stand-ins from benchmarks/fakes.py: fake Gemini with
+configurable latency and reply size, an in-memory document store and a token
+verifier that takes the uid from the bearer token. With the default 0 ms
+model latency the numbers are the backend's own overhead.
+
+Each history size gets a fresh store seeded with that many chat turns per
+user; every route is then hit by concurrent workers. Baselines are JSON
+files: `--save` writes one, `--compare` reports routes whose p95 regressed
+beyond the tolerance and exits non-zero. A route that answers any request
+with an error status fails the run before either, so error-path timings are
+never saved or compared as a baseline.
+
+Run from disha-backend/:
+    python -m benchmarks.api_latency
+    python -m benchmarks.api_latency --sizes 0 100 1000 --requests 300 --concurrency 16
+    python -m benchmarks.api_latency --save benchmarks/baselines/api_latency.json
+    python -m benchmarks.api_latency --compare benchmarks/baselines/api_latency.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+from benchmarks import fakes
+
+CAREER = fakes._career(0)
+SKILLS = CAREER["pathway"]
+INCORRECT = [{"question_text": "Question 1?", "correct_answer": "B", "explanation": "Because."}]
+
+
+def _routes(users):
+    """(name, method, url, json body) builders, per request index."""
+    def uid(i):
+        return users[i % len(users)]
+
+    return [
+        ("POST /chat", lambda i: ("POST", "/chat", {"message": f"Tell me more about option {i}"})),
+        ("POST /chat/stream", lambda i: ("POST", "/chat/stream", {"message": f"And what about {i}?"})),
+        ("GET /chat/history", lambda i: ("GET", "/chat/history", None)),
+        ("GET /chat/history?limit=20", lambda i: ("GET", "/chat/history?limit=20", None)),
+        ("GET /career/recommendations", lambda i: ("GET", "/career/recommendations", None)),
+        ("GET /career/compass", lambda i: ("GET", "/career/compass", None)),
+        ("POST /career/compass/add", lambda i: ("POST", "/career/compass/add", fakes._career(1000 + i))),
+        ("POST /career/compass/skill/update", lambda i: (
+            "POST", "/career/compass/skill/update",
+            {"career_name": CAREER["career_name"], "skill": SKILLS[i % len(SKILLS)], "is_complete": i % 2 == 0},
+        )),
+        ("POST /forge/assessment", lambda i: (
+            "POST", "/forge/assessment", {"career_name": CAREER["career_name"], "skill": SKILLS[i % len(SKILLS)]},
+        )),
+        ("POST /forge/assessment/save", lambda i: (
+            "POST", "/forge/assessment/save",
+            {"career_name": CAREER["career_name"], "skill": SKILLS[i % len(SKILLS)], "score": 80, "total_questions": 5},
+        )),
+        ("POST /forge/resources", lambda i: (
+            "POST", "/forge/resources", {"career_name": CAREER["career_name"], "skill": SKILLS[i % len(SKILLS)]},
+        )),
+        ("POST /forge/feedback", lambda i: ("POST", "/forge/feedback", {"incorrect_questions": INCORRECT})),
+        ("GET /users/{id}", lambda i: ("GET", f"/users/{uid(i)}", None)),
+    ]
+
+
+async def _seed(store, users, history_size):
+    """Users with a complete profile, one saved path and `history_size` chat turns each."""
+    from app.core import firestore_utils as fs
+    from app.core import schema
+    from app.core.storage import Write
+
+    start = datetime(2025, 1, 1)
+    for uid in users:
+        doc = schema.new_user_document(f"{uid}@bench.local")
+        doc["profile"].update(json.loads(fakes.reply_for("profile", 0)))
+        doc["compass"]["recommendations"] = json.loads(fakes.reply_for("career", 0))
+        doc["chat_meta"] = {"version": history_size, "epoch": 0}
+        await store.set(f"users/{uid}", doc)
+        await fs.add_saved_path(uid, {
+            **CAREER,
+            "skills_status": {skill: {"status": "pending", "score": None} for skill in SKILLS},
+            "completed_skills": [],
+            "total_skills": len(SKILLS),
+        })
+        writes = []
+        for n in range(history_size):
+            ts = (start + timedelta(minutes=n)).isoformat()
+            turn_id = f"{uid}-turn-{n}"
+            writes.append(Write("set", f"users/{uid}/chats/{turn_id}", {
+                "id": turn_id,
+                "timestamp": ts,
+                "user": {"text": fakes._words(25), "timestamp": ts},
+                "ai": {"text": fakes._words(60), "timestamp": ts},
+            }))
+        for i in range(0, len(writes), 400):
+            await store.commit(writes[i:i + 400])
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+async def _run_route(client, build, users, requests, concurrency, warmup):
+    """Hit one route `requests` times from `concurrency` workers; returns its stats."""
+    latencies, errors, first_error = [], 0, None
+    counter = iter(range(warmup + requests))
+
+    async def send(i):
+        method, url, body = build(i)
+        headers = {"Authorization": f"Bearer {users[i % len(users)]}"}
+        return await client.request(method, url, json=body, headers=headers)
+
+    for i in range(warmup):
+        await send(next(counter))
+
+    async def worker():
+        nonlocal errors, first_error
+        for i in counter:
+            started = time.perf_counter()
+            response = await send(i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+                first_error = first_error or f"{response.status_code} {response.text[:200]}"
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    stats = {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p95_ms": round(_percentile(latencies, 95), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+    }
+    if first_error:
+        stats["first_error"] = first_error
+    return stats
+
+
+async def _run_size(app, args, history_size):
+    users = [f"bench-{n}" for n in range(args.users)]
+    store = fakes.install_storage()
+    await _seed(store, users, history_size)
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        # Installed inside the lifespan: shutdown closes the pooled clients
+        fakes.install_llm(latency=args.llm_latency_ms / 1000, tokens=args.llm_tokens)
+        fakes.install_link_checker()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for name, build in _routes(users):
+                if args.routes and not any(r in name for r in args.routes):
+                    continue
+                results[name] = await _run_route(client, build, users, args.requests, args.concurrency, args.warmup)
+    return results
+
+
+def _print_table(history_size, results):
+    print(f"\nhistory = {history_size} turns/user")
+    print(f"{'route':<36} | {'req/s':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'errors':>6}")
+    print("-" * 90)
+    for name, r in results.items():
+        print(f"{name:<36} | {r['rps']:>8} | {r['p50_ms']:>8} | {r['p95_ms']:>8} | {r['p99_ms']:>8} | {r['errors']:>6}")
+
+
+def _failed_routes(report):
+    """(size, route, errors, first error) for every route that answered with an error."""
+    return [
+        (size, name, r["errors"], r.get("first_error"))
+        for size, routes in report["results"].items()
+        for name, r in routes.items() if r["errors"]
+    ]
+
+
+def _compare(baseline, report, tolerance, floor_ms):
+    """Routes whose p95 grew by more than `tolerance` (and `floor_ms`) over the baseline."""
+    regressions = []
+    for size, routes in report["results"].items():
+        for name, r in routes.items():
+            before = baseline.get("results", {}).get(size, {}).get(name)
+            if not before:
+                continue
+            if r["p95_ms"] > before["p95_ms"] * (1 + tolerance) and r["p95_ms"] - before["p95_ms"] > floor_ms:
+                regressions.append((size, name, before["p95_ms"], r["p95_ms"]))
+    return regressions
+
+
+async def _main(args):
+    fakes.install_firebase()
+    from app.main import app
+
+    fakes.install_auth(app)
+    report = {
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "settings": {
+            "users": args.users,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_tokens": args.llm_tokens,
+        },
+        "results": {},
+    }
+    for size in args.sizes:
+        # The app logs every write; keep the report readable unless asked
+        sink = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with sink:
+            results = await _run_size(app, args, size)
+        report["results"][str(size)] = results
+        _print_table(size, results)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API routes in-process with fake Gemini and storage.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 100, 1000], help="Chat turns per user.")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per route and size.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-tokens", type=int, default=120, help="Approximate words per chat reply.")
+    parser.add_argument("--routes", nargs="*", help="Only routes whose name contains one of these.")
+    parser.add_argument("--save", help="Write the results to this baseline file.")
+    parser.add_argument("--compare", help="Baseline file to check p95 regressions against.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative p95 growth.")
+    parser.add_argument("--floor-ms", type=float, default=2.0, help="Ignore p95 changes smaller than this.")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's own log output.")
+    args = parser.parse_args()
+
+    report = asyncio.run(_main(args))
+
+    failed = _failed_routes(report)
+    if failed:
+        print("\nRoutes that answered with errors (nothing saved or compared):")
+        for size, name, errors, first_error in failed:
+            print(f"  [{size} turns] {name}: {errors} errors, first: {first_error}")
+        raise SystemExit(1)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = _compare(baseline, report, args.tolerance, args.floor_ms)
+        if regressions:
+            print(f"\np95 regressions beyond {args.tolerance:.0%}:")
+            for size, name, before, after in regressions:
+                print(f"  [{size} turns] {name}: {before} ms → {after} ms")
+            raise SystemExit(1)
+        print(f"\nNo p95 regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
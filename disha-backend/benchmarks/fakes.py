@@ -0,0 +1,341 @@
+# benchmarks/fakes.py
+"""
+Stand-ins for the external services, so benchmarks measure the backend itself.
+
+- `install_firebase()`: initialises Firebase Admin with anonymous credentials
+  when no real ones are configured (nothing is contacted); call it before
+  the app first uses Firebase
+- `install_llm()`: deterministic fake Gemini behind the LLM gateway, for every
+  SDK profile (chat, profile, career, summary, quiz, feedback) and the raw
+  REST call used for resources, with configurable latency and reply size
+- `install_storage()`: in-memory document store instead of Firestore
+- `install_firestore()`: the Firestore store (storage.FirestoreDocumentStore)
+  on a fake async client kept in memory, or on the emulator when
+  FIRESTORE_EMULATOR_HOST is set
+- `install_auth(app)`: token verifier override; the bearer token is the uid
+- `install_link_checker()`: every resource URL answers 200
+
+The fakes go through the real gateway code paths (semaphores, deadlines,
+stats), so only the network time is replaced.
+"""
+import asyncio
+import json
+import os
+
+import httpx
+
+WORDS = ("career", "skills", "python", "data", "projects", "college", "learn", "build", "roadmap", "goals")
+
+
+def _words(n: int) -> str:
+    return " ".join(WORDS[i % len(WORDS)] for i in range(n))
+
+
+def _career(i: int) -> dict:
+    return {
+        "career_name": f"Benchmark Career {i}",
+        "description": _words(30),
+        "pathway": ["Python", "Statistics", "SQL", "Machine Learning", "Node.js"],
+        "education_pathway": ["B.Tech", "Online certificate"],
+    }
+
+
+def _quiz() -> dict:
+    return {
+        "quiz_title": "Benchmark quiz",
+        "questions": [
+            {
+                "question_text": f"Question {i}?",
+                "options": ["A", "B", "C", "D"],
+                "correct_answer": "B",
+                "explanation": _words(20),
+            }
+            for i in range(5)
+        ],
+    }
+
+
+def reply_for(profile_name: str, tokens: int) -> str:
+    """A reply the caller of `profile_name` can parse, about `tokens` words long."""
+    if profile_name == "profile":
+        return json.dumps({
+            "name": "Bench User",
+            "education": "B.Tech Computer Science",
+            "skills": ["Python", "SQL"],
+            "interests": ["Data", "AI"],
+            "career_goals": "Data scientist",
+        })
+    if profile_name == "career":
+        return json.dumps([_career(i) for i in range(3)])
+    if profile_name == "quiz":
+        return json.dumps(_quiz())
+    if profile_name == "feedback":
+        return json.dumps({"topics": ["Topic 1: " + _words(10), "Topic 2: " + _words(10)]})
+    if profile_name == "resources":
+        return json.dumps({"resources": [
+            {"title": f"Resource {i}", "url": f"https://docs.example.com/r{i}", "type": "Official Docs"}
+            for i in range(6)
+        ]})
+    return _words(tokens)
+
+# -----------------------------------------------------
+# GEMINI
+# -----------------------------------------------------
+class _Usage:
+    def __init__(self, prompt, reply: str):
+        self.prompt_token_count = len(str(prompt)) // 4
+        self.candidates_token_count = len(reply) // 4
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _Response:
+    def __init__(self, text: str, usage: _Usage, chunks: list | None = None):
+        self.text = text
+        self.usage_metadata = usage
+        self._chunks = chunks or []
+
+    def __aiter__(self):
+        return self._stream()
+
+    async def _stream(self):
+        for chunk in self._chunks:
+            yield _Chunk(chunk)
+
+
+class FakeModel:
+    """Mimics `genai.GenerativeModel.generate_content_async`, with and without stream=True."""
+
+    def __init__(self, profile_name: str, latency: float, tokens: int, chunk_words: int = 8):
+        self.profile_name = profile_name
+        self.latency = latency
+        self.tokens = tokens
+        self.chunk_words = chunk_words
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+        await asyncio.sleep(self.latency)
+        text = reply_for(self.profile_name, self.tokens)
+        usage = _Usage(prompt, text)
+        if not stream:
+            return _Response(text, usage)
+        words = text.split(" ")
+        chunks = [
+            " ".join(words[i:i + self.chunk_words]) + " "
+            for i in range(0, len(words), self.chunk_words)
+        ]
+        return _Response(text, usage, chunks)
+
+
+def install_llm(latency: float = 0.0, tokens: int = 120) -> None:
+    """Route every gateway call to fakes with `latency` seconds per call and ~`tokens` words per reply."""
+    from app.core import llm
+
+    for name in llm._profiles:
+        llm._models[name] = FakeModel(name, latency, tokens)
+
+    async def rest_handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        text = reply_for("resources", tokens)
+        return httpx.Response(200, json={
+            "candidates": [{"content": {"parts": [{"text": text}]}}],
+            "usageMetadata": {"promptTokenCount": len(request.content) // 4, "candidatesTokenCount": len(text) // 4},
+        })
+
+    llm._http_client = httpx.AsyncClient(transport=httpx.MockTransport(rest_handler))
+
+
+def install_link_checker() -> None:
+    from app.core.link_checker import link_checker
+
+    link_checker._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+
+# -----------------------------------------------------
+# FIREBASE / STORAGE / AUTH
+# -----------------------------------------------------
+def install_firebase() -> None:
+    """Anonymous Firebase Admin app unless credentials are configured (must run before the app first uses Firebase)."""
+    import firebase_admin
+    from firebase_admin import credentials
+    from google.auth.credentials import AnonymousCredentials
+
+    from app.core.config import FIREBASE_CREDENTIALS_BASE64, GOOGLE_APPLICATION_CREDENTIALS
+
+    if firebase_admin._apps or FIREBASE_CREDENTIALS_BASE64 or os.path.exists(GOOGLE_APPLICATION_CREDENTIALS or ""):
+        return
+
+    class _Anonymous(credentials.Base):
+        def get_credential(self):
+            return AnonymousCredentials()
+
+    firebase_admin.initialize_app(_Anonymous(), {"projectId": "disha-benchmark"})
+
+
+def install_storage():
+    """Fresh in-memory document store; returns it for seeding."""
+    from app.core import storage
+
+    store = storage.MemoryDocumentStore()
+    storage.set_store(store)
+    return store
+
+
+class _FakeSnapshot:
+    def __init__(self, doc_id: str, data):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return self._data
+
+
+class _FakeDocument:
+    def __init__(self, client, path: str):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    async def get(self):
+        await asyncio.sleep(self._client.latency)
+        return _FakeSnapshot(self.id, await self._client.store.get(self.path))
+
+    async def set(self, data):
+        batch = self._client.batch()
+        batch.set(self, data)
+        await batch.commit()
+
+    async def delete(self):
+        batch = self._client.batch()
+        batch.delete(self)
+        await batch.commit()
+
+
+class _FakeQuery:
+    def __init__(self, client, collection: str, **options):
+        self._client = client
+        self._collection = collection
+        self._options = options
+
+    def _with(self, **options):
+        return _FakeQuery(self._client, self._collection, **{**self._options, **options})
+
+    def document(self, doc_id: str):
+        return _FakeDocument(self._client, f"{self._collection}/{doc_id}")
+
+    def where(self, filter):
+        return self._with(where=(filter.field_path, filter.op_string, filter.value))
+
+    def order_by(self, field: str, direction="ASCENDING"):
+        return self._with(order_by=field, descending=direction == "DESCENDING")
+
+    def start_after(self, snapshot):
+        return self._with(start_after=snapshot.id)
+
+    def limit(self, count: int):
+        return self._with(limit=count)
+
+    async def stream(self):
+        await asyncio.sleep(self._client.latency)
+        for doc_id, data in await self._client.store.query(self._collection, **self._options) or []:
+            yield _FakeSnapshot(doc_id, data)
+
+
+class _FakeBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, ref, data):
+        self._writes.append(("set", ref.path, data))
+
+    def update(self, ref, data):
+        self._writes.append(("update", ref.path, data))
+
+    def delete(self, ref):
+        self._writes.append(("delete", ref.path, None))
+
+    async def commit(self):
+        from google.api_core.exceptions import NotFound
+
+        from app.core.storage import DocumentNotFound, Write
+
+        await asyncio.sleep(self._client.latency)
+        try:
+            await self._client.store.commit([Write(op, path, _neutral(data)) for op, path, data in self._writes])
+        except DocumentNotFound as e:
+            raise NotFound(f"No document to update: {e}")
+
+
+def _neutral(value):
+    """Firestore sentinels -> the store's own ones (recursively inside maps)."""
+    from google.cloud.firestore_v1 import transforms
+
+    from app.core import storage
+
+    if value is transforms.DELETE_FIELD:
+        return storage.DELETE_FIELD
+    if isinstance(value, transforms.Increment):
+        return storage.Increment(value.value)
+    if isinstance(value, transforms.ArrayUnion):
+        return storage.ArrayUnion(value.values)
+    if isinstance(value, transforms.ArrayRemove):
+        return storage.ArrayRemove(value.values)
+    if isinstance(value, dict):
+        return {k: _neutral(v) for k, v in value.items()}
+    return value
+
+
+class FakeAsyncFirestore:
+    """
+    The part of the async Firestore client that the app uses (documents,
+    batched writes, filtered/ordered/paged queries), kept in a
+    MemoryDocumentStore. Every call awaits `latency` seconds.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        from app.core.storage import MemoryDocumentStore
+
+        self.latency = latency
+        self.store = MemoryDocumentStore()
+
+    def document(self, path: str):
+        return _FakeDocument(self, path)
+
+    def collection(self, name: str):
+        return _FakeQuery(self, name)
+
+    def batch(self):
+        return _FakeBatch(self)
+
+
+def install_firestore(latency: float = 0.0):
+    """
+    Firestore document store on the emulator (FIRESTORE_EMULATOR_HOST) or on a
+    fresh FakeAsyncFirestore; returns the store for seeding. Call after
+    `install_firebase()`.
+    """
+    from app.core import firebase, storage  # noqa: F401 (registers the real clients first)
+    from app.core.services import services
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        client = FakeAsyncFirestore(latency)
+        services.register("firestore_async", lambda: client, warm=False)
+    store = storage.FirestoreDocumentStore()
+    storage.set_store(store)
+    return store
+
+
+def install_auth(app) -> None:
+    """Accept `Authorization: Bearer <uid>` without talking to Firebase Auth."""
+    from fastapi import Request
+
+    from app.core.security import verify_firebase_token
+
+    async def bench_user(request: Request) -> dict:
+        uid = request.headers.get("authorization", "").removeprefix("Bearer ").strip() or "bench-user"
+        return {"uid": uid, "email": f"{uid}@bench.local", "exp": 4102444800}
+
+    app.dependency_overrides[verify_firebase_token] = bench_user
@@ -0,0 +1,398 @@
+# benchmarks/journeys.py
+"""
+Load generator that replays multi-step student sessions.
+
+A journey is what a student does in one sitting: open the app (user document
+and chat history), chat for a number of turns, wait for the background
+pipeline to produce recommendations, add a few careers to the compass,
+toggle pathway skills, take quizzes and fetch resources. Sessions arrive as
+a Poisson process; think times between steps are exponential.
+
+Each stage runs one arrival rate (sessions/s) and reports per-step latency
+and errors, how long recommendations took to appear, and the peak depth and
+lag of the background pipeline. The first stage that breaks the chat p95 SLO,
+the error budget or the pipeline lag SLO is reported as the saturation point.
+
+A step that does not answer 2xx (or 304 to a conditional poll) fails its
+session there: it is counted as an error, not timed, and the remaining
+steps are skipped. If sessions already fail at the first rate, the run
+exits non-zero, since the stages would be timing an error path.
+
+Target a server started with `python -m benchmarks.serve` (fake Gemini and
+storage), or pass `--spawn` to start one on a free port.
+
+Run from disha-backend/:
+    python -m benchmarks.journeys --spawn --rates 0.5 1 2 4 --stage-seconds 30
+    python -m benchmarks.journeys --url http://127.0.0.1:8800 --think-ms 300 --chat-turns 5 10
+    python -m benchmarks.journeys --spawn --out /tmp/journeys.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+
+class StageStats:
+    def __init__(self):
+        self.attempts = defaultdict(int)     # step -> requests sent
+        self.latencies = defaultdict(list)   # step -> [ms]
+        self.errors = defaultdict(int)       # step -> count
+        self.recommendation_waits = []       # seconds from last chat turn to recommendations
+        self.recommendation_timeouts = 0
+        self.sessions_started = 0
+        self.sessions_completed = 0
+        self.sessions_failed = 0
+        self.failures = []                   # first few "step: status body" of failed sessions
+        self.peak_queue_depth = 0
+        self.peak_pipeline_lag = 0.0
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+MAX_FAILURE_SAMPLES = 5
+
+
+class StepFailed(Exception):
+    """A step did not succeed; the session stops there."""
+
+
+class Journey:
+    """One student session against the API."""
+
+    def __init__(self, client: httpx.AsyncClient, stats: StageStats, args):
+        self.client = client
+        self.stats = stats
+        self.args = args
+        self.uid = f"load-{uuid.uuid4().hex[:12]}"
+        self.headers = {"Authorization": f"Bearer {self.uid}"}
+
+    async def think(self):
+        mean = self.args.think_ms / 1000
+        if mean > 0:
+            await asyncio.sleep(min(random.expovariate(1 / mean), mean * 5))
+
+    async def step(self, name: str, method: str, url: str, body=None, headers=None):
+        """Send one request; raises StepFailed unless it answers 2xx (or 304 to If-None-Match)."""
+        self.stats.attempts[name] += 1
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, json=body, headers={**self.headers, **(headers or {})})
+        except httpx.HTTPError as e:
+            self.stats.errors[name] += 1
+            raise StepFailed(f"{name}: {e!r}")
+        not_modified = response.status_code == 304 and "If-None-Match" in (headers or {})
+        if not (200 <= response.status_code < 300 or not_modified):
+            self.stats.errors[name] += 1
+            raise StepFailed(f"{name}: {response.status_code} {response.text[:200]}")
+        self.stats.latencies[name].append((time.perf_counter() - started) * 1000)
+        return response
+
+    async def run(self):
+        self.stats.sessions_started += 1
+        try:
+            await self._steps()
+        except StepFailed as e:
+            self.stats.sessions_failed += 1
+            if len(self.stats.failures) < MAX_FAILURE_SAMPLES:
+                self.stats.failures.append(str(e))
+            return
+        self.stats.sessions_completed += 1
+
+    async def _steps(self):
+        args = self.args
+
+        await self.step("GET /users/{id}", "GET", f"/users/{self.uid}")
+        history = await self.step("GET /chat/history", "GET", "/chat/history?limit=20")
+        since = history.json().get("next_since")
+
+        for turn in range(random.randint(*args.chat_turns)):
+            await self.think()
+            body = {"message": f"I like data and building apps, what should I learn next? ({turn})", "since": since}
+            response = await self.step("POST /chat", "POST", "/chat", body)
+            if response.json().get("turn"):
+                since = response.json()["turn"]["id"]
+
+        recommendations = await self.wait_for_recommendations()
+
+        careers = recommendations[:random.randint(2, 3)]
+        for career in careers:
+            await self.think()
+            await self.step("POST /career/compass/add", "POST", "/career/compass/add", career)
+        compass = await self.step("GET /career/compass", "GET", "/career/compass")
+        paths = compass.json().get("compass", [])
+
+        for path in paths:
+            skills = path.get("pathway", [])
+            for skill in random.sample(skills, k=min(len(skills), 3)):
+                await self.think()
+                await self.step(
+                    "POST /career/compass/skill/update", "POST", "/career/compass/skill/update",
+                    {"career_name": path["career_name"], "skill": skill, "is_complete": True},
+                )
+            if not skills:
+                continue
+            skill = random.choice(skills)
+            await self.think()
+            quiz = await self.step(
+                "POST /forge/assessment", "POST", "/forge/assessment",
+                {"career_name": path["career_name"], "skill": skill},
+            )
+            questions = quiz.json().get("questions", [])
+            await self.think()
+            await self.step(
+                "POST /forge/assessment/save", "POST", "/forge/assessment/save",
+                {"career_name": path["career_name"], "skill": skill, "score": 80, "total_questions": len(questions)},
+            )
+            await self.step("POST /forge/feedback", "POST", "/forge/feedback", {"incorrect_questions": questions[:2]})
+            await self.think()
+            await self.step(
+                "POST /forge/resources", "POST", "/forge/resources",
+                {"career_name": path["career_name"], "skill": skill},
+            )
+
+    async def wait_for_recommendations(self) -> list:
+        """Poll like the Discover page (with ETags) until the pipeline has produced recommendations."""
+        started = time.perf_counter()
+        etag = None
+        while time.perf_counter() - started < self.args.recs_timeout:
+            response = await self.step(
+                "GET /career/recommendations", "GET", "/career/recommendations",
+                headers={"If-None-Match": etag} if etag else None,
+            )
+            if response.status_code == 200:
+                etag = response.headers.get("etag")
+                recommendations = response.json().get("recommendations", [])
+                if recommendations:
+                    self.stats.recommendation_waits.append(time.perf_counter() - started)
+                    return recommendations
+            await asyncio.sleep(self.args.poll_seconds)
+        self.stats.recommendation_timeouts += 1
+        return []
+
+
+async def _sample_pipeline(client: httpx.AsyncClient, stats: StageStats, stop: asyncio.Event, status_token: str):
+    status_headers = {"Authorization": f"Bearer {status_token}"}
+    while not stop.is_set():
+        try:
+            snapshot = (await client.get("/ping/background", headers=status_headers)).json()
+            stats.peak_queue_depth = max(stats.peak_queue_depth, snapshot.get("queue_depth", 0) + snapshot.get("running", 0))
+            stats.peak_pipeline_lag = max(stats.peak_pipeline_lag, snapshot.get("oldest_pending_seconds", 0.0))
+        except (httpx.HTTPError, ValueError):
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _run_stage(client: httpx.AsyncClient, rate: float, args) -> StageStats:
+    stats = StageStats()
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(_sample_pipeline(client, stats, stop, args.status_token))
+    sessions = []
+
+    deadline = time.perf_counter() + args.stage_seconds
+    while True:
+        await asyncio.sleep(random.expovariate(rate))
+        if time.perf_counter() >= deadline:
+            break
+        sessions.append(asyncio.create_task(Journey(client, stats, args).run()))
+
+    if sessions:
+        done, pending = await asyncio.wait(sessions, timeout=args.drain_seconds)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            if task.exception() is not None:
+                print(f"[Journeys] Session failed: {task.exception()!r}")
+    stop.set()
+    await sampler
+    return stats
+
+
+def _summarize(rate: float, stats: StageStats, args) -> dict:
+    steps = {}
+    for name in sorted(stats.attempts):
+        values = stats.latencies[name]
+        steps[name] = {
+            "requests": stats.attempts[name],
+            "errors": stats.errors[name],
+            "error_rate": round(stats.errors[name] / stats.attempts[name], 4),
+            "p50_ms": round(_percentile(values, 50), 1),
+            "p95_ms": round(_percentile(values, 95), 1),
+            "p99_ms": round(_percentile(values, 99), 1),
+        }
+
+    total_requests = sum(s["requests"] for s in steps.values())
+    total_errors = sum(s["errors"] for s in steps.values())
+    chat_p95 = steps.get("POST /chat", {}).get("p95_ms", 0.0)
+    error_rate = total_errors / total_requests if total_requests else 0.0
+
+    reasons = []
+    if chat_p95 > args.chat_slo_ms:
+        reasons.append(f"chat p95 {chat_p95:.0f} ms > {args.chat_slo_ms:.0f} ms")
+    if error_rate > args.max_error_rate:
+        reasons.append(f"error rate {error_rate:.1%} > {args.max_error_rate:.1%}")
+    if stats.peak_pipeline_lag > args.pipeline_lag_slo:
+        reasons.append(f"pipeline lag {stats.peak_pipeline_lag:.1f}s > {args.pipeline_lag_slo:.1f}s")
+    if stats.sessions_failed:
+        reasons.append(f"{stats.sessions_failed} sessions failed")
+    unfinished = stats.sessions_started - stats.sessions_completed - stats.sessions_failed
+    if unfinished:
+        reasons.append(f"{unfinished} sessions unfinished")
+
+    waits = stats.recommendation_waits
+    return {
+        "rate": rate,
+        "sessions_started": stats.sessions_started,
+        "sessions_completed": stats.sessions_completed,
+        "sessions_failed": stats.sessions_failed,
+        "failures": stats.failures,
+        "steps": steps,
+        "error_rate": round(error_rate, 4),
+        "recommendations_wait_p50_s": round(_percentile(waits, 50), 2),
+        "recommendations_wait_p95_s": round(_percentile(waits, 95), 2),
+        "recommendations_timeouts": stats.recommendation_timeouts,
+        "peak_pipeline_queue": stats.peak_queue_depth,
+        "peak_pipeline_lag_s": round(stats.peak_pipeline_lag, 2),
+        "saturated": bool(reasons),
+        "saturation_reasons": reasons,
+    }
+
+
+def _print_stage(summary: dict):
+    print(
+        f"\nrate = {summary['rate']:g} sessions/s — {summary['sessions_completed']}/{summary['sessions_started']} sessions completed, "
+        f"errors {summary['error_rate']:.1%}"
+    )
+    print(f"{'step':<36} | {'requests':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'errors':>6}")
+    print("-" * 90)
+    for name, s in summary["steps"].items():
+        print(f"{name:<36} | {s['requests']:>8} | {s['p50_ms']:>8} | {s['p95_ms']:>8} | {s['p99_ms']:>8} | {s['errors']:>6}")
+    print(
+        f"recommendations wait p50/p95: {summary['recommendations_wait_p50_s']}s / {summary['recommendations_wait_p95_s']}s "
+        f"({summary['recommendations_timeouts']} timed out); pipeline peak queue {summary['peak_pipeline_queue']}, "
+        f"peak lag {summary['peak_pipeline_lag_s']}s"
+    )
+    for failure in summary["failures"]:
+        print(f"failed step: {failure}")
+    if summary["saturated"]:
+        print("SATURATED: " + "; ".join(summary["saturation_reasons"]))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _spawn_server(args):
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.serve", "--port", str(port), "--llm-latency-ms", str(args.llm_latency_ms),
+            "--status-token", args.status_token,
+        ],
+        # The app logs every request's writes; keep the report readable
+        stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if httpx.get(f"{url}/ping/", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            raise SystemExit("Benchmark server exited during startup.")
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("Benchmark server did not become ready.")
+
+
+async def _main(args, url: str) -> list:
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    summaries = []
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.request_timeout) as client:
+        for rate in args.rates:
+            summary = _summarize(rate, await _run_stage(client, rate, args), args)
+            summaries.append(summary)
+            _print_stage(summary)
+            if summary["saturated"] and not args.keep_going:
+                break
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay student journeys at increasing arrival rates.")
+    parser.add_argument("--url", default="http://127.0.0.1:8800")
+    parser.add_argument("--spawn", action="store_true", help="Start benchmarks.serve on a free port.")
+    parser.add_argument(
+        "--status-token", default=os.getenv("STATUS_TOKEN") or "bench-status",
+        help="Bearer token for /ping/background (the server's STATUS_TOKEN).",
+    )
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0, help="Fake model latency for --spawn.")
+    parser.add_argument("--rates", type=float, nargs="+", default=[0.5, 1, 2, 4, 8], help="New sessions per second, one stage each.")
+    parser.add_argument("--stage-seconds", type=float, default=30.0, help="How long each stage admits new sessions.")
+    parser.add_argument("--drain-seconds", type=float, default=300.0, help="How long to wait for a stage's sessions to finish.")
+    parser.add_argument("--chat-turns", type=int, nargs=2, default=[20, 60], metavar=("MIN", "MAX"))
+    parser.add_argument("--think-ms", type=float, default=1000.0, help="Mean think time between steps.")
+    parser.add_argument("--poll-seconds", type=float, default=2.0, help="Recommendations polling interval.")
+    parser.add_argument("--recs-timeout", type=float, default=60.0)
+    parser.add_argument("--chat-slo-ms", type=float, default=2000.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--pipeline-lag-slo", type=float, default=30.0, help="Seconds a queued background job may wait.")
+    parser.add_argument("--max-connections", type=int, default=500)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--keep-going", action="store_true", help="Run every rate even after saturation.")
+    parser.add_argument("--out", help="Write the stage summaries to this JSON file.")
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if args.spawn:
+        process, url = _spawn_server(args)
+    try:
+        summaries = asyncio.run(_main(args, url))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    saturated = next((s for s in summaries if s["saturated"]), None)
+    if saturated:
+        sustained = [s["rate"] for s in summaries if not s["saturated"]]
+        print(
+            f"\nSaturation at {saturated['rate']:g} sessions/s"
+            + (f" (last healthy: {sustained[-1]:g} sessions/s)" if sustained else "")
+        )
+    else:
+        print(f"\nNo saturation up to {summaries[-1]['rate']:g} sessions/s" if summaries else "\nNo stages ran")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"settings": vars(args), "stages": summaries}, f, indent=2)
+        print(f"Report written to {args.out}")
+
+    if summaries and summaries[0]["sessions_failed"]:
+        print(f"\nSessions failed already at {summaries[0]['rate']:g} sessions/s; the run is not a valid measurement")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# benchmarks/loop_block.py
+"""
+Check that no route blocks the event loop.
+
+Runs every route from benchmarks/api_latency.py in-process on the fakes, one
+request at a time, while a heartbeat task measures how late the loop wakes it
+up. Awaited I/O (the async Firestore client, SQLite in worker threads, the
+fake Gemini) leaves the heartbeat on time; a synchronous call on the loop
+shows up as lag for the route that made it. Exits non-zero when any route's
+worst lag exceeds the threshold, or when any request did not answer 2xx (a
+route failing early would look fast), so it can gate CI.
+
+By default the routes run on the production store, storage.FirestoreDocumentStore,
+over the Firestore emulator when FIRESTORE_EMULATOR_HOST is set and over
+fakes.FakeAsyncFirestore otherwise.
+
+Run from disha-backend/:
+    python -m benchmarks.loop_block
+    python -m benchmarks.loop_block --storage sqlite --threshold-ms 50
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import os
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from benchmarks import fakes
+from benchmarks.api_latency import _routes, _seed
+
+
+class LagMonitor:
+    """Heartbeat on the loop; `max_lag_ms` is the worst wake-up delay since `reset()`."""
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.max_lag_ms = 0.0
+        self._task = None
+
+    async def _beat(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = (time.perf_counter() - started - self.interval) * 1000
+            self.max_lag_ms = max(self.max_lag_ms, lag)
+
+    def reset(self) -> None:
+        self.max_lag_ms = 0.0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._beat())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+
+
+async def _main(args):
+    fakes.install_firebase()
+    from app.core import storage
+    from app.main import app
+
+    fakes.install_auth(app)
+    # Fresh users per run, as the emulator keeps documents between runs
+    run = uuid.uuid4().hex[:8]
+    users = [f"loop-{run}-{n}" for n in range(2)]
+    if args.storage == "sqlite":
+        path = os.path.join(tempfile.mkdtemp(prefix="disha-loop-"), "store.sqlite3")
+        store = storage.SQLiteDocumentStore(path)
+        storage.set_store(store)
+    elif args.storage == "firestore":
+        store = fakes.install_firestore()
+    else:
+        store = fakes.install_storage()
+    await _seed(store, users, args.history)
+
+    results = {}
+    monitor = LagMonitor()
+    async with app.router.lifespan_context(app):
+        fakes.install_llm(latency=args.llm_latency_ms / 1000, tokens=120)
+        fakes.install_link_checker()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loop", timeout=120) as client:
+            # A full collection over the freshly imported SDKs takes ~100 ms whenever
+            # it happens to run; do it now so it is not charged to a route
+            gc.collect()
+            gc.freeze()
+            monitor.start()
+            for name, build in _routes(users):
+                monitor.reset()
+                statuses = set()
+                for i in range(args.requests):
+                    method, url, body = build(i)
+                    headers = {"Authorization": f"Bearer {users[i % len(users)]}"}
+                    response = await client.request(method, url, json=body, headers=headers)
+                    statuses.add(response.status_code)
+                # Let background jobs scheduled by the route run inside its window
+                await asyncio.sleep(args.settle_ms / 1000)
+                results[name] = (round(monitor.max_lag_ms, 2), sorted(statuses))
+            await monitor.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if any route blocks the event loop for too long.")
+    parser.add_argument("--threshold-ms", type=float, default=100.0, help="Allowed worst-case loop lag per route.")
+    parser.add_argument("--requests", type=int, default=5, help="Sequential requests per route.")
+    parser.add_argument("--history", type=int, default=100, help="Chat turns seeded per user.")
+    parser.add_argument("--storage", choices=["firestore", "memory", "sqlite"], default="firestore")
+    parser.add_argument("--llm-latency-ms", type=float, default=20.0)
+    parser.add_argument("--settle-ms", type=float, default=100.0)
+    parser.add_argument("--verbose", action="store_true", help="Show the app's own log output.")
+    args = parser.parse_args()
+
+    sink = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with sink:
+        results = asyncio.run(_main(args))
+
+    print(f"{'route':<36} | {'max lag ms':>10} | statuses")
+    print("-" * 64)
+    blocking, failing = [], []
+    for name, (lag_ms, statuses) in results.items():
+        flag = ""
+        if lag_ms > args.threshold_ms:
+            flag += "  BLOCKS"
+            blocking.append(name)
+        if any(not 200 <= status < 300 for status in statuses):
+            flag += "  FAILS"
+            failing.append(name)
+        print(f"{name:<36} | {lag_ms:>10} | {statuses}{flag}")
+
+    if failing:
+        print(f"\n{len(failing)} route(s) answered with a non-2xx status: {', '.join(failing)}")
+    if blocking:
+        print(f"\n{len(blocking)} route(s) blocked the event loop for more than {args.threshold_ms:g} ms")
+    if failing or blocking:
+        raise SystemExit(1)
+    print(f"\nNo route blocked the event loop for more than {args.threshold_ms:g} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/prompt_size.py
+"""
+Chat prompt size vs. history length.
+
+Compares the legacy prompt (the whole transcript on every message) with the
+rolling-memory prompt (running summary + recent turns, token-budgeted) as the
+stored history grows. No Firestore or Gemini access is needed.
+
+Run from disha-backend/:
+    python -m benchmarks.prompt_size
+    python -m benchmarks.prompt_size --sizes 10 100 1000 --budget 2000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from app.core import memory, prompts
+from app.core.config import (
+    CHAT_PROMPT_TOKEN_BUDGET,
+    CHAT_SUMMARY_BATCH,
+    CHAT_SUMMARY_MAX_TOKENS,
+    CHAT_WINDOW_TURNS,
+)
+
+USER_LINE = "I am in my final year of B.Tech and I really enjoy working with data and building small web apps."
+AI_LINE = "That sounds great! Which part do you enjoy more, finding patterns in data or building things people use?"
+
+
+def _synthetic_history(n: int):
+    start = datetime(2025, 1, 1)
+    turns = []
+    for i in range(n):
+        ts = (start + timedelta(minutes=i)).isoformat()
+        turns.append({
+            "id": f"turn-{i}",
+            "timestamp": ts,
+            "user": {"text": f"{USER_LINE} ({i})", "timestamp": ts},
+            "ai": {"text": f"{AI_LINE} ({i})", "timestamp": ts},
+        })
+    return turns
+
+
+def _legacy_prompt(history, user_message):
+    conversation_text = "\n".join(filter(None, [memory.format_turns(history), f"User: {user_message}"]))
+    return (
+        "You are Disha Guide, a friendly AI career mentor helping Indian students.\n"
+        "Guide step-by-step through name, education, interests, skills, and career goals.\n\n"
+        f"Here’s the conversation so far:\n\n{conversation_text}\n\nAI:"
+    )
+
+
+def _memory_prompt(history, user_message, budget):
+    # Steady state: everything but the newest window + one batch has been summarized,
+    # and the summary itself is at its maximum size.
+    unsummarized = history[-(CHAT_WINDOW_TURNS + CHAT_SUMMARY_BATCH):]
+    summary = ""
+    if len(history) > len(unsummarized):
+        summary = ("Student is a final-year B.Tech learner interested in data and web apps. " * 200)
+        summary = memory.truncate_to_tokens(summary, CHAT_SUMMARY_MAX_TOKENS)
+    return prompts.get_chat_prompt(user_message, unsummarized, summary=summary, token_budget=budget)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chat prompt size against history length.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 10, 50, 100, 500, 1000, 5000])
+    parser.add_argument("--budget", type=int, default=CHAT_PROMPT_TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    user_message = "Can you suggest careers that mix both?"
+    print(f"window={CHAT_WINDOW_TURNS} turns, summary batch={CHAT_SUMMARY_BATCH}, budget={args.budget} tokens\n")
+    print(f"{'turns':>7} | {'legacy tokens':>13} | {'memory tokens':>13} | {'build ms':>8}")
+    print("-" * 52)
+
+    worst = 0
+    for n in args.sizes:
+        history = _synthetic_history(n)
+        legacy = memory.estimate_tokens(_legacy_prompt(history, user_message))
+        started = time.perf_counter()
+        prompt = _memory_prompt(history, user_message, args.budget)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        tokens = memory.estimate_tokens(prompt)
+        worst = max(worst, tokens)
+        print(f"{n:>7} | {legacy:>13} | {tokens:>13} | {elapsed_ms:>8.2f}")
+
+    print(f"\nLargest memory prompt: {worst} tokens (budget {args.budget})")
+    if worst > args.budget:
+        raise SystemExit("Memory prompt exceeded the configured token budget.")
+
+
+if __name__ == "__main__":
+    main()
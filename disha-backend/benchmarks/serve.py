@@ -0,0 +1,53 @@
+# benchmarks/serve.py
+"""
+Local API server on fake Gemini, embedded storage and bearer-uid auth.
+
+The target for benchmarks/journeys.py: the real app under uvicorn, with the
+stand-ins from benchmarks/fakes.py. Model latency and reply size are
+configurable so the background pipeline sees realistic timings. The /ping
+status endpoints take `--status-token` (STATUS_TOKEN) as bearer token.
+
+Run from disha-backend/:
+    python -m benchmarks.serve --port 8800 --llm-latency-ms 400
+    python -m benchmarks.serve --storage sqlite --sqlite-path /tmp/disha_bench.sqlite3
+"""
+import argparse
+import os
+
+import uvicorn
+
+from benchmarks import fakes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API on fake Gemini and embedded storage.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0)
+    parser.add_argument("--llm-tokens", type=int, default=120)
+    parser.add_argument("--storage", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--sqlite-path", default="./disha_bench.sqlite3")
+    parser.add_argument("--log-level", default="warning")
+    parser.add_argument("--status-token", default=os.getenv("STATUS_TOKEN") or "bench-status")
+    args = parser.parse_args()
+
+    # Read by app.core.config on import
+    os.environ["STATUS_TOKEN"] = args.status_token
+    fakes.install_firebase()
+    from app.core import storage
+    from app.main import app
+
+    if args.storage == "sqlite":
+        storage.set_store(storage.SQLiteDocumentStore(args.sqlite_path))
+    else:
+        fakes.install_storage()
+    fakes.install_auth(app)
+    fakes.install_llm(latency=args.llm_latency_ms / 1000, tokens=args.llm_tokens)
+    fakes.install_link_checker()
+
+    print(f"[Bench] Serving on http://{args.host}:{args.port} (fake LLM {args.llm_latency_ms:g} ms, {args.storage} storage)")
+    uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level, access_log=False)
+
+
+if __name__ == "__main__":
+    main()
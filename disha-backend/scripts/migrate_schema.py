@@ -0,0 +1,57 @@
+# scripts/migrate_schema.py
+"""
+Batch migration: upgrade every users/{uid} document to the current schema
+version (see app/core/schema.py), e.g. moving legacy `chats` arrays into the
+users/{uid}/chats subcollection. Documents are also upgraded lazily on first
+touch, so this only has to run once per schema bump. Safe to re-run.
+
+Run from disha-backend/:
+    python -m scripts.migrate_schema            # upgrade every user
+    python -m scripts.migrate_schema --dry-run  # only report what would change
+"""
+import argparse
+import asyncio
+from collections import Counter
+
+from app.core import firestore_utils as fs
+from app.core import schema
+
+
+async def migrate(dry_run: bool):
+    users_seen = 0
+    users_upgraded = 0
+    versions = Counter()
+
+    # Documents written before versioning have no schema_version field, and
+    # Firestore range filters skip missing fields, so scan everything
+    async for user_id, data in fs.iter_users():
+        users_seen += 1
+        version = schema.document_version(data)
+        versions[version] += 1
+        if version >= schema.CURRENT_SCHEMA_VERSION:
+            continue
+
+        users_upgraded += 1
+        if dry_run:
+            print(f"[DryRun] {user_id}: v{version} → v{schema.CURRENT_SCHEMA_VERSION}")
+            continue
+
+        await fs.update_user(user_id, await schema.upgrade(user_id, data))
+
+    action = "would be upgraded" if dry_run else "upgraded"
+    breakdown = ", ".join(f"v{v}: {n}" for v, n in sorted(versions.items()))
+    print(
+        f"[Migrate] Scanned {users_seen} users ({breakdown or 'none'}); "
+        f"{users_upgraded} {action} to v{schema.CURRENT_SCHEMA_VERSION}."
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upgrade user documents to the current schema version.")
+    parser.add_argument("--dry-run", action="store_true", help="Report affected users without writing.")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -108,6 +108,20 @@ export function AuthProvider({ children }) {
     }
   }, [user, refreshUserData]);
 
+  // Apply results pushed by the server (see streamRecommendationEvents) without re-fetching.
+  const applyProfile = useCallback((profile) => {
+    if (!profile) return;
+    setUserData(prevData => ({ ...prevData, profile: { ...prevData?.profile, ...profile } }));
+  }, []);
+
+  const applyRecommendations = useCallback((recommendations) => {
+    if (!Array.isArray(recommendations)) return;
+    setUserData(prevData => ({
+      ...prevData,
+      compass: { ...prevData?.compass, recommendations },
+    }));
+  }, []);
+
   const value = useMemo(() => ({
     user,
     userData,
@@ -120,7 +134,9 @@ export function AuthProvider({ children }) {
     updateProfile,
     addCareer,
     removeCareer,
-  }), [user, userData, loading, error, refreshUserData, updateProfile, addCareer, removeCareer]);
+    applyProfile,
+    applyRecommendations,
+  }), [user, userData, loading, error, refreshUserData, updateProfile, addCareer, removeCareer, applyProfile, applyRecommendations]);
 
   return <AuthContext.Provider value={value}>{children}</AuthContext.Provider>;
 }
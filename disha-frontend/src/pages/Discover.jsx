@@ -3,6 +3,8 @@ import { useState, useRef, useEffect } from "react";
 import { Link } from "react-router-dom";
 import { useAuth, useUserProfile } from "../contexts/AuthContext";
 import API from "../services/api";
+import { streamChatMessage } from "../services/chatService";
+import { streamRecommendationEvents } from "../services/careerService";
 import ReactMarkdown from "react-markdown";
 import remarkGfm from "remark-gfm";
 import { Trash2, Send } from "lucide-react";
@@ -59,11 +61,11 @@ const ChatTurn = ({ turn, onDelete }) => (
 
 export default function Discover() {
   const { user, initializing } = useAuth();
-  const { profile, recommendations, refreshUserData } = useUserProfile();
+  const { profile, recommendations, refreshUserData, applyProfile, applyRecommendations } = useUserProfile();
   const [chatTurns, setChatTurns] = useState([]);
   const [input, setInput] = useState("");
   const [loading, setLoading] = useState(false);
-  const [isPolling, setIsPolling] = useState(false); // Track polling state
+  const [isWaitingForRecs, setIsWaitingForRecs] = useState(false); // Recommendations are being generated
   const [showClearModal, setShowClearModal] = useState(false); // State for clear history modal
   const chatEndRef = useRef(null);
 
@@ -92,33 +94,41 @@ export default function Discover() {
     fetchHistory();
   }, [user, initializing]);
 
-  // Poll for recommendations only when the profile is ready and recs are missing.
+  // Show the "generating" notice while the profile is ready but recs are missing.
   useEffect(() => {
-    let intervalId = null;
+    setIsWaitingForRecs(Boolean(user && isProfileReadyForRecs && recommendations.length === 0));
+  }, [user, recommendations, isProfileReadyForRecs]);
 
-    if (user && isProfileReadyForRecs && (!recommendations || recommendations.length === 0)) {
-      setIsPolling(true); // Start polling indicator
-      intervalId = setInterval(() => {
-        console.log("Polling for new recommendations...");
-        refreshUserData();
-      }, 5000); // Check every 5 seconds
-    }
-
-    // If recommendations appear, stop polling.
-    if (recommendations && recommendations.length > 0) {
-      setIsPolling(false); // Stop polling indicator
-      if (intervalId) {
-        clearInterval(intervalId);
-      }
-    }
+  // The server pushes profile and recommendation updates from its background
+  // pipeline; keep a stream open (reconnecting with backoff) instead of polling.
+  useEffect(() => {
+    if (initializing || !user) return;
+    const controller = new AbortController();
+    const wait = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
 
-    // Cleanup: stop polling when the component unmounts.
-    return () => {
-      if (intervalId) {
-        clearInterval(intervalId);
+    const listen = async () => {
+      let retryDelay = 1000;
+      while (!controller.signal.aborted) {
+        try {
+          await streamRecommendationEvents({
+            signal: controller.signal,
+            onProfile: applyProfile,
+            onRecommendations: applyRecommendations,
+          });
+          retryDelay = 1000; // The server ends streams periodically; just reconnect
+        } catch (err) {
+          if (controller.signal.aborted) return;
+          console.error("Recommendation updates stream failed:", err);
+          retryDelay = Math.min(retryDelay * 2, 30000);
+        }
+        await wait(retryDelay);
       }
     };
-  }, [user, recommendations, refreshUserData, isProfileReadyForRecs]);
+    listen();
+
+    // Cleanup: close the stream when the component unmounts.
+    return () => controller.abort();
+  }, [user, initializing, applyProfile, applyRecommendations]);
 
   const sendMessage = async () => {
     if (!input.trim() || !user) return;
@@ -135,12 +145,17 @@ export default function Discover() {
     setLoading(true);
 
     try {
-      const { data } = await API.post("/chat", { message: userMessage.text });
-      setChatTurns(data.history || []);
+      // Render the reply as it streams in, then swap in the saved turn
+      const savedTurn = await streamChatMessage(userMessage.text, (textSoFar) => {
+        setChatTurns(prev => prev.map(turn =>
+          turn.id === optimisticTurnId ? { ...turn, ai: { text: textSoFar } } : turn
+        ));
+      });
+      setChatTurns(prev => prev.map(turn => (turn.id === optimisticTurnId ? savedTurn : turn)));
       await refreshUserData();
     } catch (err) {
       console.error("Error sending message:", err);
-      const errorText = err.response?.data?.detail || "Could not connect to the server.";
+      const errorText = err.message || "Could not connect to the server.";
       // Update the temporary turn with the error message
       setChatTurns(prev => prev.map(turn => 
         turn.id === optimisticTurnId 
@@ -237,8 +252,8 @@ export default function Discover() {
           </Stack>
         </Form>
 
-        {isPolling && (
-          <Alert variant="info" className="mt-3 text-center" onClose={() => setIsPolling(false)} dismissible>
+        {isWaitingForRecs && (
+          <Alert variant="info" className="mt-3 text-center" onClose={() => setIsWaitingForRecs(false)} dismissible>
             <Spinner as="span" animation="border" size="sm" role="status" aria-hidden="true" className="me-2" />
             We are generating your personalized career recommendations. This may take a moment...
           </Alert>
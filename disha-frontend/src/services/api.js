@@ -26,7 +26,7 @@ API.interceptors.request.use(
     try {
       const user = auth.currentUser;
       if (user) {
-        const token = await user.getIdToken(true);
+        const token = await user.getIdToken(); // cached by the SDK until close to expiry
         config.headers = config.headers || {};
         config.headers.Authorization = `Bearer ${token}`;
       }
@@ -1,5 +1,6 @@
 // src/services/careerService.js
 import API from "./api";
+import { openEventStream } from "./sse";
 
 /**
  * Adds a selected career to the user's permanent compass.
@@ -49,4 +50,23 @@ export async function refreshRecommendations() {
     console.error("❌ Error refreshing recommendations:", error.response?.data || error.message);
     throw new Error("Failed to refresh recommendations.");
   }
-}
\ No newline at end of file
+}
+
+/**
+ * Listens for the background pipeline's results for the signed-in user.
+ * Resolves when the server ends the stream (callers reconnect).
+ * @param {Object} handlers - { signal, onProfile(profile), onRecommendations(recommendations) }
+ */
+export async function streamRecommendationEvents({ signal, onProfile, onRecommendations } = {}) {
+  await openEventStream("/career/recommendations/events", {
+    signal,
+    onEvent: (event, data) => {
+      if (event === "profile") {
+        onProfile?.(data.profile);
+      } else if (event === "ready" || event === "recommendations") {
+        // `ready` carries the state at connect time, covering anything missed while disconnected
+        onRecommendations?.(data.recommendations);
+      }
+    },
+  });
+}
@@ -0,0 +1,36 @@
+// src/services/chatService.js
+import { openEventStream } from "./sse";
+
+/**
+ * Sends a chat message and streams Disha's reply as it is generated.
+ * @param {string} message - The user's message.
+ * @param {Function} onChunk - Called with the reply text received so far.
+ * @param {AbortSignal} [signal] - Aborting cancels generation on the server.
+ * @returns {Promise<Object>} The saved chat turn.
+ */
+export async function streamChatMessage(message, onChunk, signal) {
+  let text = "";
+  let savedTurn = null;
+  let streamError = null;
+
+  await openEventStream("/chat/stream", {
+    method: "POST",
+    body: { message },
+    signal,
+    onEvent: (event, data) => {
+      if (event === "chunk") {
+        text += data.text;
+        onChunk?.(text);
+      } else if (event === "done") {
+        savedTurn = data.turn;
+      } else if (event === "error") {
+        streamError = data.detail;
+      }
+    },
+  });
+
+  if (streamError || !savedTurn) {
+    throw new Error(streamError || "The reply stream ended unexpectedly.");
+  }
+  return savedTurn;
+}
@@ -0,0 +1,61 @@
+// src/services/sse.js
+import { auth } from "../firebaseConfig";
+
+const apiBaseURL = import.meta.env.VITE_API_BASE_URL;
+
+/**
+ * Opens a Server-Sent-Events stream with fetch so the Firebase ID token can be
+ * sent as an Authorization header (EventSource cannot set headers).
+ * Calls `onEvent(event, data)` for every event until the stream ends.
+ * @param {string} path - Backend path, e.g. "/chat/stream".
+ * @param {Object} options - { method, body, signal, onEvent }
+ */
+export async function openEventStream(path, { method = "GET", body, signal, onEvent } = {}) {
+  const headers = { Accept: "text/event-stream" };
+  const user = auth.currentUser;
+  if (user) {
+    headers.Authorization = `Bearer ${await user.getIdToken()}`;
+  }
+  if (body !== undefined) {
+    headers["Content-Type"] = "application/json";
+  }
+
+  const response = await fetch(`${apiBaseURL}${path}`, {
+    method,
+    headers,
+    body: body !== undefined ? JSON.stringify(body) : undefined,
+    signal,
+  });
+  if (!response.ok || !response.body) {
+    let detail = `Request failed with status ${response.status}`;
+    try {
+      detail = (await response.json()).detail || detail;
+    } catch {
+      // Not a JSON error body
+    }
+    throw new Error(detail);
+  }
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    // Events are separated by a blank line
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = "message";
+      const dataLines = [];
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) dataLines.push(line.slice(5).trimStart());
+      }
+      if (dataLines.length) {
+        onEvent?.(event, JSON.parse(dataLines.join("\n")));
+      }
+    }
+  }
+}